@@ -13,6 +13,25 @@ class Settings(BaseSettings):
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
+
+    # Background tasks
+    JOB_EXPIRY_SWEEP_INTERVAL_SECONDS: int = 60
+    JOB_RECOMMENDATION_REFRESH_INTERVAL_SECONDS: int = 3600
+
+    # How long a replayed Idempotency-Key returns the stored response
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    # How long a request in progress holds its key before a retry can take it over.
+    # Must stay well above the slowest request, a request still running when its key
+    # is taken over gets processed twice. The retry of a request whose worker died is
+    # refused until then.
+    IDEMPOTENCY_LEASE_SECONDS: int = 900
+
+    # Year-end donation receipts
+    RECEIPTS_DIR: str = "receipts"
+    RECEIPT_WORKER_PROCESSES: int = 2
+
+    # Recurring donation pledges
+    PLEDGE_SCHEDULER_INTERVAL_SECONDS: int = 60
     class Config:
         env_file = ".env.development"  # Path to the .env file
         
@@ -14,14 +14,29 @@ from app.models import (
 )
 from app.config import settings
 from app.models import volunteer_activity
+from app.models import waitlist
+from app.models import allowance
+from app.models import job_recommendation
+from app.models import availability
+from app.models import idempotency
+from app.models import receipt
+from app.models import pledge
+from app.models import lease
+
+
+def get_database():
+    """
+    Connect to the MongoDB database without initializing the Beanie models.
+    """
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    return client.get_database("FoodLink-Collection")
 
 
 async def init_db():
     """
     Initialize the MongoDB database with Beanie models.
     """
-    client = AsyncIOMotorClient(settings.MONGO_URI)
-    db = client.get_database("FoodLink-Collection")
+    db = get_database()
     await init_beanie(
         database=db,
         document_models=[
@@ -32,10 +47,26 @@ async def init_db():
             event.EventInventory,
             inventory.MainInventory,
             application.Application,
+            application.EventApplication,
             appointment.Appointment,
             donation.Donation,
+            donation.DonationCounter,
+            donation.DonationDailyRollup,
+            donation.DonorSummary,
+            donation.DonorFoodbankTotal,
             job.Job,
+            job.EventJob,
             volunteer_activity.VolunteerActivity,
+            volunteer_activity.VolunteerHoursRollup,
             food_item.FoodItem,
+            waitlist.WaitlistEntry,
+            allowance.AllowancePolicy,
+            allowance.AllowanceCounter,
+            job_recommendation.JobRecommendation,
+            availability.VolunteerAvailability,
+            idempotency.IdempotencyRecord,
+            receipt.ReceiptJob,
+            pledge.DonationPledge,
+            lease.SchedulerLease,
         ],
     )
@@ -1,8 +1,12 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db import init_db
 from app.config import settings
 from contextlib import asynccontextmanager
+from app.tasks.job_expiry import run_job_expiry_sweeper
+from app.tasks.job_recommendations import run_job_recommendation_refresher
+from app.tasks.donation_pledges import run_pledge_scheduler
 from app.routes import auth, misc, volunteer, individual, donor
 from app.routes.foodbank import (
     volunteer_mangement,
@@ -12,20 +16,32 @@ from app.routes.foodbank import (
     appointments,
     donations,
     jobs,
-    details
+    details,
+    allowance,
 )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print(f"Starting application in {settings.APP_ENV} environment...")
+    background_tasks = []
     try:
         await init_db()
         print("Database connection initialized successfully.")
+
+        # Start the background tasks once the models are initialized
+        background_tasks.append(asyncio.create_task(run_job_expiry_sweeper()))
+        background_tasks.append(
+            asyncio.create_task(run_job_recommendation_refresher())
+        )
+        background_tasks.append(asyncio.create_task(run_pledge_scheduler()))
     except Exception as e:
         print(f"An error occurred while initializing the database: {e}")
     yield
 
+    for task in background_tasks:
+        task.cancel()
+
 
 # Create FastAPI instance
 app = FastAPI(
@@ -84,6 +100,10 @@ app.include_router(
     details.router, prefix="/api/v1/foodlink/foodbank", tags=["FoodBank"]
 ) 
 
+app.include_router(
+    allowance.router, prefix="/api/v1/foodlink/foodbank", tags=["FoodBank"]
+)
+
 
 # Root endpoint for health checks or basic info
 @app.get("/")
@@ -0,0 +1,81 @@
+"""
+Rebuild the running donation counters from the donations collection.
+
+Run once with: python -m app.migrations.backfill_donation_counters
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from pymongo import ReplaceOne
+from app.db import init_db
+from app.models.donation import Donation, DonationCounter
+from app.services.donation_stats_service import GLOBAL_SCOPE, recent_cutoff_day
+
+
+def _add(counter: dict, row: dict, cutoff: str):
+    counter["total"] += row["amount"]
+    counter["donation_count"] += row["count"]
+
+    status = counter["by_status"].setdefault(row["_id"]["status"], {"amount": 0, "count": 0})
+    status["amount"] += row["amount"]
+    status["count"] += row["count"]
+
+    if row["_id"]["day"] >= cutoff:
+        day = counter["daily"].setdefault(row["_id"]["day"], {"amount": 0, "count": 0})
+        day["amount"] += row["amount"]
+        day["count"] += row["count"]
+
+
+async def migrate():
+    now = datetime.now(timezone.utc)
+    cutoff = recent_cutoff_day(now)
+
+    # Totals per foodbank, status and day, summed by MongoDB
+    pipeline = [
+        {
+            "$group": {
+                "_id": {
+                    "foodbank_id": "$foodbank_id",
+                    "status": "$status",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                },
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }
+        }
+    ]
+
+    counters = {}
+    async for row in Donation.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        for scope in [GLOBAL_SCOPE, row["_id"]["foodbank_id"]]:
+            counter = counters.setdefault(
+                scope,
+                {
+                    "scope": scope,
+                    "total": 0,
+                    "donation_count": 0,
+                    "by_status": {},
+                    "daily": {},
+                    "pruned_on": now.strftime("%Y-%m-%d"),
+                    "last_updated": now,
+                },
+            )
+            _add(counter, row, cutoff)
+
+    operations = [
+        ReplaceOne({"scope": scope}, counter, upsert=True)
+        for scope, counter in counters.items()
+    ]
+    if operations:
+        await DonationCounter.get_motor_collection().bulk_write(operations, ordered=False)
+
+    print(f"Rebuilt {len(operations)} donation counters.")
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Rebuild the daily donation rollups from the confirmed donations.
+
+Run once with: python -m app.migrations.backfill_donation_rollups
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from pymongo import ReplaceOne
+from app.db import init_db
+from app.models.donation import Donation, DonationDailyRollup, MAX_ROLLUP_AMOUNTS
+
+# Number of rollups written per bulk write
+BATCH_SIZE = 500
+
+
+async def migrate():
+    rollups = DonationDailyRollup.get_motor_collection()
+    now = datetime.now(timezone.utc)
+
+    pipeline = [
+        {"$match": {"status": "confirmed"}},
+        {
+            "$group": {
+                "_id": {
+                    "foodbank_id": "$foodbank_id",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+                "amounts": {"$push": "$amount"},
+            }
+        },
+    ]
+
+    rebuilt = 0
+    operations = []
+    async for row in Donation.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        operations.append(
+            ReplaceOne(
+                row["_id"],
+                {
+                    **row["_id"],
+                    "total": row["total"],
+                    "donation_count": row["count"],
+                    "amounts": row["amounts"][-MAX_ROLLUP_AMOUNTS:],
+                    "last_updated": now,
+                },
+                upsert=True,
+            )
+        )
+        if len(operations) >= BATCH_SIZE:
+            await rollups.bulk_write(operations, ordered=False)
+            rebuilt += len(operations)
+            operations = []
+    if operations:
+        await rollups.bulk_write(operations, ordered=False)
+        rebuilt += len(operations)
+
+    print(f"Rebuilt {rebuilt} daily donation rollups.")
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Rebuild the donor summaries and the per-foodbank donor totals from the
+confirmed donations.
+
+Run once with: python -m app.migrations.backfill_donor_summaries
+"""
+
+import asyncio
+from pymongo import ReplaceOne
+from app.db import init_db
+from app.models.donation import Donation, DonorSummary, DonorFoodbankTotal
+
+# Number of documents written per bulk write
+BATCH_SIZE = 500
+
+
+async def _flush(collection, operations):
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def migrate():
+    summaries = DonorSummary.get_motor_collection()
+    totals = DonorFoodbankTotal.get_motor_collection()
+
+    # One row per donor and foodbank, with the yearly totals of the pair
+    pipeline = [
+        {"$match": {"status": "confirmed"}},
+        {
+            "$group": {
+                "_id": {
+                    "donor_id": "$donor_id",
+                    "foodbank_id": "$foodbank_id",
+                    "year": {"$year": "$created_at"},
+                },
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+                "first": {"$min": "$created_at"},
+                "last": {"$max": "$created_at"},
+            }
+        },
+        {"$sort": {"_id.donor_id": 1}},
+    ]
+
+    rebuilt = 0
+    summary_operations = []
+    total_operations = []
+    donor = None
+    pairs = {}
+
+    def close_donor():
+        summary = {
+            "donor_id": donor,
+            "total": 0,
+            "donation_count": 0,
+            "by_foodbank": {},
+            "by_year": {},
+            "first_donation_at": None,
+            "last_donation_at": None,
+        }
+        for (foodbank_id, year), row in pairs.items():
+            for bucket in [
+                summary["by_foodbank"].setdefault(foodbank_id, {"amount": 0, "count": 0}),
+                summary["by_year"].setdefault(str(year), {"amount": 0, "count": 0}),
+            ]:
+                bucket["amount"] += row["amount"]
+                bucket["count"] += row["count"]
+            summary["total"] += row["amount"]
+            summary["donation_count"] += row["count"]
+            if summary["first_donation_at"] is None or row["first"] < summary["first_donation_at"]:
+                summary["first_donation_at"] = row["first"]
+            if summary["last_donation_at"] is None or row["last"] > summary["last_donation_at"]:
+                summary["last_donation_at"] = row["last"]
+
+        summary_operations.append(ReplaceOne({"donor_id": donor}, summary, upsert=True))
+
+        for foodbank_id, tally in summary["by_foodbank"].items():
+            last = max(
+                row["last"] for (pair_foodbank, _), row in pairs.items() if pair_foodbank == foodbank_id
+            )
+            total_operations.append(
+                ReplaceOne(
+                    {"foodbank_id": foodbank_id, "donor_id": donor},
+                    {
+                        "foodbank_id": foodbank_id,
+                        "donor_id": donor,
+                        "total": tally["amount"],
+                        "donation_count": tally["count"],
+                        "last_donation_at": last,
+                    },
+                    upsert=True,
+                )
+            )
+
+    async for row in Donation.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        if row["_id"]["donor_id"] != donor:
+            if donor is not None:
+                close_donor()
+            donor = row["_id"]["donor_id"]
+            pairs = {}
+        pairs[(row["_id"]["foodbank_id"], row["_id"]["year"])] = row
+
+        if len(summary_operations) >= BATCH_SIZE:
+            rebuilt += await _flush(summaries, summary_operations)
+            await _flush(totals, total_operations)
+            summary_operations.clear()
+            total_operations.clear()
+
+    if donor is not None:
+        close_donor()
+    rebuilt += await _flush(summaries, summary_operations)
+    await _flush(totals, total_operations)
+
+    print(f"Rebuilt {rebuilt} donor summaries.")
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
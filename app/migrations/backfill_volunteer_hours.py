@@ -0,0 +1,172 @@
+"""
+Copy the volunteer and foodbank IDs onto the volunteer activities and rebuild
+the monthly volunteer hours rollups from them.
+
+Run once with: python -m app.migrations.backfill_volunteer_hours
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+from app.db import init_db
+from app.models.application import Application
+from app.models.event import Event
+from app.models.volunteer_activity import VolunteerActivity, VolunteerHoursRollup
+
+# Number of activities updated per bulk write
+BATCH_SIZE = 500
+
+
+async def _backfill_batch(activities, batch):
+    applications_collection = Application.get_motor_collection()
+    events_collection = Event.get_motor_collection()
+
+    application_ids = []
+    for document in batch:
+        try:
+            application_ids.append(PydanticObjectId(document["application_id"]))
+        except Exception:
+            continue
+
+    # Raw documents keep the event_id of event applications
+    applications = {
+        str(application["_id"]): application
+        async for application in applications_collection.find(
+            {"_id": {"$in": application_ids}},
+            {"volunteer_id": 1, "foodbank_id": 1, "event_id": 1},
+        )
+    }
+
+    # Event applications carry no foodbank ID, it comes from the event
+    event_ids = []
+    for application in applications.values():
+        if not application.get("foodbank_id") and application.get("event_id"):
+            try:
+                event_ids.append(PydanticObjectId(application["event_id"]))
+            except Exception:
+                continue
+    event_foodbanks = {
+        str(event["_id"]): event["foodbank_id"]
+        async for event in events_collection.find(
+            {"_id": {"$in": event_ids}}, {"foodbank_id": 1}
+        )
+    }
+
+    operations = []
+    for document in batch:
+        application = applications.get(document["application_id"])
+        if application is None:
+            continue
+        foodbank_id = application.get("foodbank_id") or event_foodbanks.get(
+            application.get("event_id")
+        )
+        operations.append(
+            UpdateOne(
+                {"_id": document["_id"]},
+                {
+                    "$set": {
+                        "volunteer_id": application["volunteer_id"],
+                        "foodbank_id": foodbank_id,
+                    }
+                },
+            )
+        )
+
+    if operations:
+        await activities.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def backfill_activities():
+    activities = VolunteerActivity.get_motor_collection()
+
+    updated = 0
+    batch = []
+    async for document in activities.find(
+        {"volunteer_id": None}, {"application_id": 1}
+    ):
+        batch.append(document)
+        if len(batch) >= BATCH_SIZE:
+            updated += await _backfill_batch(activities, batch)
+            batch = []
+    if batch:
+        updated += await _backfill_batch(activities, batch)
+
+    return updated
+
+
+async def rebuild_rollups():
+    rollups = VolunteerHoursRollup.get_motor_collection()
+
+    # Sum the hours of every volunteer per foodbank and month
+    pipeline = [
+        {"$match": {"volunteer_id": {"$ne": None}, "foodbank_id": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {
+                    "foodbank_id": "$foodbank_id",
+                    "month": {
+                        "$dateToString": {"format": "%Y-%m", "date": "$date_worked"}
+                    },
+                    "volunteer_id": "$volunteer_id",
+                },
+                "hours": {
+                    "$sum": {
+                        "$divide": [
+                            {
+                                "$subtract": [
+                                    "$working_hours.end",
+                                    "$working_hours.start",
+                                ]
+                            },
+                            3600000,
+                        ]
+                    }
+                },
+                "shifts": {"$sum": 1},
+            }
+        },
+    ]
+
+    now = datetime.now(timezone.utc)
+    operations = []
+    rebuilt = 0
+    async for row in VolunteerActivity.get_motor_collection().aggregate(pipeline):
+        operations.append(
+            UpdateOne(
+                row["_id"],
+                {
+                    "$set": {
+                        "hours": row["hours"],
+                        "shifts": row["shifts"],
+                        "last_updated": now,
+                    }
+                },
+                upsert=True,
+            )
+        )
+        if len(operations) >= BATCH_SIZE:
+            await rollups.bulk_write(operations, ordered=False)
+            rebuilt += len(operations)
+            operations = []
+    if operations:
+        await rollups.bulk_write(operations, ordered=False)
+        rebuilt += len(operations)
+
+    return rebuilt
+
+
+async def migrate():
+    updated = await backfill_activities()
+    rebuilt = await rebuild_rollups()
+    print(f"Backfilled {updated} volunteer activities and rebuilt {rebuilt} hours rollups.")
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
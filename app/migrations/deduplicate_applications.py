@@ -0,0 +1,121 @@
+"""
+Collapse the duplicate applications of a volunteer to the same job so that the
+unique (volunteer_id, job_id) index can be built, then tag the event applications
+that were written before the discriminator existed.
+
+Run once, before starting the new version of the API, with:
+python -m app.migrations.deduplicate_applications
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from pymongo import UpdateMany
+from app.db import get_database, init_db
+from app.models.application import Application, EventApplication
+
+# Number of duplicate groups resolved per batch
+BATCH_SIZE = 500
+
+# The application kept out of a group of duplicates, best first
+STATUS_PRIORITY = {"approved": 0, "pending": 1, "rejected": 2}
+
+
+def _keep_order(application: dict):
+    applied_at = application.get("applied_at") or datetime.max
+    if applied_at.tzinfo is not None:
+        applied_at = applied_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return STATUS_PRIORITY.get(application.get("status"), 3), applied_at
+
+
+async def _collapse_batch(db, groups):
+    to_delete = []
+    activity_updates = []
+
+    for group in groups:
+        applications = sorted(group["applications"], key=_keep_order)
+        kept = str(applications[0]["_id"])
+        duplicates = applications[1:]
+        to_delete.extend(application["_id"] for application in duplicates)
+
+        # Activities of the removed applications move to the kept one
+        activity_updates.append(
+            UpdateMany(
+                {
+                    "application_id": {
+                        "$in": [str(application["_id"]) for application in duplicates]
+                    }
+                },
+                {"$set": {"application_id": kept}},
+            )
+        )
+
+    await db["volunteer_activities"].bulk_write(activity_updates, ordered=False)
+    result = await db["applications"].delete_many({"_id": {"$in": to_delete}})
+    return result.deleted_count
+
+
+async def collapse_duplicates():
+    # The Beanie models are not initialized yet, since building the unique
+    # index would fail while the duplicates exist
+    db = get_database()
+
+    pipeline = [
+        {
+            "$group": {
+                "_id": {"volunteer_id": "$volunteer_id", "job_id": "$job_id"},
+                "applications": {
+                    "$push": {
+                        "_id": "$_id",
+                        "status": "$status",
+                        "applied_at": "$applied_at",
+                    }
+                },
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+
+    removed = 0
+    batch = []
+    async for group in db["applications"].aggregate(pipeline, allowDiskUse=True):
+        batch.append(group)
+        if len(batch) >= BATCH_SIZE:
+            removed += await _collapse_batch(db, batch)
+            batch = []
+    if batch:
+        removed += await _collapse_batch(db, batch)
+
+    return removed
+
+
+async def tag_event_applications():
+    applications = Application.get_motor_collection()
+    class_id_key = Application.get_settings().class_id
+
+    event_applications = await applications.update_many(
+        {class_id_key: {"$exists": False}, "event_id": {"$exists": True}},
+        {"$set": {class_id_key: EventApplication._class_id}},
+    )
+    foodbank_applications = await applications.update_many(
+        {class_id_key: {"$exists": False}},
+        {"$set": {class_id_key: Application._class_id}},
+    )
+    return event_applications.modified_count, foodbank_applications.modified_count
+
+
+async def main():
+    removed = await collapse_duplicates()
+
+    # Builds the unique index now that the duplicates are gone
+    await init_db()
+    event_applications, foodbank_applications = await tag_event_applications()
+
+    print(
+        f"Removed {removed} duplicate applications, tagged {event_applications} event "
+        f"applications and {foodbank_applications} foodbank applications."
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
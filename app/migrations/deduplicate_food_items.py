@@ -0,0 +1,43 @@
+"""
+Remove the food items sharing a name so that the unique food_name index can be
+built. The earliest item of each name is kept, inventories reference food items
+by name so nothing else needs to change.
+
+Run once, before starting the new version of the API, with:
+python -m app.migrations.deduplicate_food_items
+"""
+
+import asyncio
+from app.db import get_database
+
+
+async def migrate():
+    # The Beanie models are not initialized, building the index would fail
+    food_items = get_database()["food_items"]
+
+    pipeline = [
+        {"$sort": {"added_on": 1, "_id": 1}},
+        {
+            "$group": {
+                "_id": "$food_name",
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+
+    duplicate_ids = []
+    async for group in food_items.aggregate(pipeline, allowDiskUse=True):
+        duplicate_ids.extend(group["ids"][1:])
+
+    removed = 0
+    if duplicate_ids:
+        result = await food_items.delete_many({"_id": {"$in": duplicate_ids}})
+        removed = result.deleted_count
+
+    print(f"Removed {removed} duplicate food items.")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
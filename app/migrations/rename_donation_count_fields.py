@@ -0,0 +1,44 @@
+"""
+Rename the count field of the donation counters, rollups and donor totals to
+donation_count, the name the models now use.
+
+Run once with: python -m app.migrations.rename_donation_count_fields
+"""
+
+import asyncio
+from app.db import init_db
+from app.models.donation import (
+    DonationCounter,
+    DonationDailyRollup,
+    DonorSummary,
+    DonorFoodbankTotal,
+)
+
+
+async def migrate():
+    for model in [DonationCounter, DonationDailyRollup, DonorSummary, DonorFoodbankTotal]:
+        collection = model.get_motor_collection()
+        # Donations recorded since the deploy already incremented donation_count
+        result = await collection.update_many(
+            {"count": {"$exists": True}},
+            [
+                {
+                    "$set": {
+                        "donation_count": {
+                            "$add": [{"$ifNull": ["$donation_count", 0]}, "$count"]
+                        }
+                    }
+                },
+                {"$unset": "count"},
+            ],
+        )
+        print(f"Renamed count in {result.modified_count} {collection.name} documents.")
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Move the event jobs into the polymorphic jobs collection.
+
+Run once with: python -m app.migrations.unify_job_collections
+"""
+
+import asyncio
+from pymongo import ReplaceOne
+from app.db import init_db
+from app.models.job import Job, EventJob
+
+# Number of documents copied per bulk write
+BATCH_SIZE = 500
+
+
+async def migrate():
+    jobs = Job.get_motor_collection()
+    class_id_key = Job.get_settings().class_id
+    legacy_event_jobs = jobs.database["event_jobs"]
+
+    # Copy the documents of the old event_jobs collection, keeping their IDs
+    copied = 0
+    operations = []
+    async for document in legacy_event_jobs.find({}):
+        document[class_id_key] = EventJob._class_id
+        operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+        if len(operations) >= BATCH_SIZE:
+            await jobs.bulk_write(operations, ordered=False)
+            copied += len(operations)
+            operations = []
+    if operations:
+        await jobs.bulk_write(operations, ordered=False)
+        copied += len(operations)
+
+    if copied:
+        await legacy_event_jobs.drop()
+
+    # Tag the documents that were written before the discriminator existed
+    event_jobs = await jobs.update_many(
+        {class_id_key: {"$exists": False}, "event_id": {"$exists": True}},
+        {"$set": {class_id_key: EventJob._class_id}},
+    )
+    foodbank_jobs = await jobs.update_many(
+        {class_id_key: {"$exists": False}},
+        {"$set": {class_id_key: Job._class_id}},
+    )
+
+    print(
+        f"Copied {copied} event jobs, tagged {event_jobs.modified_count} event jobs "
+        f"and {foodbank_jobs.modified_count} foodbank jobs."
+    )
+
+
+async def main():
+    await init_db()
+    await migrate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
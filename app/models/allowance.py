@@ -0,0 +1,38 @@
+from beanie import Document
+from typing import Literal
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, timezone
+
+
+class AllowancePolicy(Document):
+    foodbank_id: str
+    window: Literal["week", "month"] = "week"
+    limits: dict[str, float] = {}  # Maximum quantity per food category within the window
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "allowance_policies"
+        indexes = [IndexModel([("foodbank_id", ASCENDING)], unique=True)]
+
+
+class AllowanceCounter(Document):
+    individual_id: str
+    foodbank_id: str
+    category: str
+    reserved: dict[str, float] = {}  # Day (YYYY-MM-DD) -> quantity booked but not picked yet
+    collected: dict[str, float] = {}  # Day (YYYY-MM-DD) -> quantity picked up
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "allowance_counters"
+        indexes = [
+            IndexModel(
+                [
+                    ("individual_id", ASCENDING),
+                    ("foodbank_id", ASCENDING),
+                    ("category", ASCENDING),
+                ],
+                unique=True,
+            )
+        ]
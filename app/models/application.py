@@ -1,6 +1,8 @@
 from beanie import Document
 from datetime import datetime, timezone
 from typing import Literal, Optional
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
 
 
 class Application(Document):
@@ -9,12 +11,51 @@ class Application(Document):
     job_id: str
     category: str = "Foodbank"
     status: Literal["pending", "approved", "rejected"] = "pending"
-    applied_at: datetime = datetime.now(timezone.utc)
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # The shift is set when the application is approved
+    shift_start: Optional[datetime] = None
+    shift_end: Optional[datetime] = None
+    # Written by the bulk status updates, tells them which rows they actually changed
+    status_update_token: Optional[str] = None
 
     class Settings:
         collection = "applications"
+        # Foodbank and event applications share this collection, told apart by _class_id
+        is_root = True
+        indexes = [
+            # A volunteer applies at most once to a job, whatever its kind
+            IndexModel(
+                [("volunteer_id", ASCENDING), ("job_id", ASCENDING)],
+                unique=True,
+                name="unique_volunteer_job",
+            ),
+            # Approved shifts of a volunteer ordered by start, used to detect overlaps
+            IndexModel(
+                [
+                    ("volunteer_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("shift_start", ASCENDING),
+                ]
+            ),
+            # Rosters of a foodbank and of an event
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("shift_start", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("event_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("shift_start", ASCENDING),
+                ]
+            ),
+        ]
 
 
 class EventApplication(Application):
     event_id: str
     category: str = "Event"
+
@@ -1,6 +1,7 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from typing import Optional, Literal
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 from datetime import datetime, timezone
 
 # ✅ Fix `BaseModel` import
@@ -18,6 +19,49 @@ class Appointment(Document):
     product: list[AppointmentFoodItem]  # ✅ Fix the type if it's a list of objects
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))  # ✅ Fix timestamp issue
     last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    checkin_token: Optional[str] = None  # Signed token encoded in the pickup QR code
+    checked_in_at: Optional[datetime] = None
+    # Written by the bulk status updates, tells them which rows they actually changed
+    status_update_token: Optional[str] = None
 
     class Settings: 
         collection = "appointments"
+        indexes = [
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("start_time", ASCENDING),
+                ]
+            ),
+            # Appointment pages of a foodbank without a status filter, in keyset order
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("start_time", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            IndexModel([("individual_id", ASCENDING), ("start_time", ASCENDING)]),
+            IndexModel(
+                [("checkin_token", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"checkin_token": {"$type": "string"}},
+            ),
+        ]
+
+
+class AppointmentSummary(BaseModel):
+    """
+    Projection of an appointment containing only the fields shown in the listings
+    """
+
+    id: PydanticObjectId = Field(alias="_id")
+    individual_id: str
+    foodbank_id: str
+    start_time: datetime
+    end_time: datetime
+    description: Optional[str] = None
+    status: str
+    product: list[AppointmentFoodItem]
+    checkin_token: Optional[str] = None
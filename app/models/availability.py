@@ -0,0 +1,27 @@
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, timezone
+from typing import List
+
+
+class AvailabilitySlot(BaseModel):
+    weekday: int  # 0 is Monday, 6 is Sunday
+    start: str  # HH:MM, local time
+    end: str  # HH:MM, local time
+
+
+class VolunteerAvailability(Document):
+    volunteer_id: str
+    slots: List[AvailabilitySlot]
+    # Hours of the week fully covered by the slots, weekday * 24 + hour
+    buckets: List[int]
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "volunteer_availability"
+        indexes = [
+            IndexModel([("volunteer_id", ASCENDING)], unique=True),
+            # Multikey index answering "who is available during these hours"
+            IndexModel([("buckets", ASCENDING)]),
+        ]
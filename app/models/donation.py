@@ -1,15 +1,133 @@
 from beanie import Document
-from pydantic import Field
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from datetime import datetime, timezone
-from typing import Literal
+from typing import Dict, List, Literal, Optional
 
 class Donation(Document):
     donor_id: str  # Reference to a user (donor)
     amount: float
     status: Literal["pending", "confirmed", "failed"] = "pending"
     foodbank_id: str
+    pledge_id: Optional[str] = None  # Set on the donations created by a pledge
+    scheduled_for: Optional[datetime] = None  # The pledge period the donation pays
+    # False until a pledge donation has been added to the counters and rollups
+    recorded: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         collection = "donations"
+        indexes = [
+            IndexModel([("foodbank_id", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("donor_id", ASCENDING),
+                    ("created_at", DESCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("amount", DESCENDING),
+                ]
+            ),
+            # Donation history of a donor
+            IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING)]),
+            # A pledge pays each period once, even when the scheduler retries
+            IndexModel(
+                [("pledge_id", ASCENDING), ("scheduled_for", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"pledge_id": {"$type": "string"}},
+            ),
+        ]
+
+
+class DonationTally(BaseModel):
+    amount: float = 0
+    count: int = 0
+
+
+class DonationCounter(Document):
+    """
+    Running donation totals, maintained with $inc whenever a donation is created
+    """
+
+    scope: str  # "global" or the ID of a foodbank
+    total: float = 0
+    donation_count: int = 0  # Not named count, which would shadow Document.count()
+    by_status: Dict[str, DonationTally] = {}
+    daily: Dict[str, DonationTally] = {}  # YYYY-MM-DD -> tally, last 30 days
+    pruned_on: str = ""  # Last day the stale daily buckets were removed
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "donation_counters"
+        indexes = [IndexModel([("scope", ASCENDING)], unique=True)]
+
+
+# Largest number of amounts kept by a daily rollup, about 1MB of BSON
+MAX_ROLLUP_AMOUNTS = 50000
+
+
+class DonationDailyRollup(Document):
+    """
+    Confirmed donations of a foodbank during a day, maintained incrementally
+    """
+
+    foodbank_id: str
+    day: str  # YYYY-MM-DD, UTC
+    total: float = 0
+    donation_count: int = 0
+    # The donated amounts, for medians and percentiles. Capped to the latest
+    # MAX_ROLLUP_AMOUNTS so that a busy day stays far below the 16MB document limit,
+    # total and donation_count always cover every donation of the day
+    amounts: List[float] = []
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "donation_daily_rollups"
+        indexes = [
+            IndexModel([("foodbank_id", ASCENDING), ("day", ASCENDING)], unique=True)
+        ]
+
+
+class DonorSummary(Document):
+    """
+    Lifetime giving of a donor, maintained incrementally from confirmed donations
+    """
+
+    donor_id: str
+    total: float = 0
+    donation_count: int = 0
+    by_foodbank: Dict[str, DonationTally] = {}  # foodbank ID -> tally
+    by_year: Dict[str, DonationTally] = {}  # YYYY -> tally
+    first_donation_at: Optional[datetime] = None
+    last_donation_at: Optional[datetime] = None
+
+    class Settings:
+        collection = "donor_summaries"
+        indexes = [IndexModel([("donor_id", ASCENDING)], unique=True)]
+
+
+class DonorFoodbankTotal(Document):
+    """
+    Confirmed donations of a donor to a foodbank, read by the donor leaderboards
+    """
+
+    foodbank_id: str
+    donor_id: str
+    total: float = 0
+    donation_count: int = 0
+    last_donation_at: Optional[datetime] = None
+
+    class Settings:
+        collection = "donor_foodbank_totals"
+        indexes = [
+            IndexModel(
+                [("foodbank_id", ASCENDING), ("donor_id", ASCENDING)], unique=True
+            ),
+            IndexModel([("foodbank_id", ASCENDING), ("total", DESCENDING)]),
+        ]
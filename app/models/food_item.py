@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 from typing import Optional, Literal
 from pydantic import Field
 from beanie import Document
+from pymongo import IndexModel, ASCENDING
 
 class FoodItem(Document):
     food_name: str
@@ -17,3 +18,4 @@ class FoodItem(Document):
 
     class Settings:
         collection = "food_items"
+        indexes = [IndexModel([("food_name", ASCENDING)], unique=True)]
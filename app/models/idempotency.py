@@ -0,0 +1,29 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, timezone
+from typing import Literal, Optional
+from app.config import settings
+
+
+class IdempotencyRecord(Document):
+    key: str  # <user ID>:<Idempotency-Key header>
+    request_hash: str  # Fingerprint of the body the key was first used with
+    status: Literal["in_progress", "completed"] = "in_progress"
+    response: Optional[dict] = None  # Stored once the request completed
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # When the request in progress claimed the key, refreshed on takeover
+    claimed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Identifies the request holding the key, only it can complete or release it
+    claim_token: Optional[str] = None
+
+    class Settings:
+        collection = "idempotency_records"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+            # MongoDB removes the records once the retry window is over
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+            ),
+        ]
@@ -1,7 +1,8 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
 from datetime import datetime, timezone
-import pytz
-from typing import Literal
+from pymongo import IndexModel, ASCENDING, TEXT
+from typing import Literal, Optional
 
 
 class Job(Document):
@@ -10,24 +11,58 @@ class Job(Document):
     description: str
     location: str
     category: str
-    date_posted: datetime = datetime.now(timezone.utc)
+    date_posted: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     deadline: datetime
     status: Literal["available", "unavailable"] = "available"
 
     class Settings:
+        # Foodbank jobs and event jobs share this collection, told apart by _class_id
         collection = "jobs"
+        is_root = True
+        indexes = [
+            # Used by the expiry sweeper and by the listings of open jobs
+            IndexModel([("status", ASCENDING), ("deadline", ASCENDING)]),
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("deadline", ASCENDING),
+                ]
+            ),
+            IndexModel([("event_id", ASCENDING)], sparse=True),
+            # Full-text search over the postings, titles weigh the most
+            IndexModel(
+                [
+                    ("title", TEXT),
+                    ("description", TEXT),
+                    ("location", TEXT),
+                    ("category", TEXT),
+                ],
+                weights={"title": 10, "category": 5, "location": 3, "description": 1},
+                name="job_text_search",
+            ),
+        ]
 
-    async def check_and_update_status(self):
-        # Convert deadline datetime obj to offset-aware timezone
-        utc = pytz.UTC
-        deadline = utc.localize(self.deadline)
-        if deadline <= datetime.now(timezone.utc) and self.status != "unavailable":
-            self.status = "unavailable"
-            await self.save()
+    def is_expired(self) -> bool:
+        # Deadlines read back from MongoDB are naive UTC
+        deadline = self.deadline
+        if deadline.tzinfo is None:
+            deadline = deadline.replace(tzinfo=timezone.utc)
+        return deadline <= datetime.now(timezone.utc)
 
 
 class EventJob(Job):
     event_id: str
+    # Default shift given to the volunteers approved for this job
+    shift_start: Optional[datetime] = None
+    shift_end: Optional[datetime] = None
 
-    class Settings:
-        collection = "event_jobs"
+
+class JobTitle(BaseModel):
+    """
+    Projection of a job used to label applications
+    """
+
+    id: PydanticObjectId = Field(alias="_id")
+    title: str
+    category: str
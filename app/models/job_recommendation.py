@@ -0,0 +1,32 @@
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class RecommendedJob(BaseModel):
+    job_id: str
+    foodbank_id: str
+    event_id: Optional[str] = None
+    title: str
+    category: str
+    location: str
+    deadline: datetime
+    score: float
+
+
+class JobRecommendation(Document):
+    volunteer_id: str
+    category_weights: dict[str, float] = {}  # Affinity of the volunteer for each category
+    categories: list[str] = []  # Categories with a positive affinity, used to route new jobs
+    applied_job_ids: list[str] = []
+    jobs: list[RecommendedJob] = []  # Best jobs first
+    refreshed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "job_recommendations"
+        indexes = [
+            IndexModel([("volunteer_id", ASCENDING)], unique=True),
+            IndexModel([("categories", ASCENDING)]),
+        ]
@@ -0,0 +1,17 @@
+from beanie import Document
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime
+
+
+class SchedulerLease(Document):
+    """
+    Lease held by the single worker allowed to run a scheduler
+    """
+
+    name: str
+    owner: str
+    expires_at: datetime
+
+    class Settings:
+        collection = "scheduler_leases"
+        indexes = [IndexModel([("name", ASCENDING)], unique=True)]
@@ -0,0 +1,31 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+
+class DonationPledge(Document):
+    donor_id: str
+    foodbank_id: str
+    amount: float
+    frequency: Literal["weekly", "monthly"]
+    status: Literal["active", "paused", "cancelled"] = "active"
+    # The period paid by the next donation, monthly pledges keep their day of month
+    period_start: datetime
+    anchor_day: int
+    # When the scheduler picks the pledge next, later than period_start after a failure
+    next_run: datetime
+    failures: int = 0
+    last_error: Optional[str] = None
+    last_run_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "donation_pledges"
+        indexes = [
+            # The scheduler reads the due pledges in order
+            IndexModel([("status", ASCENDING), ("next_run", ASCENDING)]),
+            IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
@@ -0,0 +1,29 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+
+class ReceiptJob(Document):
+    """
+    Generation of the year-end donation receipts of a foodbank
+    """
+
+    foodbank_id: str
+    year: int
+    status: Literal["running", "completed", "failed"] = "running"
+    total_donors: int = 0
+    processed_donors: int = 0
+    # Donors are processed in ID order, the job resumes after this one
+    last_donor_id: Optional[str] = None
+    error: Optional[str] = None
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        collection = "receipt_jobs"
+        indexes = [
+            IndexModel([("foodbank_id", ASCENDING), ("year", ASCENDING)], unique=True)
+        ]
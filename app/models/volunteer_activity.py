@@ -1,6 +1,8 @@
 from beanie import Document
-from datetime import datetime
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from typing import Optional
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
 
 class WorkingHours(BaseModel):
@@ -10,6 +12,8 @@ class WorkingHours(BaseModel):
 
 class VolunteerActivity(Document):
     application_id: str
+    volunteer_id: Optional[str] = None  # Copied from the application
+    foodbank_id: Optional[str] = None  # Foodbank that recorded the activity
     date_worked: datetime
     foodbank_name: str
     category: str
@@ -17,3 +21,42 @@ class VolunteerActivity(Document):
 
     class Settings:
         collection = "volunteer_activities"
+        indexes = [
+            IndexModel([("application_id", ASCENDING)]),
+            IndexModel([("volunteer_id", ASCENDING), ("date_worked", DESCENDING)]),
+            IndexModel([("foodbank_id", ASCENDING), ("date_worked", DESCENDING)]),
+        ]
+
+
+class VolunteerHoursRollup(Document):
+    """
+    Hours worked by a volunteer for a foodbank during a month, maintained incrementally
+    """
+
+    foodbank_id: str
+    month: str  # YYYY-MM
+    volunteer_id: str
+    hours: float = 0
+    shifts: int = 0
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "volunteer_hours_rollups"
+        indexes = [
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("month", ASCENDING),
+                    ("volunteer_id", ASCENDING),
+                ],
+                unique=True,
+            ),
+            # Leaderboards read the rows of a month by decreasing hours
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("month", ASCENDING),
+                    ("hours", DESCENDING),
+                ]
+            ),
+        ]
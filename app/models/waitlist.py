@@ -0,0 +1,41 @@
+from beanie import Document
+from typing import Optional, Literal
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from datetime import datetime, timezone
+from app.models.appointment import AppointmentFoodItem
+
+
+class WaitlistEntry(Document):
+    individual_id: str
+    foodbank_id: str
+    start_time: datetime
+    end_time: datetime
+    description: Optional[str] = None
+    product: list[AppointmentFoodItem]
+    waiting_for: list[str]  # Food names that did not have enough stock
+    status: Literal[
+        "waiting", "promoting", "promoted", "expired", "cancelled", "rejected"
+    ] = "waiting"
+    # Set while a promotion pass holds the entry, only that pass may promote it
+    promotion_token: Optional[str] = None
+    # Why the entry was rejected, e.g. the pickup allowance is used up
+    rejection_reason: Optional[str] = None
+    appointment_id: Optional[str] = None  # Set once the entry becomes an appointment
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "appointment_waitlist"
+        indexes = [
+            # One ordered queue per foodbank and food item
+            IndexModel(
+                [
+                    ("foodbank_id", ASCENDING),
+                    ("waiting_for", ASCENDING),
+                    ("status", ASCENDING),
+                    ("created_at", ASCENDING),
+                ]
+            ),
+            IndexModel([("individual_id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Path
+from fastapi.responses import FileResponse
+from typing import Optional
+from datetime import datetime
 from app.services.donor_service import (
     create_donation_in_db,
     get_donations_by_user,
@@ -6,6 +9,21 @@ from app.services.donor_service import (
     retrieve_list_of_events_in_db,
 )
 
+from app.services.donation_stats_service import get_donor_summary_in_db
+from app.services.pledge_service import (
+    create_pledge_in_db,
+    get_pledges_by_donor,
+    update_pledge_in_db,
+)
+from app.services.receipt_service import (
+    list_donor_receipts_in_db,
+    get_donor_receipt_path,
+)
+from app.services.idempotency_service import (
+    begin_idempotent_request,
+    complete_idempotent_request,
+    release_idempotent_request,
+)
 from app.utils.jwt_handler import jwt_required
 
 router = APIRouter()
@@ -13,10 +31,13 @@ router = APIRouter()
 
 @router.post("/donations")
 async def create_donation(
-    payload: dict = Depends(jwt_required), donation_data: dict = {}
+    payload: dict = Depends(jwt_required),
+    donation_data: dict = {},
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     API Endpoint: Allow only donors to make a monetary donation.
+    A retried request with the same Idempotency-Key returns the original response.
     """
     if payload.get("role") != "donor":
         raise HTTPException(status_code=401, detail="Only donors can make donations")
@@ -35,30 +56,209 @@ async def create_donation(
             status_code=400, detail="Donation amount must be greater than zero"
         )
 
+    # Replay the stored response if this request was already processed
+    claim_token = None
+    if idempotency_key:
+        stored_response, claim_token = await begin_idempotent_request(
+            user_id=payload.get("sub"),
+            idempotency_key=idempotency_key,
+            body=donation_data,
+        )
+        if stored_response is not None:
+            return stored_response
+
     # Create the donation record
-    donation = await create_donation_in_db(
-        donor_id=payload.get("sub"), donation_data=donation_data
-    )
+    try:
+        donation = await create_donation_in_db(
+            donor_id=payload.get("sub"), donation_data=donation_data
+        )
+    except Exception:
+        if idempotency_key:
+            await release_idempotent_request(
+                user_id=payload.get("sub"),
+                idempotency_key=idempotency_key,
+                claim_token=claim_token,
+            )
+        raise
 
-    return {
+    response = {
         "status": "success",
         "message": "Donation recorded successfully",
         "donation": donation,
     }
 
+    if idempotency_key:
+        await complete_idempotent_request(
+            user_id=payload.get("sub"),
+            idempotency_key=idempotency_key,
+            claim_token=claim_token,
+            response=response,
+        )
+
+    return response
+
 
 @router.get("/donations")
-async def get_donations_for_donor(payload: dict = Depends(jwt_required)):
+async def get_donations_for_donor(
+    payload: dict = Depends(jwt_required),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page"),
+    limit: Optional[int] = Query(None, description="Number of donations per page"),
+):
     """
-    API Endpoint: Retrieve all donations made by the donor.
+    API Endpoint: Retrieve the donations made by the donor, newest first.
     """
     if payload.get("role") != "donor":
         raise HTTPException(
             status_code=401, detail="Only donors can retrieve donation details"
         )
 
-    donations = await get_donations_by_user(donor_id=payload.get("sub"))
-    return {"status": "success", "donations": donations}
+    donations, next_cursor = await get_donations_by_user(
+        donor_id=payload.get("sub"), cursor=cursor, limit=limit
+    )
+    return {"status": "success", "donations": donations, "next_cursor": next_cursor}
+
+
+@router.get("/donations/summary")
+async def get_donation_summary_for_donor(payload: dict = Depends(jwt_required)):
+    """
+    API Endpoint: Retrieve the lifetime, per-foodbank and per-year giving of the donor.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(
+            status_code=401, detail="Only donors can retrieve their donation summary"
+        )
+
+    summary = await get_donor_summary_in_db(donor_id=payload.get("sub"))
+    return {"status": "success", "summary": summary}
+
+
+@router.get("/receipts/{year}")
+async def get_donation_receipts(
+    year: int = Path(..., ge=2000, le=2100), payload: dict = Depends(jwt_required)
+):
+    """
+    API Endpoint: Retrieve the foodbanks that issued a receipt to the donor for a year.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(
+            status_code=401, detail="Only donors can retrieve their receipts"
+        )
+
+    receipts = await list_donor_receipts_in_db(donor_id=payload.get("sub"), year=year)
+    return {"status": "success", "receipts": receipts}
+
+
+@router.get("/receipts/{year}/{foodbank_id}")
+async def download_donation_receipt(
+    foodbank_id: str,
+    year: int = Path(..., ge=2000, le=2100),
+    payload: dict = Depends(jwt_required),
+):
+    """
+    API Endpoint: Download the receipt issued to the donor by a foodbank for a year.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(
+            status_code=401, detail="Only donors can download their receipts"
+        )
+
+    path = get_donor_receipt_path(
+        donor_id=payload.get("sub"), foodbank_id=foodbank_id, year=year
+    )
+    return FileResponse(
+        path, media_type="text/html", filename=f"receipt-{year}-{foodbank_id}.html"
+    )
+
+
+@router.post("/pledges")
+async def create_pledge(payload: dict = Depends(jwt_required), pledge_data: dict = {}):
+    """
+    API Endpoint: Allow donors to set up a weekly or monthly recurring donation.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(status_code=401, detail="Only donors can make pledges")
+
+    required_key = ["amount", "foodbank_id", "frequency"]
+
+    # Validate required keys
+    for key in required_key:
+        if not pledge_data.get(key):
+            raise HTTPException(
+                status_code=400, detail=f"{key} is required and cannot be empty"
+            )
+
+    if pledge_data["amount"] <= 0:
+        raise HTTPException(
+            status_code=400, detail="Pledge amount must be greater than zero"
+        )
+
+    if pledge_data["frequency"] not in ["weekly", "monthly"]:
+        raise HTTPException(
+            status_code=400, detail="Frequency must be either weekly or monthly"
+        )
+
+    start_date = None
+    if pledge_data.get("start_date"):
+        try:
+            start_date = datetime.fromisoformat(pledge_data["start_date"])
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="start_date must be in ISO format"
+            )
+
+    pledge = await create_pledge_in_db(
+        donor_id=payload.get("sub"),
+        foodbank_id=pledge_data["foodbank_id"],
+        amount=pledge_data["amount"],
+        frequency=pledge_data["frequency"],
+        start_date=start_date,
+    )
+
+    return {"status": "success", "pledge": pledge}
+
+
+@router.get("/pledges")
+async def get_pledges(payload: dict = Depends(jwt_required)):
+    """
+    API Endpoint: Retrieve the recurring donations of the donor.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(
+            status_code=401, detail="Only donors can retrieve their pledges"
+        )
+
+    pledges = await get_pledges_by_donor(donor_id=payload.get("sub"))
+    return {"status": "success", "pledges": pledges}
+
+
+@router.put("/pledges/{pledge_id}")
+async def update_pledge(
+    pledge_id: str, payload: dict = Depends(jwt_required), pledge_data: dict = {}
+):
+    """
+    API Endpoint: Allow donors to pause, resume or cancel a pledge, or change its amount.
+    """
+    if payload.get("role") != "donor":
+        raise HTTPException(
+            status_code=401, detail="Only donors can update their pledges"
+        )
+
+    status = pledge_data.get("status")
+    if status is not None and status not in ["active", "paused", "cancelled"]:
+        raise HTTPException(
+            status_code=400, detail="Status must be active, paused or cancelled"
+        )
+
+    amount = pledge_data.get("amount")
+    if amount is not None and amount <= 0:
+        raise HTTPException(
+            status_code=400, detail="Pledge amount must be greater than zero"
+        )
+
+    pledge = await update_pledge_in_db(
+        donor_id=payload.get("sub"), pledge_id=pledge_id, status=status, amount=amount
+    )
+    return {"status": "success", "pledge": pledge}
 
 
 @router.put("/metadata")
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Depends
+import math
+from app.utils.jwt_handler import jwt_required
+from app.services.allowance_service import (
+    get_allowance_policy_in_db,
+    set_allowance_policy_in_db,
+)
+
+router = APIRouter()
+
+
+@router.put("/allowance-policy")
+async def update_allowance_policy(
+    payload: dict = Depends(jwt_required), policy_data: dict = {}
+):
+    """
+    Allow food bank admin to limit how much each individual can collect per week or month
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param policy_data: The window (week or month) and the limits per food category
+    :return: The stored allowance policy
+    """
+
+    # Validate if the request is made from Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can update the allowance policy",
+        )
+
+    if policy_data.get("window") not in ["week", "month"]:
+        raise HTTPException(
+            status_code=400, detail="Window must be either week or month!"
+        )
+
+    limits = policy_data.get("limits")
+    if not isinstance(limits, dict):
+        raise HTTPException(
+            status_code=400, detail="limits is required and must map categories to quantities"
+        )
+
+    # Validate each limit
+    for category, limit in limits.items():
+        try:
+            limits[category] = float(limit)
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=400,
+                detail=f"The limit for '{category}' must be a number",
+            )
+        if not math.isfinite(limits[category]) or limits[category] <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The limit for '{category}' must be a positive value",
+            )
+
+    policy = await set_allowance_policy_in_db(
+        foodbank_id=payload.get("sub"),
+        window=policy_data["window"],
+        limits=limits,
+    )
+
+    return {"status": "success", "allowance_policy": policy}
+
+
+@router.get("/allowance-policy")
+async def get_allowance_policy(payload: dict = Depends(jwt_required)):
+    """
+    Allow food bank admin to retrieve the allowance policy
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+
+    # Validate if the request is made from Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the allowance policy",
+        )
+
+    policy = await get_allowance_policy_in_db(foodbank_id=payload.get("sub"))
+
+    if not policy:
+        raise HTTPException(status_code=404, detail="No allowance policy defined")
+
+    return {"status": "success", "allowance_policy": policy}
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from app.utils.jwt_handler import jwt_required
+from typing import Optional
+from datetime import datetime
 from app.services.foodbank.appointment_service import (
     get_list_appointments_in_db,
     update_appointment_status_in_db,
+    bulk_update_appointment_status_in_db,
+    check_in_appointment_in_db,
     reschedule_appointment_in_db,
     get_appointments_by_foodbank,
 )
@@ -11,9 +15,20 @@ router = APIRouter()
 
 
 @router.get("/appointments")
-async def fetch_appointments_by_foodbank(payload: dict = Depends(jwt_required)):
+async def fetch_appointments_by_foodbank(
+    payload: dict = Depends(jwt_required),
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = Query(
+        None, description="Earliest start time in ISO format"
+    ),
+    end_date: Optional[datetime] = Query(
+        None, description="Latest start time in ISO format"
+    ),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, description="Number of appointments per page"),
+):
     """
-    API route to get all appointments for a specific food bank.
+    API route to get a page of appointments for a specific food bank, ordered by start time.
     Only Food Bank Admins can access this route.
     """
     if payload.get("role") != "foodbank":
@@ -21,8 +36,25 @@ async def fetch_appointments_by_foodbank(payload: dict = Depends(jwt_required)):
             status_code=401, detail="Only FoodBank admins can access this route."
         )
 
-    appointments = await get_appointments_by_foodbank(payload.get("sub"))
-    return {"status": "success", "appointments": appointments}
+    if status and status not in ["scheduled", "picked", "cancelled", "rescheduled"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Status must be scheduled, picked, cancelled or rescheduled",
+        )
+
+    appointments, next_cursor = await get_appointments_by_foodbank(
+        payload.get("sub"),
+        status=status,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor,
+        limit=limit,
+    )
+    return {
+        "status": "success",
+        "appointments": appointments,
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get("/appointments")
@@ -107,6 +139,83 @@ async def update_status_of_appointment(
     return {"status": "success", "appointment": appointment}
 
 
+@router.put("/appointments/status")
+async def bulk_update_status_of_appointments(
+    payload: dict = Depends(jwt_required),
+    appointment_data: dict = {},
+):
+    """
+    Allow food bank admin to mark many appointments as picked or cancelled at once
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param appointment_data: A list of updates, each containing appointment_id and updated_status
+    :return a success message and the outcome for each appointment
+    """
+
+    # Validate if the request is made from Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can update the status of the appointments",
+        )
+
+    updates = appointment_data.get("updates")
+
+    if not updates or not isinstance(updates, list):
+        raise HTTPException(
+            status_code=400, detail="updates is required and cannot be empty"
+        )
+
+    for update in updates:
+        if not update.get("appointment_id"):
+            raise HTTPException(
+                status_code=400,
+                detail="Each update must contain a non-empty appointment_id",
+            )
+
+        if update.get("updated_status") not in ["picked", "cancelled"]:
+            raise HTTPException(
+                status_code=400,
+                detail="Status must be picked or cancelled!",
+            )
+
+    # Update the appointments in db
+    results = await bulk_update_appointment_status_in_db(
+        foodbank_id=payload.get("sub"), updates=updates
+    )
+
+    return {"status": "success", "results": results}
+
+
+@router.post("/appointments/checkin")
+async def check_in_appointment(
+    payload: dict = Depends(jwt_required), checkin_data: dict = {}
+):
+    """
+    Allow food bank staff to check in an individual by scanning their appointment QR code
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param checkin_data: The scanned qr_payload
+    :return the picked appointment
+    """
+
+    # Validate if the request is made from Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can check in an appointment",
+        )
+
+    if not checkin_data.get("qr_payload"):
+        raise HTTPException(
+            status_code=400, detail="qr_payload is required and cannot be empty"
+        )
+
+    appointment = await check_in_appointment_in_db(
+        foodbank_id=payload.get("sub"), qr_payload=checkin_data["qr_payload"]
+    )
+
+    return {"status": "success", "appointment": appointment}
+
+
 @router.put("/appointment/{appointment_id}/reschedule")
 async def reschedule_appointment(
     appointment_id: str,
@@ -1,11 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from app.utils.jwt_handler import jwt_required
 from app.services.foodbank.donation_service import (
+    build_donation_query,
     search_donations,
+    stream_donations_export,
     get_all_donations,
 )
+from app.services.donation_stats_service import (
+    get_donation_totals_in_db,
+    get_donor_leaderboard_in_db,
+)
+from app.services.foodbank.donation_analytics_service import (
+    get_donation_analytics_in_db,
+)
+from app.services.receipt_service import (
+    start_receipt_job_in_db,
+    run_receipt_job,
+    get_receipt_job_in_db,
+)
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime, timezone
 
 router = APIRouter()
 
@@ -40,6 +55,9 @@ async def search_for_donations(
     status: Optional[str] = None,
     min_amount: Optional[float] = Query(None, description="Minimum amount"),
     max_amount: Optional[float] = Query(None, description="Maximum amount"),
+    sort: str = Query("newest", description="newest, oldest, largest or smallest"),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page"),
+    limit: Optional[int] = Query(None, description="Number of donations per page"),
     payload: dict = Depends(jwt_required),
 ):
     """
@@ -50,7 +68,7 @@ async def search_for_donations(
             status_code=403, detail="Only foodbanks can search donations"
         )
 
-    donations = await search_donations(
+    query = build_donation_query(
         foodbank_id=payload.get("sub"),
         donor_id=donor_id,
         donation_id=donation_id,
@@ -60,5 +78,173 @@ async def search_for_donations(
         min_amount=min_amount,
         max_amount=max_amount,
     )
+    donations, next_cursor = await search_donations(
+        query=query, sort=sort, cursor=cursor, limit=limit
+    )
+
+    return {"status": "success", "donations": donations, "next_cursor": next_cursor}
+
+
+@router.get("/donations/export")
+async def export_donations(
+    format: str = Query("csv", description="csv or ndjson"),
+    donor_id: Optional[str] = None,
+    start_time: Optional[datetime] = Query(
+        None, description="Start time in ISO format"
+    ),
+    end_time: Optional[datetime] = Query(None, description="End time in ISO format"),
+    status: Optional[str] = None,
+    min_amount: Optional[float] = Query(None, description="Minimum amount"),
+    max_amount: Optional[float] = Query(None, description="Maximum amount"),
+    payload: dict = Depends(jwt_required),
+):
+    """
+    Export the donations matching the search criteria as a streamed file.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=403, detail="Only foodbanks can export donations"
+        )
+
+    if format not in ["csv", "ndjson"]:
+        raise HTTPException(
+            status_code=400, detail="format must be either csv or ndjson"
+        )
+
+    query = build_donation_query(
+        foodbank_id=payload.get("sub"),
+        donor_id=donor_id,
+        start_time=start_time,
+        end_time=end_time,
+        status=status,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_donations_export(query=query, format=format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=donations.{format}"},
+    )
+
+
+@router.get("/donations/summary")
+async def get_donation_summary_for_foodbank(payload: dict = Depends(jwt_required)):
+    """
+    API Endpoint: Retrieve the running donation totals of the foodbank.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401, detail="Only food banks can retrieve their donation totals"
+        )
+
+    totals = await get_donation_totals_in_db(foodbank_id=payload.get("sub"))
+
+    return {"status": "success", "donations": totals}
+
+
+@router.get("/donations/analytics")
+async def get_donation_analytics_for_foodbank(
+    start_date: Optional[date] = Query(None, description="First day, YYYY-MM-DD"),
+    end_date: Optional[date] = Query(None, description="Last day, YYYY-MM-DD"),
+    granularity: str = Query("month", description="day or month"),
+    compare_previous_year: bool = False,
+    payload: dict = Depends(jwt_required),
+):
+    """
+    API Endpoint: Retrieve the donation statistics of the foodbank, the current year by default.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401, detail="Only food banks can retrieve donation analytics"
+        )
+
+    if granularity not in ["day", "month"]:
+        raise HTTPException(
+            status_code=400, detail="granularity must be either day or month"
+        )
+
+    today = datetime.now(timezone.utc).date()
+    end_date = end_date or today
+    start_date = start_date or end_date.replace(month=1, day=1)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=400, detail="start_date must be before end_date"
+        )
+
+    analytics = await get_donation_analytics_in_db(
+        foodbank_id=payload.get("sub"),
+        start=start_date,
+        end=end_date,
+        granularity=granularity,
+        compare_previous_year=compare_previous_year,
+    )
+
+    return {"status": "success", "analytics": analytics}
+
+
+@router.get("/donors/leaderboard")
+async def get_donor_leaderboard_for_foodbank(
+    limit: int = Query(10, ge=1, le=100),
+    payload: dict = Depends(jwt_required),
+):
+    """
+    API Endpoint: Retrieve the donors who gave the most to the foodbank.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401, detail="Only food banks can retrieve their donor leaderboard"
+        )
+
+    leaderboard = await get_donor_leaderboard_in_db(
+        foodbank_id=payload.get("sub"), limit=limit
+    )
+
+    return {"status": "success", "donors": leaderboard}
+
+
+@router.post("/receipts/{year}")
+async def generate_donation_receipts(
+    background_tasks: BackgroundTasks,
+    year: int = Path(..., ge=2000, le=2100),
+    payload: dict = Depends(jwt_required),
+):
+    """
+    API Endpoint: Start generating the year-end receipts of every donor of the foodbank.
+    An interrupted generation resumes where it stopped.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401, detail="Only food banks can generate donation receipts"
+        )
+
+    if year >= datetime.now(timezone.utc).year:
+        raise HTTPException(
+            status_code=400, detail="Receipts can only be generated for a past year"
+        )
+
+    job = await start_receipt_job_in_db(foodbank_id=payload.get("sub"), year=year)
+
+    # The generation runs after the response is sent
+    background_tasks.add_task(run_receipt_job, payload.get("sub"), year)
+
+    return {"status": "success", "receipt_job": job}
+
+
+@router.get("/receipts/{year}")
+async def get_donation_receipts_progress(
+    year: int = Path(..., ge=2000, le=2100),
+    payload: dict = Depends(jwt_required),
+):
+    """
+    API Endpoint: Retrieve the progress of the year-end receipt generation.
+    """
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401, detail="Only food banks can retrieve donation receipts"
+        )
+
+    job = await get_receipt_job_in_db(foodbank_id=payload.get("sub"), year=year)
 
-    return {"status": "success", "donations": donations}
+    return {"status": "success", "receipt_job": job}
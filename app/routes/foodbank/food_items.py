@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from app.utils.jwt_handler import jwt_required
 from app.services.foodbank.food_items_service import (
     get_food_items_in_db,
     add_a_food_item_in_db,
 )
+from app.services.food_catalog_service import autocomplete_food_items
 
 router = APIRouter()
 
@@ -57,4 +58,31 @@ async def get_food_items(payload: dict = Depends(jwt_required)):
     # Retrieve food items from the db
     food_items = await get_food_items_in_db()
 
-    return {"status": "success", "food_items": food_items}
\ No newline at end of file
+    return {"status": "success", "food_items": food_items}
+
+
+# Route to suggest food items while a name is being typed
+@router.get("/food-items/autocomplete")
+async def autocomplete_food_item_names(
+    payload: dict = Depends(jwt_required),
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Allow food bank admin to find food items from a partially typed name.
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param q: The text typed so far, matched on the start of any word of the names and
+    fuzzily to tolerate typos.
+    :param limit: The maximum number of suggestions.
+    :return: A list of suggestions with food_name, category, unit and the kind of match.
+    """
+    # Validate if the request is made from a Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can search the food items of the inventory",
+        )
+
+    suggestions = await autocomplete_food_items(query=q, limit=limit)
+
+    return {"status": "success", "suggestions": suggestions}
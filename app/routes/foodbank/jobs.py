@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from app.services.user_service import get_user_by_id
 from app.utils.jwt_handler import jwt_required
 from app.services.foodbank.job_service import (
@@ -8,6 +8,7 @@ from app.services.foodbank.job_service import (
     list_event_job_in_db,
     update_existing_job_info_in_db,
 )
+from app.services.recommendation_service import add_job_to_recommendations_in_db
 
 from app.models.event import Event
 from beanie import PydanticObjectId
@@ -16,7 +17,11 @@ router = APIRouter()
 
 
 @router.post("/job")
-async def post_a_new_job(payload: dict = Depends(jwt_required), job_data: dict = {}):
+async def post_a_new_job(
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(jwt_required),
+    job_data: dict = {},
+):
     """
     Allow foodbank admin to create a new job within foodbank for the volunteer
     :param payload: Decoded JWT containing user claims (validated via jwt_required).
@@ -62,12 +67,17 @@ async def post_a_new_job(payload: dict = Depends(jwt_required), job_data: dict =
     # Add a new job in db
     job = await add_a_new_job_in_db(foodbank_id=payload.get("sub"), job_data=job_data)
 
+    # Offer the new job to the volunteers it suits once the response is sent
+    background_tasks.add_task(add_job_to_recommendations_in_db, job)
+
     return {"status": "success", "job": job}
 
 
 @router.post("/event-job")
 async def post_a_new_event_job(
-    payload: dict = Depends(jwt_required), job_data: dict = {}
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(jwt_required),
+    job_data: dict = {},
 ):
     """
     Allow foodbank admin to create a new job for specific event
@@ -118,11 +128,25 @@ async def post_a_new_event_job(
             detail="Status of a job must be either available or unavailable!",
         )
 
+    # The shift is optional but needs both ends
+    if bool(job_data.get("shift_start")) != bool(job_data.get("shift_end")):
+        raise HTTPException(
+            status_code=400,
+            detail="shift_start and shift_end must be given together",
+        )
+    if job_data.get("shift_start") and job_data["shift_start"] >= job_data["shift_end"]:
+        raise HTTPException(
+            status_code=400, detail="shift_end must be after shift_start"
+        )
+
     # Add a new job in db
     job = await add_a_new_event_job_in_db(
         foodbank_id=payload.get("sub"), job_data=job_data
     )
 
+    # Offer the new job to the volunteers it suits once the response is sent
+    background_tasks.add_task(add_job_to_recommendations_in_db, job)
+
     return {"status": "success", "job": job}
 
 
@@ -139,16 +163,19 @@ async def get_list_of_jobs(payload: dict = Depends(jwt_required)):
             status_code=401, detail="Only FoodBank admin can get the list of jobs"
         )
 
-    jobs = await list_foodbank_job_in_db()
+    jobs = await list_foodbank_job_in_db(foodbank_id=payload.get("sub"))
 
     return {"status": "success", "jobs": jobs}
 
 
 @router.get("/event-jobs")
-async def get_list_of_jobs(payload: dict = Depends(jwt_required)):
+async def get_list_of_jobs(
+    payload: dict = Depends(jwt_required), event_id: str | None = None
+):
     """
-    Allow foodbank admin to retrieve the list of jobs
+    Allow foodbank admin to retrieve the list of event jobs
     :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param event_id: Optional event ID used to filter the jobs
     """
 
     # Validate if the request is made from Foodbank admin
@@ -157,7 +184,9 @@ async def get_list_of_jobs(payload: dict = Depends(jwt_required)):
             status_code=401, detail="Only FoodBank admin can get the list of jobs"
         )
 
-    jobs = await list_event_job_in_db()
+    jobs = await list_event_job_in_db(
+        foodbank_id=payload.get("sub"), event_id=event_id
+    )
 
     return {"status": "success", "jobs": jobs}
 
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from datetime import datetime, timezone
 from app.services.user_service import get_user_by_id
 from app.utils.jwt_handler import jwt_required
 from app.services.foodbank.volunteer_management_service import (
     get_list_volunteer_in_db,
     update_application_status_in_db,
+    bulk_update_application_status_in_db,
     get_list_foodbank_application_in_db,
     get_application_detail,
     get_job_detail_in_db,
     add_volunteer_activity_in_db,
+    get_volunteer_hours_leaderboard_in_db,
+    get_volunteer_hours_totals_in_db,
+    get_event_roster_in_db,
+    get_daily_roster_in_db,
+)
+from app.services.availability_service import match_volunteers_for_event_job_in_db
+from app.services.recommendation_service import (
+    refresh_volunteer_recommendations_in_db,
 )
 
 router = APIRouter()
@@ -45,6 +55,53 @@ async def get_list_volunteer_application(
     return {"status": "success", "volunteers": volunteers}
 
 
+@router.put("/volunteers/status")
+async def bulk_update_status_of_applications(
+    payload: dict = Depends(jwt_required),
+    application_data: dict = {},
+):
+    """
+    Allow food bank admin to approve or reject many applications at once
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param application_data: A list of updates, each containing application_id, updated_status
+    and optionally shift_start and shift_end
+    :return a success message and the outcome for each application
+    """
+
+    # Validate if the request is made from Foodbank user
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can update the status of the applications!",
+        )
+
+    updates = application_data.get("updates")
+
+    if not updates or not isinstance(updates, list):
+        raise HTTPException(
+            status_code=400, detail="updates is required and cannot be empty"
+        )
+
+    for update in updates:
+        if not update.get("application_id"):
+            raise HTTPException(
+                status_code=400,
+                detail="Each update must contain a non-empty application_id",
+            )
+
+        if update.get("updated_status") not in ["approved", "rejected"]:
+            raise HTTPException(
+                status_code=400, detail="Status must be either approved or rejected!"
+            )
+
+    # Update the applications in db
+    results = await bulk_update_application_status_in_db(
+        foodbank_id=payload.get("sub"), updates=updates
+    )
+
+    return {"status": "success", "results": results}
+
+
 @router.put("/volunteers/{application_id}")
 async def update_status_of_application(
     application_id: str,
@@ -78,9 +135,28 @@ async def update_status_of_application(
             status_code=400, detail="Status must be either approved or rejected!"
         )
 
+    # The shift is optional but needs both ends
+    if bool(application_data.get("shift_start")) != bool(
+        application_data.get("shift_end")
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="shift_start and shift_end must be given together",
+        )
+    if (
+        application_data.get("shift_start")
+        and application_data["shift_start"] >= application_data["shift_end"]
+    ):
+        raise HTTPException(
+            status_code=400, detail="shift_end must be after shift_start"
+        )
+
     # Update the status of an application in db
     application = await update_application_status_in_db(
-        application_id=application_id, updated_status=application_data["updated_status"]
+        application_id=application_id,
+        updated_status=application_data["updated_status"],
+        shift_start=application_data.get("shift_start"),
+        shift_end=application_data.get("shift_end"),
     )
 
     return {"status": "success", "application": application}
@@ -152,7 +228,10 @@ async def get_list_volunteer_applications(
 
 @router.post("/volunteer-activity/{application_id}")
 async def add_volunteer_activity(
-    application_id: str, payload: dict = Depends(jwt_required), activity_data: dict = {}
+    application_id: str,
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(jwt_required),
+    activity_data: dict = {},
 ):
     """
     Allow foodbank admin to add the contribution hours for each application
@@ -197,10 +276,142 @@ async def add_volunteer_activity(
     # Add contribution hours for volunteer in db
     activity = await add_volunteer_activity_in_db(
         application_id=application_id,
+        volunteer_id=application_detail["volunteer_id"],
+        foodbank_id=payload.get("sub"),
         date_worked=activity_data["date_worked"],
         foodbank_name=foodbank["name"],
         category=job_detail["category"],
         working_hours=activity_data["working_hours"],
     )
 
+    # The new activity changes the volunteer's category affinity
+    background_tasks.add_task(
+        refresh_volunteer_recommendations_in_db, application_detail["volunteer_id"]
+    )
+
     return {"status": "success", "activity": activity}
+
+
+@router.get("/volunteer-hours/leaderboard")
+async def get_volunteer_hours_leaderboard(
+    payload: dict = Depends(jwt_required),
+    month: str | None = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Allow foodbank admin to retrieve the top volunteers of a month
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param month: The month in YYYY-MM format, the current month by default
+    :param limit: The number of volunteers in the leaderboard
+    """
+    # Validate if the request is made from Foodbank admin
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the volunteer leaderboard",
+        )
+
+    if not month:
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+
+    leaderboard = await get_volunteer_hours_leaderboard_in_db(
+        foodbank_id=payload.get("sub"), month=month, limit=limit
+    )
+
+    return {"status": "success", "volunteer_hours": leaderboard}
+
+
+@router.get("/volunteer-hours")
+async def get_volunteer_hours_totals(
+    payload: dict = Depends(jwt_required),
+    year: str | None = Query(None, pattern=r"^\d{4}$"),
+):
+    """
+    Allow foodbank admin to retrieve the volunteer hours of every month of a year
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param year: The year in YYYY format, the current year by default
+    """
+    # Validate if the request is made from Foodbank admin
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the volunteer hours",
+        )
+
+    if not year:
+        year = str(datetime.now(timezone.utc).year)
+
+    totals = await get_volunteer_hours_totals_in_db(
+        foodbank_id=payload.get("sub"), year=year
+    )
+
+    return {"status": "success", "volunteer_hours": totals}
+
+
+@router.get("/roster/event/{event_id}")
+async def get_event_roster(event_id: str, payload: dict = Depends(jwt_required)):
+    """
+    Allow foodbank admin to retrieve the shifts of the approved volunteers of an event
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param event_id: The event ID
+    """
+    # Validate if the request is made from Foodbank admin
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the volunteer roster",
+        )
+
+    roster = await get_event_roster_in_db(
+        foodbank_id=payload.get("sub"), event_id=event_id
+    )
+
+    return {"status": "success", "roster": roster}
+
+
+@router.get("/roster")
+async def get_daily_roster(
+    payload: dict = Depends(jwt_required),
+    date: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
+):
+    """
+    Allow foodbank admin to retrieve every volunteer shift of a day
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param date: The day in YYYY-MM-DD format
+    """
+    # Validate if the request is made from Foodbank admin
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the volunteer roster",
+        )
+
+    roster = await get_daily_roster_in_db(foodbank_id=payload.get("sub"), day=date)
+
+    return {"status": "success", "date": date, "roster": roster}
+
+
+@router.get("/event-job/{job_id}/available-volunteers")
+async def get_available_volunteers_for_event_job(
+    job_id: str,
+    payload: dict = Depends(jwt_required),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Allow foodbank admin to retrieve the volunteers to invite for an event job shift
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param job_id: The unique identifier for the event job
+    :param limit: Maximum number of volunteers returned
+    """
+    # Validate if the request is made from Foodbank admin
+    if payload.get("role") != "foodbank":
+        raise HTTPException(
+            status_code=401,
+            detail="Only FoodBank admin can retrieve the available volunteers",
+        )
+
+    matches = await match_volunteers_for_event_job_in_db(
+        foodbank_id=payload.get("sub"), job_id=job_id, limit=limit
+    )
+
+    return {"status": "success", "available_volunteers": matches}
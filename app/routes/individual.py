@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from app.utils.jwt_handler import jwt_required
+from typing import Optional
+from datetime import datetime
 from app.services.individual_service import create_appointment_in_db
 from app.services.individual_service import get_appointments_by_individual
 from app.services.individual_service import (
     get_inventory_in_db,
     update_individual_detailed_info_in_db,
     retrieve_list_of_events_in_db,
+    get_appointment_checkin_payload_in_db,
+)
+from app.services.allowance_service import get_allowance_usage_in_db
+from app.services.waitlist_service import (
+    get_waitlist_by_individual,
+    cancel_waitlist_entry_in_db,
 )
 
 router = APIRouter()
@@ -44,18 +52,74 @@ async def request_an_appointment(
         individual_id=payload.get("sub"), appointment_data=appointment_data
     )
 
+    # The request has been queued until the foodbank is restocked
+    if appointment["status"] == "waiting":
+        return {
+            "status": "waitlisted",
+            "message": "Not enough stock yet, the request has been added to the waitlist",
+            "waitlist_entry": appointment,
+        }
+
     return {"status": "success", "appointment": appointment}
 
 
 @router.get("/appointments")
-async def fetch_appointments_by_individual(payload: dict = Depends(jwt_required)):
+async def fetch_appointments_by_individual(
+    payload: dict = Depends(jwt_required),
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = Query(
+        None, description="Earliest start time in ISO format"
+    ),
+    end_date: Optional[datetime] = Query(
+        None, description="Latest start time in ISO format"
+    ),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, description="Number of appointments per page"),
+):
     """
-    API route to get all appointments for a specific individual.
+    API route to get a page of appointments for a specific individual, ordered by start time.
     Only Food Bank Admins can access this route.
     """
 
-    appointments = await get_appointments_by_individual(payload.get("sub"))
-    return {"status": "success", "appointments": appointments}
+    appointments, next_cursor = await get_appointments_by_individual(
+        payload.get("sub"),
+        status=status,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor,
+        limit=limit,
+    )
+    return {
+        "status": "success",
+        "appointments": appointments,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/appointment/{appointment_id}/checkin")
+async def retrieve_appointment_checkin_code(
+    appointment_id: str, payload: dict = Depends(jwt_required)
+):
+    """
+    Allow individual to retrieve the QR payload shown at pickup
+    :param appointment_id: A unique identifier for the appointment
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+
+    # Validate if the request is made from individual
+    if payload.get("role") != "individual":
+        raise HTTPException(
+            status_code=401, detail="Only individual can retrieve their check-in code"
+        )
+
+    checkin = await get_appointment_checkin_payload_in_db(
+        individual_id=payload.get("sub"), appointment_id=appointment_id
+    )
+
+    if not checkin:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+
+    return {"status": "success", "checkin": checkin}
 
 
 @router.get("/inventory/{foodbank_id}")
@@ -126,3 +190,73 @@ async def retrieve_list_of_ongoing_events(payload: dict = Depends(jwt_required))
     events = await retrieve_list_of_events_in_db()
 
     return {"status": "success", "events": events}
+
+
+@router.get("/waitlist")
+async def retrieve_waitlist(payload: dict = Depends(jwt_required)):
+    """
+    Allow individual to retrieve their waitlisted appointment requests
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+
+    # Validate if the request is made from individual
+    if payload.get("role") != "individual":
+        raise HTTPException(
+            status_code=401, detail="Only individual can retrieve their waitlist"
+        )
+
+    waitlist = await get_waitlist_by_individual(individual_id=payload.get("sub"))
+
+    return {"status": "success", "waitlist": waitlist}
+
+
+@router.delete("/waitlist/{entry_id}")
+async def leave_waitlist(entry_id: str, payload: dict = Depends(jwt_required)):
+    """
+    Allow individual to withdraw a waitlisted appointment request
+    :param entry_id: A unique identifier for the waitlist entry
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+
+    # Validate if the request is made from individual
+    if payload.get("role") != "individual":
+        raise HTTPException(
+            status_code=401, detail="Only individual can leave the waitlist"
+        )
+
+    cancelled = await cancel_waitlist_entry_in_db(
+        individual_id=payload.get("sub"), entry_id=entry_id
+    )
+
+    if not cancelled:
+        raise HTTPException(
+            status_code=404, detail="Waitlist entry not found or no longer waiting"
+        )
+
+    return {"status": "success", "message": "You have left the waitlist."}
+
+
+@router.get("/allowance/{foodbank_id}")
+async def retrieve_allowance(foodbank_id: str, payload: dict = Depends(jwt_required)):
+    """
+    Allow individual to check how much they can still collect from a foodbank
+    :param foodbank_id: A unique identifier for the foodbank
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+
+    # Validate if the request is made from individual
+    if payload.get("role") != "individual":
+        raise HTTPException(
+            status_code=401, detail="Only individual can retrieve their allowance"
+        )
+
+    allowance = await get_allowance_usage_in_db(
+        individual_id=payload.get("sub"), foodbank_id=foodbank_id
+    )
+
+    if not allowance:
+        raise HTTPException(
+            status_code=404, detail="This foodbank does not limit the pickups"
+        )
+
+    return {"status": "success", "allowance": allowance}
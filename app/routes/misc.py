@@ -5,7 +5,10 @@ from cloudinary.utils import cloudinary_url
 from app.models.service import Service
 from app.models.contact import Contact
 from app.models.user import User
-from app.models.donation import Donation
+from app.services.donation_stats_service import (
+    get_donation_totals_in_db,
+    get_donation_breakdown_in_db,
+)
 from app.config import settings
 
 # Load environment variables
@@ -144,16 +147,25 @@ async def retrieve_list_of_users():
 @router.get("/donations")
 async def get_donations_for_foodbank():
     """
-    API Endpoint: Retrieve all donations for foodbank.
+    API Endpoint: Retrieve the donation totals of every foodbank.
+    """
+    totals = await get_donation_totals_in_db()
+
+    return {
+        "status": "success",
+        **totals,
+    }
+
+@router.get("/donations/breakdown")
+async def get_donation_breakdown():
+    """
+    API Endpoint: Retrieve the donation totals of each foodbank.
     """
-    total_donations = 0
-    donations = await Donation.find().to_list()
-    for donation in donations:
-        total_donations += donation.amount
+    breakdown = await get_donation_breakdown_in_db()
 
     return {
         "status": "success",
-        "total_donations": total_donations,
+        "foodbanks": breakdown,
     }
 
 @router.post("/upload/")
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from typing import Optional
 from app.utils.jwt_handler import jwt_required
 from app.services.volunteer_service import (
     add_foodbank_job_application_in_db,
     add_event_application_in_db,
     retrieve_list_jobs_in_db,
+    search_jobs_in_db,
     delete_application,
     retrieve_applied_job_in_db,
     retrieve_specific_job_in_db,
@@ -11,13 +13,23 @@ from app.services.volunteer_service import (
     update_metadata_in_db,
     retrieve_list_of_events_in_db,
 )
+from app.services.availability_service import (
+    set_availability_in_db,
+    get_availability_in_db,
+)
+from app.services.recommendation_service import (
+    get_recommended_jobs_in_db,
+    refresh_volunteer_recommendations_in_db,
+)
 
 router = APIRouter()
 
 
 @router.post("/application/event")
 async def apply_available_jobs_for_event(
-    payload: dict = Depends(jwt_required), application_data: dict = {}
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(jwt_required),
+    application_data: dict = {},
 ):
     """
     Allow volunteer to submit the application to specific event for specific food bank
@@ -45,13 +57,24 @@ async def apply_available_jobs_for_event(
         event_id=application_data["event_id"],
         job_id=application_data["job_id"],
     )
+    if new_application == False:
+        raise HTTPException(
+            status_code=409, detail="You have already applied for this job."
+        )
+
+    # Refresh the recommendations with the new application history
+    background_tasks.add_task(
+        refresh_volunteer_recommendations_in_db, payload.get("sub")
+    )
 
     return {"status": "success", "event_application": new_application}
 
 
 @router.post("/application/foodbank")
 async def apply_available_jobs_for_foodbank(
-    payload: dict = Depends(jwt_required), application_data: dict = {}
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(jwt_required),
+    application_data: dict = {},
 ):
     """
     Allow volunteer to submit the application to available positions from different foodbank
@@ -85,6 +108,11 @@ async def apply_available_jobs_for_foodbank(
             status_code=409, detail="You have already applied for this job."
         )
 
+    # Refresh the recommendations with the new application history
+    background_tasks.add_task(
+        refresh_volunteer_recommendations_in_db, payload.get("sub")
+    )
+
     return {"status": "success", "foodbank_application": new_application}
 
 
@@ -110,20 +138,76 @@ async def retrieve_available_job(payload: dict = Depends(jwt_required)):
     return {"status": "success", "jobs": jobs}
 
 
+@router.get("/jobs/search")
+async def search_available_jobs(
+    payload: dict = Depends(jwt_required),
+    q: str = Query(..., min_length=1, description="Words to search for"),
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Search the available foodbank and event jobs, ranked by relevance
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param q: Words to look for in the title, description, location and category
+    :param category: Optional category used to filter the jobs
+    :param location: Optional location used to filter the jobs
+    :return a page of matching jobs and the total number of matches
+    """
+
+    # Validate if the request is made from Volunteer
+    if payload.get("role") != "volunteer":
+        raise HTTPException(
+            status_code=401, detail="Only Volunteer can search the jobs"
+        )
+
+    jobs, total = await search_jobs_in_db(
+        search=q, category=category, location=location, page=page, limit=limit
+    )
+
+    return {
+        "status": "success",
+        "jobs": jobs,
+        "total": total,
+        "page": page,
+        "limit": limit,
+    }
+
+
+@router.get("/jobs/recommended")
+async def retrieve_recommended_jobs(payload: dict = Depends(jwt_required)):
+    """
+    Retrieve the jobs recommended for the volunteer, best match first
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :return a list of recommended jobs
+    """
+
+    # Validate if the request is made from Volunteer
+    if payload.get("role") != "volunteer":
+        raise HTTPException(
+            status_code=401, detail="Only Volunteer can get the recommended jobs"
+        )
+
+    jobs = await get_recommended_jobs_in_db(volunteer_id=payload.get("sub"))
+
+    return {"status": "success", "jobs": jobs}
+
+
 @router.get("/activity")
 async def retrieve_volunteer_activity(payload: dict = Depends(jwt_required)):
     """
     Retrieve the past activity of the volunteer
     :param payload: Decoded JWT containing user claims (validated via jwt_required).
-    :return the past activity
+    :return the past activity and a summary of the worked hours
     """
     if payload.get("role") != "volunteer":
         raise HTTPException(
             status_code=401, detail="Only Volunteer get the list of the jobs"
         )
     volunteer_id = payload.get("sub")
-    activity_list = await retrieve_volunteer_activity_in_db(volunteer_id)
-    return {"status": "success", "activity_list": activity_list}
+    activity_list, summary = await retrieve_volunteer_activity_in_db(volunteer_id)
+    return {"status": "success", "activity_list": activity_list, "summary": summary}
 
 
 @router.get("/job/{job_id}")
@@ -224,6 +308,50 @@ async def create_volunteer_metadata(
     return {"status": "success", "volunteer": volunteer}
 
 
+@router.put("/availability")
+async def set_volunteer_availability(
+    payload: dict = Depends(jwt_required), availability_data: dict = {}
+):
+    """
+    Allow volunteer to publish their recurring weekly availability
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    :param availability_data: A list of slots, each containing weekday (0 is Monday),
+    start and end (HH:MM)
+    """
+    # Validate if the request is made from Volunteer
+    if payload.get("role") != "volunteer":
+        raise HTTPException(
+            status_code=401, detail="Only Volunteer can update their availability"
+        )
+
+    slots = availability_data.get("slots")
+    if not isinstance(slots, list):
+        raise HTTPException(status_code=400, detail="slots is required")
+
+    availability = await set_availability_in_db(
+        volunteer_id=payload.get("sub"), slots=slots
+    )
+
+    return {"status": "success", "availability": availability}
+
+
+@router.get("/availability")
+async def get_volunteer_availability(payload: dict = Depends(jwt_required)):
+    """
+    Allow volunteer to retrieve their recurring weekly availability
+    :param payload: Decoded JWT containing user claims (validated via jwt_required).
+    """
+    # Validate if the request is made from Volunteer
+    if payload.get("role") != "volunteer":
+        raise HTTPException(
+            status_code=401, detail="Only Volunteer can retrieve their availability"
+        )
+
+    availability = await get_availability_in_db(volunteer_id=payload.get("sub"))
+
+    return {"status": "success", "availability": availability}
+
+
 @router.get("/events")
 async def retrieve_list_of_ongoing_events(payload: dict = Depends(jwt_required)):
     """
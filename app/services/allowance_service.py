@@ -0,0 +1,278 @@
+from app.models.allowance import AllowancePolicy, AllowanceCounter
+from app.services.food_catalog_service import get_food_items_by_names
+from fastapi import HTTPException
+from beanie.operators import In
+from pymongo import UpdateOne
+from datetime import datetime, timezone, timedelta, date
+from typing import List
+
+# Length of each rolling window in days
+WINDOW_DAYS = {"week": 7, "month": 30}
+
+# Daily buckets older than this are removed from the counters
+RETENTION_DAYS = 2 * WINDOW_DAYS["month"]
+
+
+def _to_day(value) -> date:
+    # Appointment times are either ISO strings from the request or datetimes from db
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+async def get_food_categories(food_names: List[str]) -> dict:
+    """
+    Resolve the category of each food name
+    :param food_names: A list of food names
+    :return: A dictionary of food name -> category
+    """
+    food_items = await get_food_items_by_names(food_names)
+    return {food_name: food_item.category for food_name, food_item in food_items.items()}
+
+
+def _quantities_by_category(products: List[dict], categories: dict) -> dict:
+    quantities = {}
+    for item in products:
+        category = categories.get(item["food_name"], "Others")
+        quantities[category] = quantities.get(category, 0) + item["quantity"]
+    return quantities
+
+
+def appointment_allowance_change(appointment, delta: dict) -> dict:
+    """
+    Describe how an appointment changes the allowance counters
+    :param appointment: An Appointment document
+    :param delta: The sign applied to each counter, e.g. {"reserved": -1, "collected": 1}
+    """
+    return {
+        "individual_id": appointment.individual_id,
+        "foodbank_id": appointment.foodbank_id,
+        "start_time": appointment.start_time,
+        "product": [item.model_dump() for item in appointment.product],
+        "delta": delta,
+    }
+
+
+async def _prune_counters(counters, day: date):
+    # Drop the daily buckets that can not be part of any window anymore. Retention
+    # counts from today too: an appointment booked far ahead must not drop the
+    # buckets of the pickups still to come
+    oldest_needed = min(day, datetime.now(timezone.utc).date())
+    retention_start = (oldest_needed - timedelta(days=RETENTION_DAYS)).isoformat()
+    operations = []
+
+    for counter in counters:
+        stale_keys = {
+            f"{field}.{bucket}": ""
+            for field in ["reserved", "collected"]
+            for bucket in getattr(counter, field)
+            if bucket < retention_start
+        }
+        if stale_keys:
+            operations.append(UpdateOne({"_id": counter.id}, {"$unset": stale_keys}))
+
+    if operations:
+        await AllowanceCounter.get_motor_collection().bulk_write(
+            operations, ordered=False
+        )
+
+
+async def check_allowance_in_db(
+    individual_id: str, foodbank_id: str, products: List[dict], start_time
+):
+    """
+    Make sure that a new appointment keeps the individual within the foodbank's allowance.
+    Every rolling window containing the appointment day is checked, using the daily
+    buckets of at most one counter per food category.
+    :param individual_id: ID of the individual making the appointment
+    :param foodbank_id: ID of the foodbank
+    :param products: The requested food names and quantities
+    :param start_time: The start time of the appointment
+    """
+    policy = await AllowancePolicy.find_one(AllowancePolicy.foodbank_id == foodbank_id)
+    if not policy or not policy.limits:
+        return
+
+    categories = await get_food_categories([item["food_name"] for item in products])
+    requested = _quantities_by_category(products, categories)
+    limited = [category for category in requested if category in policy.limits]
+    if not limited:
+        return
+
+    counters = await AllowanceCounter.find(
+        AllowanceCounter.individual_id == individual_id,
+        AllowanceCounter.foodbank_id == foodbank_id,
+        In(AllowanceCounter.category, limited),
+    ).to_list()
+    counters = {counter.category: counter for counter in counters}
+
+    window = WINDOW_DAYS[policy.window]
+    day = _to_day(start_time)
+
+    await _prune_counters(counters.values(), day)
+
+    for category in limited:
+        counter = counters.get(category)
+        daily = [0.0] * (2 * window - 1)
+
+        # Quantities for the days from (day - window + 1) to (day + window - 1)
+        if counter:
+            for offset in range(len(daily)):
+                key = (day + timedelta(days=offset - window + 1)).isoformat()
+                daily[offset] = counter.reserved.get(key, 0) + counter.collected.get(key, 0)
+
+        # Largest usage of any window that contains the appointment day
+        used = max(sum(daily[start : start + window]) for start in range(window))
+
+        if used + requested[category] > policy.limits[category]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Pickup allowance exceeded for {category}: {used} of {policy.limits[category]} already used this {policy.window}, requested {requested[category]}",
+            )
+
+
+async def apply_allowance_changes_in_db(changes: List[dict]):
+    """
+    Update the rolling allowance counters for a batch of appointments in a single write
+    :param changes: A list of changes built by appointment_allowance_change or with the same keys
+    """
+    if not changes:
+        return
+
+    try:
+        categories = await get_food_categories(
+            [item["food_name"] for change in changes for item in change["product"]]
+        )
+
+        now = datetime.now(timezone.utc)
+        increments = {}
+
+        for change in changes:
+            day = _to_day(change["start_time"]).isoformat()
+            quantities = _quantities_by_category(change["product"], categories)
+
+            for category, quantity in quantities.items():
+                key = (change["individual_id"], change["foodbank_id"], category)
+                inc = increments.setdefault(key, {})
+                for field, sign in change["delta"].items():
+                    bucket = f"{field}.{day}"
+                    inc[bucket] = inc.get(bucket, 0) + sign * quantity
+
+        operations = [
+            UpdateOne(
+                {
+                    "individual_id": individual_id,
+                    "foodbank_id": foodbank_id,
+                    "category": category,
+                },
+                {"$inc": inc, "$set": {"last_updated": now}},
+                upsert=True,
+            )
+            for (individual_id, foodbank_id, category), inc in increments.items()
+        ]
+
+        await AllowanceCounter.get_motor_collection().bulk_write(
+            operations, ordered=False
+        )
+    except Exception as e:
+        # The counters are derived data, a failed update must not fail the appointment
+        print(f"An error occurred while updating the allowance counters: {e}")
+
+
+async def get_allowance_usage_in_db(individual_id: str, foodbank_id: str):
+    """
+    Retrieve the allowance of an individual at a foodbank for the window ending today
+    :param individual_id: The ID of the individual
+    :param foodbank_id: The ID of the foodbank
+    """
+    try:
+        policy = await AllowancePolicy.find_one(
+            AllowancePolicy.foodbank_id == foodbank_id
+        )
+        if not policy:
+            return None
+
+        counters = await AllowanceCounter.find(
+            AllowanceCounter.individual_id == individual_id,
+            AllowanceCounter.foodbank_id == foodbank_id,
+        ).to_list()
+        counters = {counter.category: counter for counter in counters}
+
+        today = datetime.now(timezone.utc).date()
+        days = [
+            (today - timedelta(days=offset)).isoformat()
+            for offset in range(WINDOW_DAYS[policy.window])
+        ]
+
+        usage = []
+
+        for category, limit in policy.limits.items():
+            counter = counters.get(category)
+            used = 0
+            if counter:
+                used = sum(
+                    counter.reserved.get(day, 0) + counter.collected.get(day, 0)
+                    for day in days
+                )
+            usage.append(
+                {
+                    "category": category,
+                    "limit": limit,
+                    "used": used,
+                    "remaining": max(limit - used, 0),
+                }
+            )
+
+        return {"window": policy.window, "usage": usage}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while fetching the allowance usage: {e}",
+        )
+
+
+async def get_allowance_policy_in_db(foodbank_id: str):
+    """
+    Retrieve the pickup allowance policy of a foodbank
+    :param foodbank_id: The ID of the foodbank
+    """
+    policy = await AllowancePolicy.find_one(AllowancePolicy.foodbank_id == foodbank_id)
+
+    if not policy:
+        return None
+
+    policy = policy.model_dump()
+    policy["id"] = str(policy["id"])
+    return policy
+
+
+async def set_allowance_policy_in_db(foodbank_id: str, window: str, limits: dict):
+    """
+    Create or replace the pickup allowance policy of a foodbank
+    :param foodbank_id: The ID of the foodbank
+    :param window: The rolling window of the limits (week or month)
+    :param limits: Maximum quantity per food category within the window
+    """
+    try:
+        policy = await AllowancePolicy.find_one(
+            AllowancePolicy.foodbank_id == foodbank_id
+        )
+
+        if not policy:
+            policy = AllowancePolicy(foodbank_id=foodbank_id)
+
+        policy.window = window
+        policy.limits = limits
+        policy.last_updated = datetime.now(timezone.utc)
+        await policy.save()
+
+        policy = policy.model_dump()
+        policy["id"] = str(policy["id"])
+        return policy
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while saving the allowance policy: {e}",
+        )
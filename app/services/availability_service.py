@@ -0,0 +1,239 @@
+from app.models.availability import VolunteerAvailability, AvailabilitySlot
+from app.models.application import Application
+from app.models.event import Event
+from app.models.job import EventJob
+from app.services.user_service import get_user_names_by_ids
+from app.utils.time_converter import convert_utc_to_local
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+HOURS_PER_WEEK = 7 * 24
+
+# Number of available volunteers examined per query when matching an event job
+MATCH_BATCH_SIZE = 200
+
+
+class AvailableVolunteer(BaseModel):
+    """
+    Projection of an availability containing only the volunteer
+    """
+
+    id: PydanticObjectId = Field(alias="_id")
+    volunteer_id: str
+
+
+def _to_minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not 0 <= hours <= 24 or not 0 <= minutes < 60 or hours * 60 + minutes > 1440:
+        raise ValueError(f"{value} is not a valid time")
+    return hours * 60 + minutes
+
+
+def availability_buckets(slots: List[AvailabilitySlot]) -> List[int]:
+    """
+    Hours of the week fully covered by the given slots
+    :param slots: Weekly slots in local time
+    :return: Sorted buckets, weekday * 24 + hour
+    """
+    buckets = set()
+    for slot in slots:
+        # A slot from 9:30 covers the 10 o'clock hour onwards
+        first_hour = -(-_to_minutes(slot.start) // 60)
+        last_hour = _to_minutes(slot.end) // 60
+        for hour in range(first_hour, last_hour):
+            buckets.add(slot.weekday * 24 + hour)
+    return sorted(buckets)
+
+
+def shift_buckets(shift_start: datetime, shift_end: datetime) -> List[int]:
+    """
+    Hours of the week touched by a shift
+    :param shift_start: The start of the shift in UTC
+    :param shift_end: The end of the shift in UTC
+    :return: Buckets in local time, weekday * 24 + hour
+    """
+    start = convert_utc_to_local(shift_start)
+    end = convert_utc_to_local(shift_end)
+
+    buckets = []
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour < end and len(buckets) < HOURS_PER_WEEK:
+        buckets.append(hour.weekday() * 24 + hour.hour)
+        hour += timedelta(hours=1)
+    return buckets
+
+
+async def set_availability_in_db(volunteer_id: str, slots: List[dict]):
+    """
+    Create or replace the recurring weekly availability of a volunteer
+    :param volunteer_id: The unique identifier for volunteer
+    :param slots: Weekly slots, each containing weekday (0 is Monday), start and end (HH:MM)
+    """
+    try:
+        slots = [AvailabilitySlot(**slot) for slot in slots]
+        for slot in slots:
+            if not 0 <= slot.weekday <= 6:
+                raise ValueError("weekday must be between 0 (Monday) and 6 (Sunday)")
+            if _to_minutes(slot.start) >= _to_minutes(slot.end):
+                raise ValueError("end must be after start")
+        buckets = availability_buckets(slots)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid availability: {e}")
+
+    try:
+        availability = await VolunteerAvailability.find_one(
+            VolunteerAvailability.volunteer_id == volunteer_id
+        )
+
+        if not availability:
+            availability = VolunteerAvailability(
+                volunteer_id=volunteer_id, slots=[], buckets=[]
+            )
+
+        availability.slots = slots
+        availability.buckets = buckets
+        availability.last_updated = datetime.now(timezone.utc)
+        await availability.save()
+
+        availability = availability.model_dump()
+        availability["id"] = str(availability["id"])
+        return availability
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while saving the availability: {e}",
+        )
+
+
+async def get_availability_in_db(volunteer_id: str):
+    """
+    Retrieve the recurring weekly availability of a volunteer
+    :param volunteer_id: The unique identifier for volunteer
+    :return: The availability, or None if the volunteer did not publish any
+    """
+    try:
+        availability = await VolunteerAvailability.find_one(
+            VolunteerAvailability.volunteer_id == volunteer_id
+        )
+        if not availability:
+            return None
+
+        availability = availability.model_dump()
+        availability["id"] = str(availability["id"])
+        return availability
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the availability: {e}",
+        )
+
+
+async def match_volunteers_for_event_job_in_db(
+    foodbank_id: str, job_id: str, limit: int = 50
+):
+    """
+    Find the volunteers available for the whole shift of an event job
+    :param foodbank_id: A unique identifier for foodbank, owner of the job
+    :param job_id: The unique identifier for the event job
+    :param limit: Maximum number of volunteers returned
+    :return: The shift and the volunteers to invite, leaving out the ones already
+    booked on an overlapping shift or who already applied to the job, and has_more
+    when more volunteers are available than returned
+    """
+    try:
+        job = await EventJob.get(PydanticObjectId(job_id))
+    except Exception:
+        job = None
+    if not job or job.foodbank_id != foodbank_id:
+        raise HTTPException(status_code=404, detail="Event job not found!")
+
+    try:
+        # The job shift defaults to the hours of the event
+        shift_start, shift_end = job.shift_start, job.shift_end
+        if not shift_start or not shift_end:
+            try:
+                event = await Event.get(PydanticObjectId(job.event_id))
+            except Exception:
+                event = None
+            if not event:
+                raise HTTPException(status_code=404, detail="Event not found!")
+            shift_start, shift_end = event.start_time, event.end_time
+
+        buckets = shift_buckets(shift_start, shift_end)
+        available_ids = []
+        last_id = None
+        has_more = False
+
+        # Page through the volunteers available during every hour of the shift until
+        # enough of them are left once the busy ones are excluded
+        while True:
+            query = {"buckets": {"$all": buckets}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            candidates = (
+                await VolunteerAvailability.find(query)
+                .sort("+_id")
+                .limit(MATCH_BATCH_SIZE)
+                .project(AvailableVolunteer)
+                .to_list()
+            )
+            if not candidates:
+                break
+            last_id = candidates[-1].id
+            candidate_ids = [candidate.volunteer_id for candidate in candidates]
+
+            # Leave out the volunteers who are busy or already applied, in one query
+            excluded = await Application.find(
+                {
+                    "volunteer_id": {"$in": candidate_ids},
+                    "$or": [
+                        {"job_id": job_id},
+                        {
+                            "status": "approved",
+                            "shift_start": {"$lt": shift_end},
+                            "shift_end": {"$gt": shift_start},
+                        },
+                    ],
+                },
+                with_children=True,
+            ).to_list()
+            excluded_ids = {application.volunteer_id for application in excluded}
+
+            available_ids += [
+                volunteer_id
+                for volunteer_id in candidate_ids
+                if volunteer_id not in excluded_ids
+            ]
+            if len(available_ids) > limit:
+                has_more = True
+                break
+            if len(candidates) < MATCH_BATCH_SIZE:
+                break
+
+        available_ids = available_ids[:limit]
+        volunteer_names = await get_user_names_by_ids(available_ids)
+
+        return {
+            "job_id": job_id,
+            "shift_start": shift_start,
+            "shift_end": shift_end,
+            "has_more": has_more,
+            "volunteers": [
+                {
+                    "volunteer_id": volunteer_id,
+                    "volunteer_name": volunteer_names.get(volunteer_id, "Unknown"),
+                }
+                for volunteer_id in available_ids
+            ],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while matching the available volunteers: {e}",
+        )
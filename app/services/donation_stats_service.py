@@ -0,0 +1,338 @@
+from app.models.donation import (
+    Donation,
+    DonationCounter,
+    DonationDailyRollup,
+    DonorSummary,
+    DonorFoodbankTotal,
+    MAX_ROLLUP_AMOUNTS,
+)
+from app.services.user_service import get_user_names_by_ids
+from app.utils.ttl_cache import TTLCache
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from datetime import datetime, timedelta, timezone
+from typing import List
+import asyncio
+
+GLOBAL_SCOPE = "global"
+
+# Number of days covered by the recent totals
+RECENT_DAYS = 30
+
+# The public ticker is polled constantly, a few seconds of staleness is fine
+_totals_cache = TTLCache(maxsize=1024, ttl_seconds=10)
+
+
+def _day_of(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d")
+
+
+def recent_cutoff_day(now: datetime) -> str:
+    return _day_of(now - timedelta(days=RECENT_DAYS - 1))
+
+
+def counter_operations(scope: str, donations: list, now: datetime) -> list:
+    """
+    Build the writes adding donations to the running counters of a scope
+    :param scope: "global" or the ID of a foodbank
+    :param donations: The donations to add
+    :param now: The current time, used to prune the stale daily buckets
+    """
+    increments = {}
+    for donation in donations:
+        for key in [
+            "total",
+            f"by_status.{donation.status}.amount",
+            f"daily.{_day_of(donation.created_at)}.amount",
+        ]:
+            increments[key] = increments.get(key, 0) + donation.amount
+        for key in [
+            "donation_count",
+            f"by_status.{donation.status}.count",
+            f"daily.{_day_of(donation.created_at)}.count",
+        ]:
+            increments[key] = increments.get(key, 0) + 1
+
+    today = _day_of(now)
+    return [
+        UpdateOne(
+            {"scope": scope},
+            {"$inc": increments, "$set": {"last_updated": now}},
+            upsert=True,
+        ),
+        # Drop the daily buckets older than the recent window, once a day
+        UpdateOne(
+            {"scope": scope, "pruned_on": {"$ne": today}},
+            [
+                {
+                    "$set": {
+                        "daily": {
+                            "$arrayToObject": {
+                                "$filter": {
+                                    "input": {"$objectToArray": "$daily"},
+                                    "as": "day",
+                                    "cond": {"$gte": ["$$day.k", recent_cutoff_day(now)]},
+                                }
+                            }
+                        },
+                        "pruned_on": today,
+                    }
+                }
+            ],
+        ),
+    ]
+
+
+async def record_donations_in_db(donations: List[Donation]):
+    """
+    Add new donations to the counters and rollups, with one bulk write per collection.
+    Counters are derived data, a failure here must not fail the donations themselves.
+    :param donations: The created donations
+    """
+    if not donations:
+        return
+
+    now = datetime.now(timezone.utc)
+
+    # Each derived collection is written on its own, a failure of one must not skip
+    # the others
+    try:
+        by_foodbank = {}
+        for donation in donations:
+            by_foodbank.setdefault(donation.foodbank_id, []).append(donation)
+
+        operations = counter_operations(GLOBAL_SCOPE, donations, now)
+        for foodbank_id, foodbank_donations in by_foodbank.items():
+            operations += counter_operations(foodbank_id, foodbank_donations, now)
+        await DonationCounter.get_motor_collection().bulk_write(operations)
+    except Exception as e:
+        print(f"An error occurred while updating the donation counters: {e}")
+
+    # The rollups below feed the analytics and the donor pages, which only
+    # count confirmed donations
+    confirmed = [donation for donation in donations if donation.status == "confirmed"]
+    if not confirmed:
+        return
+
+    results = await asyncio.gather(
+        DonationDailyRollup.get_motor_collection().bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "foodbank_id": donation.foodbank_id,
+                        "day": _day_of(donation.created_at),
+                    },
+                    {
+                        "$inc": {"total": donation.amount, "donation_count": 1},
+                        "$push": {
+                            "amounts": {
+                                "$each": [donation.amount],
+                                "$slice": -MAX_ROLLUP_AMOUNTS,
+                            }
+                        },
+                        "$set": {"last_updated": now},
+                    },
+                    upsert=True,
+                )
+                for donation in confirmed
+            ]
+        ),
+        DonorSummary.get_motor_collection().bulk_write(
+            [
+                UpdateOne(
+                    {"donor_id": donation.donor_id},
+                    {
+                        "$inc": {
+                            "total": donation.amount,
+                            "donation_count": 1,
+                            f"by_foodbank.{donation.foodbank_id}.amount": donation.amount,
+                            f"by_foodbank.{donation.foodbank_id}.count": 1,
+                            f"by_year.{donation.created_at.year}.amount": donation.amount,
+                            f"by_year.{donation.created_at.year}.count": 1,
+                        },
+                        "$min": {"first_donation_at": donation.created_at},
+                        "$max": {"last_donation_at": donation.created_at},
+                    },
+                    upsert=True,
+                )
+                for donation in confirmed
+            ]
+        ),
+        DonorFoodbankTotal.get_motor_collection().bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "foodbank_id": donation.foodbank_id,
+                        "donor_id": donation.donor_id,
+                    },
+                    {
+                        "$inc": {"total": donation.amount, "donation_count": 1},
+                        "$max": {"last_donation_at": donation.created_at},
+                    },
+                    upsert=True,
+                )
+                for donation in confirmed
+            ]
+        ),
+        return_exceptions=True,
+    )
+    for name, result in zip(["daily rollups", "donor summaries", "donor totals"], results):
+        if isinstance(result, Exception):
+            print(f"An error occurred while updating the {name}: {result}")
+
+
+async def record_donation_in_db(donation: Donation):
+    """
+    Add a new donation to the counters and rollups
+    :param donation: The created donation
+    """
+    await record_donations_in_db([donation])
+
+
+def _format_counter(counter: DonationCounter, now: datetime) -> dict:
+    cutoff = recent_cutoff_day(now)
+    recent = [tally for day, tally in counter.daily.items() if day >= cutoff]
+    return {
+        "total_donations": round(counter.total, 2),
+        "donation_count": counter.donation_count,
+        "last_30_days": {
+            "amount": round(sum(tally.amount for tally in recent), 2),
+            "count": sum(tally.count for tally in recent),
+        },
+        "by_status": {
+            status: {"amount": round(tally.amount, 2), "count": tally.count}
+            for status, tally in counter.by_status.items()
+        },
+    }
+
+
+async def get_donation_totals_in_db(foodbank_id: str = None):
+    """
+    Retrieve the running donation totals, of every foodbank or of a single one
+    :param foodbank_id: A unique identifier for foodbank, all foodbanks if omitted
+    :return: The total, the count, the last 30 days and the per-status totals
+    """
+    scope = foodbank_id or GLOBAL_SCOPE
+    totals = _totals_cache.get(scope)
+    if totals is not None:
+        return totals
+
+    try:
+        counter = await DonationCounter.find_one(DonationCounter.scope == scope)
+        if not counter:
+            counter = DonationCounter(scope=scope)
+
+        totals = _format_counter(counter, datetime.now(timezone.utc))
+        _totals_cache.set(scope, totals)
+        return totals
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the donation totals: {e}",
+        )
+
+
+async def get_donation_breakdown_in_db():
+    """
+    Retrieve the running donation totals of every foodbank, largest first
+    """
+    try:
+        counters = (
+            await DonationCounter.find(DonationCounter.scope != GLOBAL_SCOPE)
+            .sort("-total")
+            .to_list()
+        )
+        foodbank_names = await get_user_names_by_ids(
+            counter.scope for counter in counters
+        )
+
+        now = datetime.now(timezone.utc)
+        breakdown = []
+        for counter in counters:
+            totals = _format_counter(counter, now)
+            totals["foodbank_id"] = counter.scope
+            totals["foodbank_name"] = foodbank_names.get(counter.scope, "Unknown")
+            breakdown.append(totals)
+
+        return breakdown
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the donation breakdown: {e}",
+        )
+
+
+async def get_donor_summary_in_db(donor_id: str):
+    """
+    Retrieve the lifetime giving of a donor
+    :param donor_id: The ID of the donor
+    :return: The lifetime, per-foodbank and per-year totals
+    """
+    try:
+        summary = await DonorSummary.find_one(DonorSummary.donor_id == donor_id)
+        if not summary:
+            summary = DonorSummary(donor_id=donor_id)
+
+        foodbank_names = await get_user_names_by_ids(summary.by_foodbank.keys())
+
+        return {
+            "total_donated": round(summary.total, 2),
+            "donation_count": summary.donation_count,
+            "first_donation_at": summary.first_donation_at,
+            "last_donation_at": summary.last_donation_at,
+            "by_foodbank": [
+                {
+                    "foodbank_id": foodbank_id,
+                    "foodbank_name": foodbank_names.get(foodbank_id, "Unknown"),
+                    "amount": round(tally.amount, 2),
+                    "count": tally.count,
+                }
+                for foodbank_id, tally in sorted(
+                    summary.by_foodbank.items(), key=lambda item: -item[1].amount
+                )
+            ],
+            "by_year": {
+                year: {"amount": round(tally.amount, 2), "count": tally.count}
+                for year, tally in sorted(summary.by_year.items())
+            },
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the donor summary: {e}",
+        )
+
+
+async def get_donor_leaderboard_in_db(foodbank_id: str, limit: int = 10):
+    """
+    Retrieve the donors who gave the most to a foodbank
+    :param foodbank_id: A unique identifier for foodbank
+    :param limit: The number of donors in the leaderboard
+    """
+    try:
+        rows = (
+            await DonorFoodbankTotal.find(DonorFoodbankTotal.foodbank_id == foodbank_id)
+            .sort("-total")
+            .limit(limit)
+            .to_list()
+        )
+        donor_names = await get_user_names_by_ids(row.donor_id for row in rows)
+
+        return [
+            {
+                "rank": rank,
+                "donor_id": row.donor_id,
+                "donor_name": donor_names.get(row.donor_id, "Unknown"),
+                "total": round(row.total, 2),
+                "count": row.donation_count,
+                "last_donation_at": row.last_donation_at,
+            }
+            for rank, row in enumerate(rows, start=1)
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the donor leaderboard: {e}",
+        )
@@ -4,6 +4,10 @@ from app.models.user import User
 from datetime import datetime, timezone
 from beanie import PydanticObjectId
 from app.models.event import Event, EventInventory
+from app.services.donation_stats_service import record_donation_in_db
+from app.services.user_service import get_user_names_by_ids
+from app.utils.pagination import build_keyset_filter, clamp_page_size, encode_cursor
+from typing import Optional
 
 
 async def create_donation_in_db(donor_id: str, donation_data: dict):
@@ -21,6 +25,10 @@ async def create_donation_in_db(donor_id: str, donation_data: dict):
             status="confirmed",
         )
         await new_donation.insert()
+
+        # Keep the running donation totals up to date
+        await record_donation_in_db(new_donation)
+
         donation = new_donation.model_dump()
         donation["id"] = str(donation["id"])
         return donation
@@ -30,22 +38,50 @@ async def create_donation_in_db(donor_id: str, donation_data: dict):
         )
 
 
-async def get_donations_by_user(donor_id: str):
+async def get_donations_by_user(
+    donor_id: str, cursor: Optional[str] = None, limit: Optional[int] = None
+):
     """
-    Retrieve all donations made by a specific donor.
+    Retrieve a page of the donations made by a specific donor, newest first.
     :param donor_id: The ID of the donor.
-    :return: A list of donation details.
+    :param cursor: The cursor returned with the previous page.
+    :param limit: The maximum number of donations in the page.
+    :return: A tuple of (donations, next_cursor).
     """
     donation_list = []
+    limit = clamp_page_size(limit)
     try:
-        donations = await Donation.find(Donation.donor_id == donor_id).to_list()
+        # Fetch one extra row to know if there is another page
+        donations = (
+            await Donation.find(
+                Donation.donor_id == donor_id,
+                build_keyset_filter("created_at", cursor, descending=True),
+            )
+            .sort("-created_at", "-_id")
+            .limit(limit + 1)
+            .to_list()
+        )
+
+        next_cursor = None
+        if len(donations) > limit:
+            donations = donations[:limit]
+            next_cursor = encode_cursor(donations[-1].created_at, donations[-1].id)
+
+        # Retrieve the foodbank names of the page at once
+        foodbank_names = await get_user_names_by_ids(
+            donation.foodbank_id for donation in donations
+        )
+
         for donation in donations:
             donation = donation.model_dump()
             donation["id"] = str(donation["id"])
-            
-            # Get donor 
+            donation["foodbank_name"] = foodbank_names.get(
+                donation["foodbank_id"], "Unknown"
+            )
             donation_list.append(donation)
-        return donation_list
+        return donation_list, next_cursor
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -0,0 +1,106 @@
+from app.models.food_item import FoodItem
+from app.utils.food_name_index import FoodNameIndex
+from app.utils.ttl_cache import TTLCache
+from beanie.operators import In
+from typing import Dict, Iterable, List, Optional
+import asyncio
+
+# Catalog writes update the cache of this process right away, the time to live
+# bounds how long other API workers can serve a stale catalog
+CATALOG_TTL_SECONDS = 300
+
+_catalog_cache = TTLCache(maxsize=1, ttl_seconds=CATALOG_TTL_SECONDS)
+_catalog_lock = asyncio.Lock()
+
+
+class _FoodCatalog:
+    def __init__(self, food_items: List[FoodItem]):
+        self.items = {food_item.food_name: food_item for food_item in food_items}
+        self.name_index = FoodNameIndex(self.items)
+
+
+async def _get_loaded_catalog() -> _FoodCatalog:
+    catalog = _catalog_cache.get("catalog")
+    if catalog is not None:
+        return catalog
+
+    # Concurrent requests on a cold cache wait for a single load
+    async with _catalog_lock:
+        catalog = _catalog_cache.get("catalog")
+        if catalog is None:
+            catalog = _FoodCatalog(await FoodItem.find().to_list())
+            _catalog_cache.set("catalog", catalog)
+        return catalog
+
+
+async def get_food_catalog() -> Dict[str, FoodItem]:
+    """
+    Retrieve the whole food item catalog, loaded once and shared by every request
+    :return: A dictionary of food name -> FoodItem, callers must not modify it
+    """
+    return (await _get_loaded_catalog()).items
+
+
+async def get_food_items_by_names(food_names: Iterable[str]) -> Dict[str, FoodItem]:
+    """
+    Look food items up by name in the catalog. Names missing from the catalog are
+    looked up in db, they may have been added by another API worker since it loaded.
+    :param food_names: The names of the food items
+    :return: A dictionary of food name -> FoodItem, unknown names are left out
+    """
+    catalog = await get_food_catalog()
+    food_names = set(food_names)
+    found = {name: catalog[name] for name in food_names if name in catalog}
+
+    missing = [name for name in food_names if name not in found]
+    if missing:
+        for food_item in await FoodItem.find(In(FoodItem.food_name, missing)).to_list():
+            add_to_food_catalog(food_item)
+            found[food_item.food_name] = food_item
+    return found
+
+
+async def get_food_item_by_name(food_name: str) -> Optional[FoodItem]:
+    """
+    Look a food item up by its name in the catalog, then in db
+    :param food_name: The name of the food item
+    """
+    return (await get_food_items_by_names([food_name])).get(food_name)
+
+
+async def autocomplete_food_items(query: str, limit: int = 10) -> List[dict]:
+    """
+    Suggest food items for a partially typed name
+    :param query: The text typed so far
+    :param limit: The maximum number of suggestions
+    :return: A list of food_name, category, unit and match ("prefix" or "fuzzy")
+    """
+    catalog = await _get_loaded_catalog()
+    suggestions = []
+    for match in catalog.name_index.search(query, limit):
+        food_item = catalog.items[match["food_name"]]
+        match["category"] = food_item.category
+        match["unit"] = food_item.unit
+        suggestions.append(match)
+    return suggestions
+
+
+def add_to_food_catalog(food_item: FoodItem):
+    """
+    Add a newly inserted food item to the cached catalog and its name index,
+    without reloading the catalog. Nothing is done when the catalog is not loaded.
+    :param food_item: The inserted food item
+    """
+    catalog = _catalog_cache.get("catalog")
+    if catalog is None:
+        return
+    catalog.items[food_item.food_name] = food_item
+    catalog.name_index.add(food_item.food_name)
+
+
+def invalidate_food_catalog():
+    """
+    Drop the cached catalog, the next read reloads it. Call it after catalog writes
+    that can not be applied with add_to_food_catalog.
+    """
+    _catalog_cache.clear()
@@ -1,7 +1,27 @@
-from app.models.appointment import Appointment
+from app.models.appointment import Appointment, AppointmentSummary
+from app.services.foodbank.inventory_service import restock_inventory_in_db
+from app.services.allowance_service import (
+    apply_allowance_changes_in_db,
+    appointment_allowance_change,
+)
 from fastapi import HTTPException
 from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import ReturnDocument, UpdateOne
+from app.utils.checkin_token import verify_checkin_token, parse_checkin_payload
 from datetime import datetime, timezone
+from typing import List, Optional
+import uuid
+from app.utils.pagination import build_keyset_filter, clamp_page_size, encode_cursor
+
+# Appointments in these statuses can no longer be picked up or cancelled
+FINAL_APPOINTMENT_STATUSES = ["picked", "cancelled"]
+
+# How each final status moves the quantities of an appointment in the allowance counters
+ALLOWANCE_DELTAS = {
+    "picked": {"reserved": -1, "collected": 1},
+    "cancelled": {"reserved": -1},
+}
 
 
 async def get_list_appointments_in_db(foodbank_id: str, status: str):
@@ -40,8 +60,27 @@ async def update_appointment_status_in_db(appointment_id: str, updated_status: s
     appointment = await Appointment.get(PydanticObjectId(appointment_id))
 
     try:
+        previous_status = appointment.status
         appointment.status = updated_status
+        appointment.last_updated = datetime.now(timezone.utc)
         await appointment.save()
+
+        if previous_status not in FINAL_APPOINTMENT_STATUSES:
+            await apply_allowance_changes_in_db(
+                [
+                    appointment_allowance_change(
+                        appointment, ALLOWANCE_DELTAS[updated_status]
+                    )
+                ]
+            )
+
+            # Release the reserved stock back to the inventory
+            if updated_status == "cancelled":
+                await restock_inventory_in_db(
+                    foodbank_id=appointment.foodbank_id,
+                    returned_items=[item.model_dump() for item in appointment.product],
+                )
+
         appointment = appointment.model_dump()
         appointment["id"] = str(appointment["id"])
 
@@ -53,6 +92,203 @@ async def update_appointment_status_in_db(appointment_id: str, updated_status: s
         )
 
 
+async def bulk_update_appointment_status_in_db(foodbank_id: str, updates: List[dict]):
+    """
+    Update the status of many appointments belonging to a foodbank at once
+    :param foodbank_id: A unique identifier for foodbank, used to validate the ownership
+    :param updates: A list of dictionaries containing appointment_id and updated_status
+    :return: A list of per-appointment outcomes
+    """
+
+    results = []
+    requested = {}
+
+    # Validate the given IDs before touching the db
+    for update in updates:
+        appointment_id = update.get("appointment_id")
+        try:
+            requested[PydanticObjectId(appointment_id)] = update["updated_status"]
+        except Exception:
+            results.append(
+                {
+                    "appointment_id": appointment_id,
+                    "result": "invalid",
+                    "detail": "Appointment ID is not valid",
+                }
+            )
+
+    try:
+        # Retrieve every requested appointment owned by the foodbank in one query
+        appointments = await Appointment.find(
+            In(Appointment.id, list(requested.keys())),
+            Appointment.foodbank_id == foodbank_id,
+        ).to_list()
+        appointments = {appointment.id: appointment for appointment in appointments}
+
+        now = datetime.now(timezone.utc)
+        pending = []
+
+        for appointment_id, updated_status in requested.items():
+            appointment = appointments.get(appointment_id)
+
+            if not appointment:
+                results.append(
+                    {
+                        "appointment_id": str(appointment_id),
+                        "result": "not_found",
+                        "detail": "Appointment not found for this foodbank",
+                    }
+                )
+                continue
+
+            if appointment.status in FINAL_APPOINTMENT_STATUSES:
+                results.append(
+                    {
+                        "appointment_id": str(appointment_id),
+                        "result": "skipped",
+                        "detail": f"Appointment is already {appointment.status}",
+                    }
+                )
+                continue
+
+            pending.append((appointment, updated_status))
+
+        # Only apply a change if nobody updated the status in the meantime. The token
+        # written along with the status tells which rows this request changed.
+        collection = Appointment.get_motor_collection()
+        token = uuid.uuid4().hex
+        updated_ids = set()
+        if pending:
+            await collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": appointment.id, "status": appointment.status},
+                        {
+                            "$set": {
+                                "status": updated_status,
+                                "last_updated": now,
+                                "status_update_token": token,
+                            }
+                        },
+                    )
+                    for appointment, updated_status in pending
+                ],
+                ordered=False,
+            )
+            updated_ids = {
+                document["_id"]
+                async for document in collection.find(
+                    {
+                        "_id": {"$in": [appointment.id for appointment, _ in pending]},
+                        "status_update_token": token,
+                    },
+                    {"_id": 1},
+                )
+            }
+
+        returned_items = []
+        allowance_changes = []
+
+        for appointment, updated_status in pending:
+            if appointment.id not in updated_ids:
+                results.append(
+                    {
+                        "appointment_id": str(appointment.id),
+                        "result": "conflict",
+                        "detail": "Appointment status was changed by another request",
+                    }
+                )
+                continue
+
+            allowance_changes.append(
+                appointment_allowance_change(
+                    appointment, ALLOWANCE_DELTAS[updated_status]
+                )
+            )
+
+            if updated_status == "cancelled":
+                returned_items.extend(
+                    item.model_dump() for item in appointment.product
+                )
+
+            results.append(
+                {
+                    "appointment_id": str(appointment.id),
+                    "result": "updated",
+                    "status": updated_status,
+                }
+            )
+
+        await apply_allowance_changes_in_db(allowance_changes)
+
+        # Release the reserved stock of every cancelled appointment in one write
+        await restock_inventory_in_db(
+            foodbank_id=foodbank_id, returned_items=returned_items
+        )
+
+        return results
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while updating the appointments in DB: {e}",
+        )
+
+
+async def check_in_appointment_in_db(foodbank_id: str, qr_payload: str):
+    """
+    Resolve a scanned check-in code and mark the appointment as picked in one atomic update
+    :param foodbank_id: A unique identifier for foodbank, the appointment must belong to it
+    :param qr_payload: The content of the scanned QR code (or the bare token)
+    :return: The picked appointment
+    """
+    token = parse_checkin_payload(qr_payload)
+
+    # Forged or mistyped codes are rejected without a db round trip
+    if not verify_checkin_token(token):
+        raise HTTPException(status_code=400, detail="Invalid check-in code")
+
+    now = datetime.now(timezone.utc)
+
+    try:
+        appointment = await Appointment.get_motor_collection().find_one_and_update(
+            {
+                "checkin_token": token,
+                "foodbank_id": foodbank_id,
+                "status": {"$nin": FINAL_APPOINTMENT_STATUSES},
+            },
+            {"$set": {"status": "picked", "checked_in_at": now, "last_updated": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while checking in the appointment: {e}",
+        )
+
+    if not appointment:
+        # Only the failure path pays for a second lookup to explain the outcome
+        existing = await Appointment.find_one(
+            Appointment.checkin_token == token,
+            Appointment.foodbank_id == foodbank_id,
+        )
+        if not existing:
+            raise HTTPException(
+                status_code=404, detail="No appointment found for this check-in code"
+            )
+        raise HTTPException(
+            status_code=409, detail=f"Appointment is already {existing.status}"
+        )
+
+    appointment = Appointment.model_validate(appointment)
+    await apply_allowance_changes_in_db(
+        [appointment_allowance_change(appointment, ALLOWANCE_DELTAS["picked"])]
+    )
+
+    appointment = appointment.model_dump()
+    appointment["id"] = str(appointment["id"])
+    return appointment
+
+
 async def reschedule_appointment_in_db(appointment_id: str, reschedule_data: dict):
     """
     Reschedules an appointment to a new date and time.
@@ -95,6 +331,12 @@ async def reschedule_appointment_in_db(appointment_id: str, reschedule_data: dic
                 status_code=400, detail="New time slot is not available."
             )
 
+        previous_reservation = None
+        if appointment.status not in FINAL_APPOINTMENT_STATUSES:
+            previous_reservation = appointment_allowance_change(
+                appointment, {"reserved": -1}
+            )
+
         # Update appointment details
         appointment.start_time = new_start_time
         appointment.end_time = new_end_time
@@ -104,6 +346,15 @@ async def reschedule_appointment_in_db(appointment_id: str, reschedule_data: dic
         # Save the updated appointment
         await appointment.save()
 
+        # Move the reserved quantities to the new day in the allowance counters
+        if previous_reservation:
+            await apply_allowance_changes_in_db(
+                [
+                    previous_reservation,
+                    appointment_allowance_change(appointment, {"reserved": 1}),
+                ]
+            )
+
         # Convert the updated appointment to a dictionary for response
         updated_appointment = appointment.model_dump()
         updated_appointment["id"] = str(updated_appointment["id"])
@@ -116,25 +367,91 @@ async def reschedule_appointment_in_db(appointment_id: str, reschedule_data: dic
         )
 
 
-async def get_appointments_by_foodbank(foodbank_id: str):
+async def get_appointment_page_in_db(
+    query: dict,
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
     """
-    Fetch all appointments for a specific food bank.
+    Retrieve a page of appointment summaries ordered by start time.
+
+    :param query: The base filter of the listing (owner of the appointments).
+    :param status: Optional status used to filter the appointments.
+    :param start_date: Optional lower bound of the appointment start time.
+    :param end_date: Optional upper bound of the appointment start time.
+    :param cursor: The cursor returned with the previous page.
+    :param limit: The maximum number of appointments in the page.
+    :return: A tuple of (appointments, next_cursor).
+    """
+    query = dict(query)
+    limit = clamp_page_size(limit)
+
+    if status:
+        query["status"] = status
+    if start_date or end_date:
+        query["start_time"] = {}
+        if start_date:
+            query["start_time"]["$gte"] = start_date
+        if end_date:
+            query["start_time"]["$lte"] = end_date
+
+    # Fetch one extra row to know if there is another page
+    appointments = (
+        await Appointment.find(query, build_keyset_filter("start_time", cursor))
+        .sort("+start_time", "+_id")
+        .limit(limit + 1)
+        .project(AppointmentSummary)
+        .to_list()
+    )
+
+    next_cursor = None
+    if len(appointments) > limit:
+        appointments = appointments[:limit]
+        next_cursor = encode_cursor(appointments[-1].start_time, appointments[-1].id)
+
+    appointment_list = []
+    for appointment in appointments:
+        appointment = appointment.model_dump()
+        appointment["id"] = str(appointment["id"])
+        appointment_list.append(appointment)
+
+    return appointment_list, next_cursor
+
+
+async def get_appointments_by_foodbank(
+    foodbank_id: str,
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Fetch a page of appointments for a specific food bank.
 
     :param foodbank_id: The ID of the food bank.
-    :return: A list of appointment objects.
+    :param status: Optional status used to filter the appointments.
+    :param start_date: Optional lower bound of the appointment start time.
+    :param end_date: Optional upper bound of the appointment start time.
+    :param cursor: The cursor returned with the previous page.
+    :param limit: The maximum number of appointments in the page.
+    :return: A tuple of (appointments, next_cursor).
     """
     try:
-        appointments = await Appointment.find(
-            Appointment.foodbank_id == foodbank_id
-        ).to_list()
-
-        # Convert ObjectId to string for JSON response
-        for appointment in appointments:
-            appointment = appointment.model_dump()
-            appointment["id"] = str(appointment["id"])
-
-        return appointments
+        return await get_appointment_page_in_db(
+            {"foodbank_id": foodbank_id},
+            status=status,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            limit=limit,
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,136 @@
+from app.models.donation import DonationDailyRollup
+from fastapi import HTTPException
+from datetime import date
+from typing import Literal
+import numpy as np
+
+# Percentiles reported for every bucket of the analytics
+PERCENTILES = [25, 75, 90]
+
+
+def _statistics(rollups: list) -> dict:
+    # Totals come from the counters of the rollups, which cover every donation even
+    # when the amounts of a busy day were capped
+    total = sum(rollup["total"] for rollup in rollups)
+    count = sum(rollup["donation_count"] for rollup in rollups)
+    amounts = _concatenate(rollup["amounts"] for rollup in rollups)
+
+    if count == 0 or amounts.size == 0:
+        return {
+            "total": 0,
+            "count": 0,
+            "average": None,
+            "median": None,
+            **{f"p{percentile}": None for percentile in PERCENTILES},
+        }
+
+    percentiles = np.percentile(amounts, PERCENTILES)
+    return {
+        "total": round(float(total), 2),
+        "count": int(count),
+        "average": round(float(total / count), 2),
+        "median": round(float(np.median(amounts)), 2),
+        **{
+            f"p{percentile}": round(float(value), 2)
+            for percentile, value in zip(PERCENTILES, percentiles)
+        },
+    }
+
+
+def _previous_year(value: date) -> date:
+    try:
+        return value.replace(year=value.year - 1)
+    except ValueError:
+        # February 29th
+        return value.replace(year=value.year - 1, day=28)
+
+
+async def _load_rollups(foodbank_id: str, start: date, end: date) -> dict:
+    # Raw documents, the amounts go straight into NumPy arrays
+    documents = (
+        DonationDailyRollup.get_motor_collection()
+        .find(
+            {
+                "foodbank_id": foodbank_id,
+                "day": {"$gte": start.isoformat(), "$lte": end.isoformat()},
+            },
+            {"_id": 0, "day": 1, "total": 1, "donation_count": 1, "amounts": 1},
+        )
+        .sort("day", 1)
+    )
+    return {
+        document["day"]: {
+            "total": document["total"],
+            "donation_count": document["donation_count"],
+            "amounts": np.asarray(document["amounts"], dtype=np.float64),
+        }
+        async for document in documents
+    }
+
+
+def _concatenate(arrays) -> np.ndarray:
+    arrays = list(arrays)
+    if not arrays:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(arrays)
+
+
+async def get_donation_analytics_in_db(
+    foodbank_id: str,
+    start: date,
+    end: date,
+    granularity: Literal["day", "month"] = "month",
+    compare_previous_year: bool = False,
+):
+    """
+    Compute the donation statistics of a foodbank from the daily rollups
+    :param foodbank_id: A unique identifier for foodbank
+    :param start: The first day of the report
+    :param end: The last day of the report
+    :param granularity: Whether the buckets of the report are days or months
+    :param compare_previous_year: Add the same period of the previous year to the report
+    :return: The statistics of every bucket and of the whole period
+    """
+    try:
+        daily_rollups = await _load_rollups(foodbank_id, start, end)
+
+        # Days are YYYY-MM-DD, so the month of a day is its first 7 characters
+        key_length = 10 if granularity == "day" else 7
+        grouped = {}
+        for day, rollup in daily_rollups.items():
+            grouped.setdefault(day[:key_length], []).append(rollup)
+
+        report = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity,
+            "summary": _statistics(list(daily_rollups.values())),
+            "buckets": [
+                {"period": period, **_statistics(rollups)}
+                for period, rollups in grouped.items()
+            ],
+        }
+
+        if compare_previous_year:
+            previous_rollups = await _load_rollups(
+                foodbank_id, _previous_year(start), _previous_year(end)
+            )
+            previous = _statistics(list(previous_rollups.values()))
+            current_total = report["summary"]["total"]
+            report["previous_year"] = {
+                "start": _previous_year(start).isoformat(),
+                "end": _previous_year(end).isoformat(),
+                "summary": previous,
+                "total_change_percent": (
+                    round((current_total - previous["total"]) / previous["total"] * 100, 2)
+                    if previous["total"]
+                    else None
+                ),
+            }
+
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while computing the donation analytics: {e}",
+        )
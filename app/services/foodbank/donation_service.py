@@ -1,8 +1,26 @@
 from app.models.donation import Donation
+from app.utils.pagination import build_keyset_filter, clamp_page_size, encode_cursor
 from fastapi import HTTPException
-from typing import List, Optional
+from typing import AsyncIterator, Optional
 from datetime import datetime
 from beanie import PydanticObjectId
+import csv
+import io
+import json
+
+# Sort options of the donation search: field and whether it is descending
+DONATION_SORTS = {
+    "newest": ("created_at", True),
+    "oldest": ("created_at", False),
+    "largest": ("amount", True),
+    "smallest": ("amount", False),
+}
+
+# Columns of the exported donations
+EXPORT_FIELDS = ["id", "donor_id", "foodbank_id", "amount", "status", "created_at"]
+
+# Number of donations fetched from MongoDB per round trip during an export
+EXPORT_BATCH_SIZE = 500
 
 
 async def get_all_donations(foodbank_id: str):
@@ -28,7 +46,7 @@ async def get_all_donations(foodbank_id: str):
         )
 
 
-async def search_donations(
+def build_donation_query(
     foodbank_id: str,
     donor_id: Optional[str] = None,
     donation_id: Optional[str] = None,
@@ -37,7 +55,10 @@ async def search_donations(
     status: Optional[str] = None,
     min_amount: Optional[float] = None,
     max_amount: Optional[float] = None,
-) -> List[Donation]:
+) -> dict:
+    """
+    Build the MongoDB filter shared by the donation search and the export
+    """
     query = {"foodbank_id": foodbank_id}
 
     if donor_id:
@@ -67,14 +88,104 @@ async def search_donations(
         else:
             query["amount"] = {"$lte": max_amount}
 
+    return query
+
+
+async def search_donations(
+    query: dict,
+    sort: str = "newest",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Retrieve a page of donations matching the search
+    :param query: The filter built by build_donation_query
+    :param sort: newest, oldest, largest or smallest
+    :param cursor: The cursor returned with the previous page
+    :param limit: The maximum number of donations in the page
+    :return: A tuple of (donations, next_cursor)
+    """
+    if sort not in DONATION_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort must be one of {', '.join(DONATION_SORTS)}",
+        )
+    field, descending = DONATION_SORTS[sort]
+    direction = "-" if descending else "+"
+    limit = clamp_page_size(limit)
+
     try:
-        donations = await Donation.find(query).to_list()
+        # Fetch one extra row to know if there is another page
+        donations = (
+            await Donation.find(query, build_keyset_filter(field, cursor, descending))
+            .sort(f"{direction}{field}", f"{direction}_id")
+            .limit(limit + 1)
+            .to_list()
+        )
+
+        next_cursor = None
+        if len(donations) > limit:
+            donations = donations[:limit]
+            next_cursor = encode_cursor(
+                getattr(donations[-1], field), donations[-1].id
+            )
+
         donation_list = [donation.model_dump() for donation in donations]
         for donation in donation_list:
             donation["id"] = str(donation["id"])
-        return donation_list
+        return donation_list, next_cursor
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"An error occurred while searching donations: {str(e)}",
         )
+
+
+def _export_row(document: dict) -> dict:
+    created_at = document.get("created_at")
+    return {
+        "id": str(document["_id"]),
+        "donor_id": document.get("donor_id"),
+        "foodbank_id": document.get("foodbank_id"),
+        "amount": document.get("amount"),
+        "status": document.get("status"),
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+async def stream_donations_export(query: dict, format: str) -> AsyncIterator[str]:
+    """
+    Stream the donations matching the search as CSV or NDJSON, one batch at a time
+    :param query: The filter built by build_donation_query
+    :param format: csv or ndjson
+    """
+    # Raw documents are enough here, parsing them into models would only slow the export
+    documents = (
+        Donation.get_motor_collection()
+        .find(query, {field: 1 for field in EXPORT_FIELDS if field != "id"})
+        .sort([("created_at", 1), ("_id", 1)])
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if format == "csv":
+        writer.writeheader()
+
+    rows = 0
+    async for document in documents:
+        row = _export_row(document)
+        if format == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + "\n")
+
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -5,6 +5,12 @@ from app.utils.time_converter import convert_string_time_to_iso
 from app.models.event import Event, EventInventory, EventInventoryFoodItem
 from typing import List
 from app.models.inventory import MainInventory
+from app.services.stock_service import (
+    add_stock_in_db,
+    merge_quantities,
+    take_stock_in_db,
+)
+from app.services.waitlist_service import promote_waitlist_in_db
 
 
 async def create_an_event_in_db(foodbank_id: str, event_data: dict):
@@ -235,16 +241,17 @@ async def add_event_inventory_to_db(
                     EventInventoryFoodItem(food_name=food_name, quantity=quantity)
                 )
 
-        # Update timestamps
-        main_inventory.last_updated = datetime.now(timezone.utc)
-        event_inventory.last_updated = datetime.now(timezone.utc)
+        # Take the items out of the main inventory atomically, the quantities checked
+        # above may have changed since they were read
+        if not await take_stock_in_db(foodbank_id, merge_quantities(stock_data)):
+            raise HTTPException(
+                status_code=409,
+                detail="The main inventory changed while moving the items, please retry.",
+            )
 
-        # Save changes
-        await main_inventory.save()
+        event_inventory.last_updated = datetime.now(timezone.utc)
         await event_inventory.save()
-        main_inventory = main_inventory.model_dump()
         event_inventory = event_inventory.model_dump()
-        main_inventory["id"] = str(main_inventory["id"])
         event_inventory["id"] = str(event_inventory["id"])
 
         return event_inventory
@@ -323,31 +330,32 @@ async def transfer_event_inventory_to_main_inventory_in_db(
                 status_code=404, detail="No inventory to transfer back."
             )
 
-        # Fetch main inventory for the food bank
-        main_inventory = await MainInventory.find_one(
-            MainInventory.foodbank_id == foodbank_id
+        # Clear event inventory
+        transferred_items = event_inventory.stock
+        event_inventory.stock = []
+        event_inventory.last_updated = datetime.now(timezone.utc)
+        await event_inventory.save()
+
+        # Transfer items back in a single atomic update of the main inventory
+        await add_stock_in_db(
+            foodbank_id,
+            merge_quantities(item.model_dump() for item in transferred_items),
         )
-        if not main_inventory:
-            main_inventory = MainInventory(foodbank_id=foodbank_id, stock=[])
 
-        # Transfer items back
-        for item in event_inventory.stock:
-            main_item = next(
-                (mi for mi in main_inventory.stock if mi.food_name == item.food_name),
-                None,
+        # Serve the queued appointment requests waiting for the transferred items, the
+        # transfer is saved even if the promotion fails
+        try:
+            await promote_waitlist_in_db(
+                foodbank_id=foodbank_id,
+                food_names=[item.food_name for item in transferred_items],
             )
-            if main_item:
-                main_item.quantity += item.quantity
-            else:
-                main_inventory.stock.append(item)
+        except Exception as e:
+            print(f"An error occurred while promoting the waitlist of {foodbank_id}: {e}")
 
-        # Clear event inventory
-        event_inventory.stock = []
-        event_inventory.last_updated = datetime.now(timezone.utc)
-        main_inventory.last_updated = datetime.now(timezone.utc)
+        main_inventory = await MainInventory.find_one(
+            MainInventory.foodbank_id == foodbank_id
+        )
 
-        await event_inventory.save()
-        await main_inventory.save()
         main_inventory = main_inventory.model_dump()
         event_inventory = event_inventory.model_dump()
         main_inventory["id"] = str(main_inventory["id"])
@@ -1,5 +1,12 @@
 from app.models.food_item import FoodItem
+from app.services.food_catalog_service import (
+    add_to_food_catalog,
+    get_food_catalog,
+    get_food_item_by_name,
+    invalidate_food_catalog,
+)
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from app.utils.time_converter import convert_string_time_to_iso
 from datetime import datetime, timezone
 
@@ -8,10 +15,8 @@ async def add_a_food_item_in_db(food_data: dict):
     Add a food item to the database.
     :param food_data: A dictionary containing food item data, including the expiration date, food name, category, etc.
     """
-    # Check if a food item with the same name already exists in the database
-    existing_food_item = await FoodItem.find_one(
-        FoodItem.food_name == food_data["food_name"]
-    )
+    # Check if a food item with the same name already exists in the catalog
+    existing_food_item = await get_food_item_by_name(food_data["food_name"])
     if existing_food_item:
         raise HTTPException(
             status_code=400,
@@ -37,13 +42,27 @@ async def add_a_food_item_in_db(food_data: dict):
             added_on=datetime.now(timezone.utc),
         )
 
-        # Insert the new food item into the database
-        await new_food_item.insert()
+        # Insert the new food item into the database, the unique index on food_name
+        # rejects a name added concurrently or by another worker
+        try:
+            await new_food_item.insert()
+        except DuplicateKeyError:
+            # Another worker added it, this cached catalog is stale
+            invalidate_food_catalog()
+            raise HTTPException(
+                status_code=400,
+                detail="A food item with the same name already exists in the database.",
+            )
+
+        add_to_food_catalog(new_food_item)
+
         new_food_item = new_food_item.model_dump()
         new_food_item["id"] = str(new_food_item.get("id"))
 
         return new_food_item
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -59,8 +78,8 @@ async def get_food_items_in_db():
     food_items_list = []
 
     try:
-        # Retrieve the food items related to the specific food bank
-        food_items = await FoodItem.find().to_list()
+        # Retrieve the food items from the shared catalog
+        food_items = (await get_food_catalog()).values()
 
         for food_item in food_items:
             food_item_dict = food_item.model_dump()
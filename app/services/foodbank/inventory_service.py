@@ -1,10 +1,24 @@
 from fastapi import HTTPException
-from app.models.inventory import MainInventory, MainInventoryFoodItem
-from app.models.food_item import FoodItem
+from app.models.inventory import MainInventory
+from app.services.food_catalog_service import get_food_items_by_names
+from app.services.stock_service import (
+    add_stock_in_db,
+    merge_quantities,
+    take_stock_in_db,
+)
+from app.services.waitlist_service import promote_waitlist_in_db
 from typing import List
 from datetime import datetime, timezone
 
 
+async def _promote_waitlist(foodbank_id: str, food_names: List[str]):
+    # The stock change is already saved, a failed promotion must not report it as failed
+    try:
+        await promote_waitlist_in_db(foodbank_id=foodbank_id, food_names=food_names)
+    except Exception as e:
+        print(f"An error occurred while promoting the waitlist of {foodbank_id}: {e}")
+
+
 async def add_inventory_in_db(foodbank_id: str, inventory_data: List[dict]):
     """
     Add or update inventory for specific food names and quantities.
@@ -16,102 +30,50 @@ async def add_inventory_in_db(foodbank_id: str, inventory_data: List[dict]):
     added_inventory = []
 
     try:
-        # Iterate over the inventory data (list of food items and their quantities)
-        for food in inventory_data:
-            food_name = food["food_name"]
-            quantity = food["quantity"]
-
-            # Check if the food item already exists in the FoodItem collection.
-            existing_food_item = await FoodItem.find_one(
-                FoodItem.food_name == food_name
-            )
+        catalog = await get_food_items_by_names(
+            food["food_name"] for food in inventory_data
+        )
 
-            # If the food item doesn't exist, raise an exception
-            if not existing_food_item:
+        # Check that every food item exists in the FoodItem catalog before adding anything
+        for food in inventory_data:
+            if food["food_name"] not in catalog:
                 raise HTTPException(
                     status_code=404,
-                    detail=f"The food item '{food_name}' does not exist in the database. Please add the food item first.",
+                    detail=f"The food item '{food['food_name']}' does not exist in the database. Please add the food item first.",
                 )
 
-            # Ensure 'unit' exists
-            unit = existing_food_item.unit  # Set default to 'unknown' if not provided
-            expiration_date = existing_food_item.expiration_date
-
-            # If the food item exists, check if the foodbank's inventory exists.
-            existing_inventory = await MainInventory.find_one(
-                MainInventory.foodbank_id == foodbank_id
-            )
-
-            if existing_inventory:
-                # If the food item already exists in the stock, update its quantity
-                food_found = False
-                for item in existing_inventory.stock:
-                    if item.food_name == food_name:
-                        item.quantity += quantity  # Update the quantity
-                        food_found = True
-                        break
-
-                if not food_found:
-                    # If the food item is not found in stock, append the new item to the stock array
-                    new_food_item = MainInventoryFoodItem(
-                        food_name=food_name, quantity=quantity
-                    )
-                    existing_inventory.stock.append(new_food_item)
-
-                # Update the `last_updated` timestamp
-                existing_inventory.last_updated = datetime.now(timezone.utc)
-
-                # Save the updated MainInventory record
-                await existing_inventory.save()
-
-                # Return the updated inventory
-                existing_inventory = existing_inventory.model_dump()
-                existing_inventory["id"] = str(existing_inventory["id"])
-                added_inventory.append(
-                    {
-                        "food_name": food_name,
-                        "quantity": quantity,
-                        "foodbank_id": foodbank_id,
-                        "expiration_date": expiration_date,
-                        "unit": unit,
-                        "updated_on": existing_inventory["last_updated"].isoformat(),
-                    }
-                )
+        # Add every quantity in a single atomic update, creating the inventory if needed
+        created = await add_stock_in_db(foodbank_id, merge_quantities(inventory_data))
+        now = datetime.now(timezone.utc)
 
+        for food in inventory_data:
+            food_item = catalog[food["food_name"]]
+            added = {
+                "food_name": food["food_name"],
+                "quantity": food["quantity"],
+                "foodbank_id": foodbank_id,
+                "expiration_date": food_item.expiration_date,
+                "unit": food_item.unit,
+            }
+            if created:
+                added["added_on"] = now
             else:
-                # If no existing inventory for the foodbank, create a new MainInventory
-                new_inventory_item = MainInventory(
-                    foodbank_id=foodbank_id,
-                    stock=[
-                        MainInventoryFoodItem(food_name=food_name, quantity=quantity)
-                    ],
-                    last_updated=datetime.now(timezone.utc),
-                )
-                # Insert the new inventory into the database
-                await new_inventory_item.insert()
-
-                # Return the new inventory item with its id
-                new_inventory_item = new_inventory_item.model_dump()
-                new_inventory_item["id"] = str(new_inventory_item["id"])
-                added_inventory.append(
-                    {
-                        "food_name": food_name,
-                        "quantity": quantity,
-                        "foodbank_id": foodbank_id,
-                        "expiration_date": expiration_date,
-                        "unit": unit,
-                        "added_on": new_inventory_item["last_updated"],
-                    }
-                )
-
-        return added_inventory  # Return the list of added or updated inventory items
+                added["updated_on"] = now.isoformat()
+            added_inventory.append(added)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred while adding or updating inventory: {str(e)}",
         )
 
+    # Serve the queued appointment requests waiting for the replenished items
+    await _promote_waitlist(foodbank_id, [food["food_name"] for food in inventory_data])
+
+    return added_inventory  # Return the list of added or updated inventory items
+
 
 async def remove_inventory_in_db(foodbank_id: str, inventory_data: List[dict]):
     """
@@ -124,85 +86,66 @@ async def remove_inventory_in_db(foodbank_id: str, inventory_data: List[dict]):
     removed_inventory = []  # List to store removed inventory items
 
     try:
-        # Iterate over the inventory data (list of food items and their quantities)
-        for food in inventory_data:
-            food_name = food["food_name"]
-            quantity = food["quantity"]
-
-            # Check if the food item exists in the FoodItem collection.
-            existing_food_item = await FoodItem.find_one(
-                FoodItem.food_name == food_name
-            )
+        catalog = await get_food_items_by_names(
+            food["food_name"] for food in inventory_data
+        )
 
-            # If the food item doesn't exist, raise an exception
-            if not existing_food_item:
+        # Check that every food item exists in the FoodItem catalog before removing anything
+        for food in inventory_data:
+            if food["food_name"] not in catalog:
                 raise HTTPException(
                     status_code=404,
-                    detail=f"The food item '{food_name}' does not exist in the database. Please add the food item first.",
+                    detail=f"The food item '{food['food_name']}' does not exist in the database. Please add the food item first.",
                 )
 
-            # Ensure 'unit' and 'expiration_date' are available
-            unit = existing_food_item.unit  # Default to 'unknown' if not provided
-            expiration_date = existing_food_item.expiration_date
-
-            # If the food item exists, check if the foodbank's inventory exists.
+        # Remove every quantity in a single update, guarded by the available quantities
+        quantities = merge_quantities(inventory_data)
+        if not await take_stock_in_db(foodbank_id, quantities):
+            # Only the failure path reads the inventory to explain the outcome
             existing_inventory = await MainInventory.find_one(
                 MainInventory.foodbank_id == foodbank_id
             )
+            if not existing_inventory:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No inventory found for foodbank '{foodbank_id}'.",
+                )
 
-            if existing_inventory:
-                food_found = False
-                for item in existing_inventory.stock:
-                    if item.food_name == food_name:
-                        if item.quantity >= quantity:
-                            # If quantity to remove is less than or equal to what's available, subtract it
-                            item.quantity -= quantity
-                            if item.quantity == 0:
-                                # Remove the food item completely if quantity reaches 0
-                                existing_inventory.stock.remove(item)
-                            food_found = True
-                        else:
-                            raise HTTPException(
-                                status_code=400,
-                                detail=f"Not enough quantity of '{food_name}' in inventory to remove.",
-                            )
-                        break
-
-                if not food_found:
-                    # If the food item doesn't exist in stock, return an error
+            stock = {item.food_name: item.quantity for item in existing_inventory.stock}
+            for food_name, quantity in quantities.items():
+                if food_name not in stock:
                     raise HTTPException(
                         status_code=404,
                         detail=f"The food item '{food_name}' does not exist in the inventory for the given foodbank.",
                     )
+                if stock[food_name] < quantity:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Not enough quantity of '{food_name}' in inventory to remove.",
+                    )
+            raise HTTPException(
+                status_code=409,
+                detail="The inventory changed while removing the items, please retry.",
+            )
 
-                # Update the `last_updated` timestamp
-                existing_inventory.last_updated = datetime.now(timezone.utc)
-
-                # Save the updated MainInventory record
-                await existing_inventory.save()
-
-                # Return the removed inventory information
-                existing_inventory = existing_inventory.model_dump()
-                existing_inventory["id"] = str(existing_inventory["id"])
-                removed_inventory.append(
-                    {
-                        "food_name": food_name,
-                        "quantity_removed": quantity,
-                        "foodbank_id": foodbank_id,
-                        "expiration_date": expiration_date,
-                        "unit": unit,
-                        "updated_on": existing_inventory["last_updated"].isoformat(),
-                    }
-                )
-            else:
-                # If no existing inventory for the foodbank, return an error
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No inventory found for foodbank '{foodbank_id}'.",
-                )
+        updated_on = datetime.now(timezone.utc).isoformat()
+        for food in inventory_data:
+            food_item = catalog[food["food_name"]]
+            removed_inventory.append(
+                {
+                    "food_name": food["food_name"],
+                    "quantity_removed": food["quantity"],
+                    "foodbank_id": foodbank_id,
+                    "expiration_date": food_item.expiration_date,
+                    "unit": food_item.unit,
+                    "updated_on": updated_on,
+                }
+            )
 
         return removed_inventory  # Return the list of removed inventory items
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -246,3 +189,28 @@ async def get_inventory_in_db(foodbank_id: str):
             status_code=500,
             detail=f"An error occurred while retrieving the inventory for foodbank '{foodbank_id}': {str(e)}",
         )
+
+
+async def restock_inventory_in_db(foodbank_id: str, returned_items: List[dict]):
+    """
+    Return reserved quantities back to the foodbank's main inventory in a single write.
+    :param foodbank_id: The ID of the foodbank whose inventory will be restocked.
+    :param returned_items: List of dictionaries containing food names and quantities to return.
+    :return: The updated inventory, or None if there was nothing to return.
+    """
+    if not returned_items:
+        return None
+
+    # One atomic update, items removed from the stock since the reservation are
+    # appended again and concurrent adds or removes are kept
+    await add_stock_in_db(foodbank_id, merge_quantities(returned_items))
+
+    # Serve the queued appointment requests waiting for the returned items
+    await _promote_waitlist(foodbank_id, [item["food_name"] for item in returned_items])
+
+    existing_inventory = await MainInventory.find_one(
+        MainInventory.foodbank_id == foodbank_id
+    )
+    existing_inventory = existing_inventory.model_dump()
+    existing_inventory["id"] = str(existing_inventory["id"])
+    return existing_inventory
@@ -1,10 +1,22 @@
 from app.models.job import Job, EventJob
-from datetime import datetime
+from datetime import datetime, timezone
+from beanie.operators import Set
+from typing import Optional
 from app.utils.time_converter import convert_string_time_to_iso
 from fastapi import HTTPException
 from beanie import PydanticObjectId
 
 
+def _dump_job(job: Job) -> dict:
+    # Report expired jobs as unavailable until the sweeper updates them
+    expired = job.is_expired()
+    job = job.model_dump()
+    job["id"] = str(job["id"])
+    if expired:
+        job["status"] = "unavailable"
+    return job
+
+
 async def add_a_new_job_in_db(foodbank_id: str, job_data: dict):
     """
     Create a new job in DB
@@ -49,9 +61,18 @@ async def add_a_new_event_job_in_db(foodbank_id: str, job_data: dict):
         job_data["deadline"].split(" ")[0], job_data["deadline"].split(" ")[1]
     )
 
+    # The shift of the job is optional
+    for key in ["shift_start", "shift_end"]:
+        if job_data.get(key):
+            job_data[key] = convert_string_time_to_iso(
+                job_data[key].split(" ")[0], job_data[key].split(" ")[1]
+            )
+
     try:
         event_job = EventJob(
             event_id=job_data["event_id"],
+            shift_start=job_data.get("shift_start"),
+            shift_end=job_data.get("shift_end"),
             foodbank_id=foodbank_id,
             title=job_data["title"],
             description=job_data["description"],
@@ -72,22 +93,23 @@ async def add_a_new_event_job_in_db(foodbank_id: str, job_data: dict):
         )
 
 
-async def list_foodbank_job_in_db():
+async def list_foodbank_job_in_db(foodbank_id: str):
     """
-    Retrieve the list of jobs within the foodbank
+    Retrieve the list of jobs (including event jobs) posted by the foodbank
+    :param foodbank_id: A unique identifier for foodbank
     """
 
     job_list = []
 
     try:
-        jobs = await Job.find().to_list()
+        jobs = (
+            await Job.find(Job.foodbank_id == foodbank_id, with_children=True)
+            .sort("-deadline")
+            .to_list()
+        )
 
         for job in jobs:
-            # Automate process updating the job status post
-            await job.check_and_update_status()
-            job = job.model_dump()
-            job["id"] = str(job["id"])
-            job_list.append(job)
+            job_list.append(_dump_job(job))
         return job_list
     except Exception as e:
         raise HTTPException(
@@ -96,22 +118,24 @@ async def list_foodbank_job_in_db():
         )
 
 
-async def list_event_job_in_db():
+async def list_event_job_in_db(foodbank_id: str, event_id: Optional[str] = None):
     """
-    Retrieve the list of jobs within the specific events
+    Retrieve the list of jobs within the events of the foodbank
+    :param foodbank_id: A unique identifier for foodbank
+    :param event_id: Optional event ID used to filter the jobs
     """
 
     job_list = []
 
     try:
-        jobs = await Job.find(Job.category == "Event").to_list()
+        query = [EventJob.foodbank_id == foodbank_id]
+        if event_id:
+            query.append(EventJob.event_id == event_id)
+
+        jobs = await EventJob.find(*query).sort("-deadline").to_list()
 
         for job in jobs:
-            # Automate process updating the job status post
-            await job.check_and_update_status()
-            job = job.model_dump()
-            job["id"] = str(job["id"])
-            job_list.append(job)
+            job_list.append(_dump_job(job))
         return job_list
     except Exception as e:
         raise HTTPException(
@@ -127,7 +151,7 @@ async def update_existing_job_info_in_db(job_id: str, job_data: dict):
     :param job_data: Job new information
     """
 
-    job = await Job.get(PydanticObjectId(job_id))
+    job = await Job.get(PydanticObjectId(job_id), with_children=True)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -152,3 +176,17 @@ async def update_existing_job_info_in_db(job_id: str, job_data: dict):
             status_code=400,
             detail=f"An error occurred while updating the job in db: {e}",
         )
+
+
+async def expire_jobs_in_db():
+    """
+    Mark every available job whose deadline has passed as unavailable in a single update
+    :return: The number of jobs that expired
+    """
+    result = await Job.find(
+        Job.status == "available",
+        Job.deadline <= datetime.now(timezone.utc),
+        with_children=True,
+    ).update_many(Set({Job.status: "unavailable"}))
+
+    return result.modified_count if result else 0
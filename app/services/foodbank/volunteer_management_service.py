@@ -1,10 +1,16 @@
 from fastapi import HTTPException
 from beanie import PydanticObjectId
+from beanie.operators import In
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from pymongo import UpdateOne
+import uuid
 from app.models.application import Application, EventApplication
-from app.models.user import User
-from app.models.job import Job
+from app.models.event import Event
+from app.models.job import Job, JobTitle
 from app.utils.time_converter import convert_string_time_to_iso
-from app.models.volunteer_activity import VolunteerActivity
+from app.models.volunteer_activity import VolunteerActivity, VolunteerHoursRollup
+from app.services.user_service import get_user_names_by_ids
 
 
 async def get_list_volunteer_in_db(event_id: str, status: str):
@@ -46,36 +52,508 @@ async def get_list_volunteer_in_db(event_id: str, status: str):
         )
         
         
-async def update_application_status_in_db(application_id: str, updated_status: str):
+def _as_utc(value: datetime) -> datetime:
+    # Datetimes read back from MongoDB are naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _parse_shift_time(value: str) -> datetime:
+    # Shift times are given as "YYYY-MM-DD HH:MM" in local time
+    date, time = value.split(" ")
+    return datetime.fromisoformat(convert_string_time_to_iso(date, time))
+
+
+async def find_shift_conflict_in_db(
+    volunteer_id: str,
+    shift_start: datetime,
+    shift_end: datetime,
+    exclude_id: Optional[PydanticObjectId] = None,
+) -> Optional[Application]:
+    """
+    Find an approved shift of the volunteer overlapping the given shift.
+    Approved shifts of a volunteer never overlap each other, so only the latest one
+    starting before the end of the new shift can overlap it: one index lookup.
+    :param volunteer_id: The unique identifier for volunteer
+    :param shift_start: The start of the new shift
+    :param shift_end: The end of the new shift
+    :param exclude_id: An application to ignore, the one being approved
+    :return: The conflicting application, or None
+    """
+    query = [
+        Application.volunteer_id == volunteer_id,
+        Application.status == "approved",
+        Application.shift_start < shift_end,
+    ]
+    if exclude_id is not None:
+        query.append(Application.id != exclude_id)
+
+    previous = (
+        await Application.find(*query, with_children=True)
+        .sort("-shift_start")
+        .limit(1)
+        .first_or_none()
+    )
+    if previous and _as_utc(previous.shift_end) > _as_utc(shift_start):
+        return previous
+    return None
+
+
+async def update_application_status_in_db(
+    application_id: str,
+    updated_status: str,
+    shift_start: Optional[str] = None,
+    shift_end: Optional[str] = None,
+):
     """
     Update the status of a specific application in db
     :param application_id: A unique identifier for volunteer's application
     :param updated_status: A new status of application (approved or rejected)
+    :param shift_start: The start of the shift, defaults to the shift of the event job
+    :param shift_end: The end of the shift, defaults to the shift of the event job
     """
 
-    application = await Application.get(PydanticObjectId(application_id))
+    application = await Application.get(
+        PydanticObjectId(application_id), with_children=True
+    )
     if application == None:
-        application = await EventApplication.get(PydanticObjectId(application_id))
-        if application == None:
-            raise HTTPException(
-                status_code=404,
-                detail="There is no application corresponding with the given ID",
+        raise HTTPException(
+            status_code=404,
+            detail="There is no application corresponding with the given ID",
+        )
+
+    if updated_status == "approved":
+        job = await Job.get(PydanticObjectId(application.job_id), with_children=True)
+
+        # Event applications learn their foodbank from the job once approved
+        if job and not application.foodbank_id:
+            application.foodbank_id = job.foodbank_id
+
+        if shift_start and shift_end:
+            try:
+                shift_start = _parse_shift_time(shift_start)
+                shift_end = _parse_shift_time(shift_end)
+            except Exception:
+                raise HTTPException(
+                    status_code=400,
+                    detail="shift_start and shift_end must be given as YYYY-MM-DD HH:MM",
+                )
+            # An inverted shift would never overlap anything
+            if shift_start >= shift_end:
+                raise HTTPException(
+                    status_code=400, detail="shift_end must be after shift_start"
+                )
+        else:
+            shift_start = getattr(job, "shift_start", None)
+            shift_end = getattr(job, "shift_end", None)
+
+        if shift_start and shift_end:
+            conflict = await find_shift_conflict_in_db(
+                volunteer_id=application.volunteer_id,
+                shift_start=shift_start,
+                shift_end=shift_end,
+                exclude_id=application.id,
             )
-    try:
+            if conflict:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"The volunteer is already booked for an overlapping shift (application {conflict.id})",
+                )
 
-        application.status = updated_status
-        await application.save()
-        application = application.model_dump()
-        application["id"] = str(application["id"])
+    else:
+        # Rejected applications release their shift
+        shift_start = None
+        shift_end = None
 
-        return application
+    previous = {
+        "status": application.status,
+        "shift_start": application.shift_start,
+        "shift_end": application.shift_end,
+    }
+    changes = {
+        "status": updated_status,
+        "shift_start": shift_start,
+        "shift_end": shift_end,
+        "foodbank_id": application.foodbank_id,
+    }
+
+    try:
+        # Only apply the change if nobody updated the status since it was read
+        collection = Application.get_motor_collection()
+        updated = await collection.find_one_and_update(
+            {"_id": application.id, "status": application.status},
+            {"$set": changes},
+            projection={"_id": 1},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"An error occurred while updating the application in DB: {e}",
         )
+    if updated is None:
+        raise HTTPException(
+            status_code=409,
+            detail="The application status was changed by another request",
+        )
+
+    if updated_status == "approved" and shift_start and shift_end:
+        # A concurrent approval of the same volunteer may have passed the check above
+        # too. Both see each other now, and both step back rather than keep an overlap
+        # that find_shift_conflict_in_db could no longer detect.
+        overlapping = await Application.find(
+            Application.volunteer_id == application.volunteer_id,
+            Application.status == "approved",
+            Application.shift_start < shift_end,
+            Application.shift_end > shift_start,
+            Application.id != application.id,
+            with_children=True,
+        ).first_or_none()
+        if overlapping:
+            await collection.update_one(
+                {"_id": application.id, "status": updated_status},
+                {"$set": previous},
+            )
+            raise HTTPException(
+                status_code=409,
+                detail=f"The volunteer is already booked for an overlapping shift (application {overlapping.id})",
+            )
+
+    for key, value in changes.items():
+        setattr(application, key, value)
+    application = application.model_dump()
+    application["id"] = str(application["id"])
+
+    return application
         
         
+def _overlaps(shifts: list, shift_start: datetime, shift_end: datetime, exclude_id):
+    for other_id, other_start, other_end in shifts:
+        if other_id != exclude_id and other_start < shift_end and shift_start < other_end:
+            return other_id
+    return None
+
+
+async def bulk_update_application_status_in_db(foodbank_id: str, updates: List[dict]):
+    """
+    Approve or reject many applications belonging to a foodbank at once
+    :param foodbank_id: A unique identifier for foodbank, used to validate the ownership
+    :param updates: A list of dictionaries containing application_id, updated_status
+    and optionally shift_start and shift_end
+    :return: A list of per-application outcomes
+    """
+
+    results = []
+    requested = {}
+    token = uuid.uuid4().hex
+
+    # Validate the given IDs and shifts before touching the db
+    for update in updates:
+        application_id = update.get("application_id")
+        try:
+            shift = None
+            if update.get("shift_start") and update.get("shift_end"):
+                shift = (
+                    _parse_shift_time(update["shift_start"]),
+                    _parse_shift_time(update["shift_end"]),
+                )
+                # An inverted shift would never overlap anything
+                if shift[0] >= shift[1]:
+                    results.append(
+                        {
+                            "application_id": application_id,
+                            "result": "invalid",
+                            "detail": "shift_end must be after shift_start",
+                        }
+                    )
+                    continue
+            requested[PydanticObjectId(application_id)] = (
+                update["updated_status"],
+                shift,
+            )
+        except Exception:
+            results.append(
+                {
+                    "application_id": application_id,
+                    "result": "invalid",
+                    "detail": "Application ID or shift is not valid",
+                }
+            )
+
+    try:
+        # Retrieve every requested application in one query
+        applications = await Application.find(
+            In(Application.id, list(requested.keys())), with_children=True
+        ).to_list()
+
+        # Event applications belong to the foodbank through their event
+        event_ids = []
+        for application in applications:
+            if isinstance(application, EventApplication):
+                try:
+                    event_ids.append(PydanticObjectId(application.event_id))
+                except Exception:
+                    continue
+        events = await Event.find(
+            In(Event.id, event_ids), Event.foodbank_id == foodbank_id
+        ).to_list()
+        owned_events = {str(event.id) for event in events}
+
+        applications = {
+            application.id: application
+            for application in applications
+            if application.foodbank_id == foodbank_id
+            or getattr(application, "event_id", None) in owned_events
+        }
+
+        # The jobs give the default shifts of the approved applications
+        job_ids = []
+        for application in applications.values():
+            try:
+                job_ids.append(PydanticObjectId(application.job_id))
+            except Exception:
+                continue
+        jobs = await Job.find(In(Job.id, job_ids), with_children=True).to_list()
+        jobs = {str(job.id): job for job in jobs}
+
+        # Resolve the shift of every approval
+        shifts = {}
+        for application_id, (updated_status, shift) in requested.items():
+            application = applications.get(application_id)
+            if not application or updated_status != "approved":
+                continue
+            if shift is None:
+                job = jobs.get(application.job_id)
+                if getattr(job, "shift_start", None) and getattr(job, "shift_end", None):
+                    shift = (_as_utc(job.shift_start), _as_utc(job.shift_end))
+            if shift:
+                shifts[application_id] = shift
+
+        # Load the approved shifts of the volunteers around the new ones in one query
+        booked = {}
+        if shifts:
+            volunteer_ids = list(
+                {applications[application_id].volunteer_id for application_id in shifts}
+            )
+            approved = await Application.find(
+                In(Application.volunteer_id, volunteer_ids),
+                Application.status == "approved",
+                Application.shift_start < max(end for _, end in shifts.values()),
+                Application.shift_end > min(start for start, _ in shifts.values()),
+                with_children=True,
+            ).to_list()
+            for application in approved:
+                booked.setdefault(application.volunteer_id, []).append(
+                    (
+                        application.id,
+                        _as_utc(application.shift_start),
+                        _as_utc(application.shift_end),
+                    )
+                )
+
+        operations = []
+        pending = {}
+
+        for application_id, (updated_status, _) in requested.items():
+            application = applications.get(application_id)
+
+            if not application:
+                results.append(
+                    {
+                        "application_id": str(application_id),
+                        "result": "not_found",
+                        "detail": "Application not found for this foodbank",
+                    }
+                )
+                continue
+
+            if application.status == updated_status:
+                results.append(
+                    {
+                        "application_id": str(application_id),
+                        "result": "skipped",
+                        "detail": f"Application is already {updated_status}",
+                    }
+                )
+                continue
+
+            changes = {"status": updated_status, "shift_start": None, "shift_end": None}
+
+            if updated_status == "approved":
+                job = jobs.get(application.job_id)
+                if job and not application.foodbank_id:
+                    changes["foodbank_id"] = job.foodbank_id
+
+                shift = shifts.get(application_id)
+                if shift:
+                    conflict = _overlaps(
+                        booked.get(application.volunteer_id, []), *shift, application_id
+                    )
+                    if conflict:
+                        results.append(
+                            {
+                                "application_id": str(application_id),
+                                "result": "conflict",
+                                "detail": f"The volunteer is already booked for an overlapping shift (application {conflict})",
+                            }
+                        )
+                        continue
+
+                    # Later approvals of this batch must not overlap this one either
+                    booked.setdefault(application.volunteer_id, []).append(
+                        (application_id, *shift)
+                    )
+                    changes["shift_start"], changes["shift_end"] = shift
+
+            # Only apply the change if nobody updated the status in the meantime. The
+            # token written along with the status tells which rows this request changed.
+            operations.append(
+                UpdateOne(
+                    {"_id": application_id, "status": application.status},
+                    {"$set": {**changes, "status_update_token": token}},
+                )
+            )
+            pending[application_id] = updated_status
+
+        updated_ids = set()
+        if operations:
+            collection = Application.get_motor_collection()
+            await collection.bulk_write(operations, ordered=False)
+            updated_ids = {
+                document["_id"]
+                async for document in collection.find(
+                    {"_id": {"$in": list(pending)}, "status_update_token": token},
+                    {"_id": 1},
+                )
+            }
+
+        for application_id, updated_status in pending.items():
+            if application_id not in updated_ids:
+                results.append(
+                    {
+                        "application_id": str(application_id),
+                        "result": "conflict",
+                        "detail": "Application status was changed by another request",
+                    }
+                )
+                continue
+
+            results.append(
+                {
+                    "application_id": str(application_id),
+                    "result": "updated",
+                    "status": updated_status,
+                }
+            )
+
+        return results
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while updating the applications in DB: {e}",
+        )
+
+
+async def _build_roster(applications: list) -> list:
+    # Retrieve the volunteer names and the job titles of the roster at once
+    volunteer_names = await get_user_names_by_ids(
+        application.volunteer_id for application in applications
+    )
+
+    job_ids = []
+    for application in applications:
+        try:
+            job_ids.append(PydanticObjectId(application.job_id))
+        except Exception:
+            continue
+    jobs = (
+        await Job.find(In(Job.id, job_ids), with_children=True)
+        .project(JobTitle)
+        .to_list()
+    )
+    jobs = {str(job.id): job for job in jobs}
+
+    roster = []
+    for application in applications:
+        job = jobs.get(application.job_id)
+        roster.append(
+            {
+                "application_id": str(application.id),
+                "volunteer_id": application.volunteer_id,
+                "volunteer_name": volunteer_names.get(
+                    application.volunteer_id, "Unknown"
+                ),
+                "job_id": application.job_id,
+                "job_title": job.title if job else None,
+                "event_id": getattr(application, "event_id", None),
+                "shift_start": application.shift_start,
+                "shift_end": application.shift_end,
+            }
+        )
+    return roster
+
+
+async def get_event_roster_in_db(foodbank_id: str, event_id: str):
+    """
+    Retrieve the approved volunteers of an event ordered by shift start
+    :param foodbank_id: A unique identifier for foodbank, owner of the event
+    :param event_id: The event ID
+    """
+    try:
+        event = await Event.get(PydanticObjectId(event_id))
+    except Exception:
+        event = None
+    if not event or event.foodbank_id != foodbank_id:
+        raise HTTPException(status_code=404, detail="Event not found!")
+
+    try:
+        applications = (
+            await EventApplication.find(
+                EventApplication.event_id == event_id,
+                EventApplication.status == "approved",
+            )
+            .sort("+shift_start")
+            .to_list()
+        )
+
+        return await _build_roster(applications)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the event roster in DB: {e}",
+        )
+
+
+async def get_daily_roster_in_db(foodbank_id: str, day: str):
+    """
+    Retrieve every approved shift of a foodbank starting on a given day
+    :param foodbank_id: A unique identifier for foodbank
+    :param day: The day in YYYY-MM-DD format, in local time
+    """
+    day_start = _parse_shift_time(f"{day} 00:00")
+    day_end = day_start + timedelta(days=1)
+
+    try:
+        applications = (
+            await Application.find(
+                Application.foodbank_id == foodbank_id,
+                Application.status == "approved",
+                Application.shift_start >= day_start,
+                Application.shift_start < day_end,
+                with_children=True,
+            )
+            .sort("+shift_start")
+            .to_list()
+        )
+
+        return await _build_roster(applications)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the daily roster in DB: {e}",
+        )
+
+
 async def get_list_foodbank_application_in_db(foodbank_id: str, status: str):
     """
     Retrieve a list of volunteer application for foodbank position
@@ -89,20 +567,35 @@ async def get_list_foodbank_application_in_db(foodbank_id: str, status: str):
             Application.foodbank_id == foodbank_id, Application.status == status
         ).to_list()
 
+        # Retrieve the volunteer names and the jobs of every application at once
+        volunteer_names = await get_user_names_by_ids(
+            application.volunteer_id for application in applications
+        )
+
+        job_ids = []
+        for application in applications:
+            try:
+                job_ids.append(PydanticObjectId(application.job_id))
+            except Exception:
+                continue
+        jobs = (
+            await Job.find(In(Job.id, job_ids), with_children=True)
+            .project(JobTitle)
+            .to_list()
+        )
+        jobs = {str(job.id): job for job in jobs}
+
         for application in applications:
             application = application.model_dump()
             application["id"] = str(application["id"])
 
-            # Retrieve volunteer information based on the volunteer ID
-            volunteer = await User.get(
-                PydanticObjectId(str(application["volunteer_id"]))
+            application["volunteer_name"] = volunteer_names.get(
+                application["volunteer_id"], "Unknown"
             )
-            application["volunteer_name"] = volunteer.name
 
-            # Retrieve job informaation
-            job = await Job.get(PydanticObjectId(application["job_id"]))
-            application["job_name"] = job.title
-            application["job_category"] = job.category
+            job = jobs.get(application["job_id"])
+            application["job_name"] = job.title if job else None
+            application["job_category"] = job.category if job else None
 
             application_list.append(application)
 
@@ -120,7 +613,9 @@ async def get_application_detail(application_id: str):
     """
 
     try:
-        application = await Application.get(PydanticObjectId(application_id))
+        application = await Application.get(
+            PydanticObjectId(application_id), with_children=True
+        )
         application = application.model_dump()
         application["id"] = str(application["id"])
 
@@ -139,11 +634,16 @@ async def get_job_detail_in_db(job_id: str):
     """
 
     try:
-        job = await Job.get(PydanticObjectId(job_id))
+        job = await Job.get(PydanticObjectId(job_id), with_children=True)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
         job = job.model_dump()
         job["id"] = str(job["id"])
 
         return job
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -153,13 +653,17 @@ async def get_job_detail_in_db(job_id: str):
 
 async def add_volunteer_activity_in_db(
     application_id: str,
+    volunteer_id: str,
+    foodbank_id: str,
     date_worked: str,
     foodbank_name: str,
     category: str,
     working_hours: dict,
 ):
     """
-    Add volunteer activity in db
+    Add volunteer activity in db and update the monthly hours rollup
+    :param volunteer_id: The volunteer who worked, copied from the application
+    :param foodbank_id: The foodbank that records the activity
     :param date_worked: the date that volunteer work
     :param foodbank_name: The foodbank name
     :param category: category of the job
@@ -184,6 +688,8 @@ async def add_volunteer_activity_in_db(
     try:
         activity = VolunteerActivity(
             application_id=application_id,
+            volunteer_id=volunteer_id,
+            foodbank_id=foodbank_id,
             date_worked=date_worked,
             foodbank_name=foodbank_name,
             category=category,
@@ -191,6 +697,24 @@ async def add_volunteer_activity_in_db(
         )
 
         await activity.save()
+
+        # Add the shift to the monthly rollup of the volunteer
+        hours = (
+            activity.working_hours.end - activity.working_hours.start
+        ).total_seconds() / 3600
+        await VolunteerHoursRollup.get_motor_collection().update_one(
+            {
+                "foodbank_id": foodbank_id,
+                "month": _month_of(activity.date_worked),
+                "volunteer_id": volunteer_id,
+            },
+            {
+                "$inc": {"hours": hours, "shifts": 1},
+                "$set": {"last_updated": datetime.now(timezone.utc)},
+            },
+            upsert=True,
+        )
+
         activity = activity.model_dump()
         activity["id"] = str(activity["id"])
         return activity
@@ -198,4 +722,120 @@ async def add_volunteer_activity_in_db(
         raise HTTPException(
             status_code=400,
             detail=f"An error occurred while creating the volunteer activity in DB: {e}",
+        )
+
+
+def _month_of(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m")
+
+
+async def get_volunteer_hours_leaderboard_in_db(
+    foodbank_id: str, month: str, limit: int = 10
+):
+    """
+    Retrieve the volunteers who worked the most hours for a foodbank during a month
+    :param foodbank_id: A unique identifier for foodbank
+    :param month: The month in YYYY-MM format
+    :param limit: The number of volunteers in the leaderboard
+    :return: The leaderboard and the totals of the month
+    """
+    try:
+        rows = (
+            await VolunteerHoursRollup.find(
+                VolunteerHoursRollup.foodbank_id == foodbank_id,
+                VolunteerHoursRollup.month == month,
+            )
+            .sort("-hours")
+            .limit(limit)
+            .to_list()
+        )
+
+        totals = await VolunteerHoursRollup.aggregate(
+            [
+                {"$match": {"foodbank_id": foodbank_id, "month": month}},
+                {
+                    "$group": {
+                        "_id": None,
+                        "hours": {"$sum": "$hours"},
+                        "shifts": {"$sum": "$shifts"},
+                        "volunteers": {"$sum": 1},
+                    }
+                },
+            ]
+        ).to_list()
+        totals = totals[0] if totals else {"hours": 0, "shifts": 0, "volunteers": 0}
+
+        volunteer_names = await get_user_names_by_ids(row.volunteer_id for row in rows)
+
+        leaderboard = [
+            {
+                "rank": rank,
+                "volunteer_id": row.volunteer_id,
+                "volunteer_name": volunteer_names.get(row.volunteer_id, "Unknown"),
+                "hours": round(row.hours, 2),
+                "shifts": row.shifts,
+            }
+            for rank, row in enumerate(rows, start=1)
+        ]
+
+        return {
+            "month": month,
+            "total_hours": round(totals["hours"], 2),
+            "total_shifts": totals["shifts"],
+            "volunteer_count": totals["volunteers"],
+            "leaderboard": leaderboard,
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the volunteer leaderboard in DB: {e}",
+        )
+
+
+async def get_volunteer_hours_totals_in_db(foodbank_id: str, year: str):
+    """
+    Retrieve the total volunteer hours of a foodbank for every month of a year
+    :param foodbank_id: A unique identifier for foodbank
+    :param year: The year in YYYY format
+    """
+    try:
+        months = await VolunteerHoursRollup.aggregate(
+            [
+                {
+                    "$match": {
+                        "foodbank_id": foodbank_id,
+                        "month": {"$gte": f"{year}-01", "$lte": f"{year}-12"},
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": "$month",
+                        "hours": {"$sum": "$hours"},
+                        "shifts": {"$sum": "$shifts"},
+                        "volunteers": {"$sum": 1},
+                    }
+                },
+                {"$sort": {"_id": 1}},
+            ]
+        ).to_list()
+
+        return {
+            "year": year,
+            "total_hours": round(sum(month["hours"] for month in months), 2),
+            "months": [
+                {
+                    "month": month["_id"],
+                    "hours": round(month["hours"], 2),
+                    "shifts": month["shifts"],
+                    "volunteer_count": month["volunteers"],
+                }
+                for month in months
+            ],
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the volunteer hours in DB: {e}",
         )
\ No newline at end of file
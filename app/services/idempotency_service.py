@@ -0,0 +1,134 @@
+from app.models.idempotency import IdempotencyRecord
+from app.config import settings
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+import json
+import uuid
+
+# Longest Idempotency-Key accepted from the clients
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash(body: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(body, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+async def begin_idempotent_request(
+    user_id: str, idempotency_key: str, body: dict
+) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Claim an Idempotency-Key before processing a request.
+    A key in progress is only taken over once its lease is over, see
+    IDEMPOTENCY_LEASE_SECONDS: the lease must be longer than any request, otherwise a
+    slow request and its retry would both be processed. The price is that the retry of
+    a request whose worker died is refused with a 409 until the lease is over.
+    :param user_id: The user making the request, keys are scoped to their user
+    :param idempotency_key: The value of the Idempotency-Key header
+    :param body: The request body, a key cannot be reused with a different body
+    :return: The stored response and None if the request was already processed, or
+    None and the claim token if the caller must process it and then pass the token to
+    complete_idempotent_request or release_idempotent_request
+    """
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    record = IdempotencyRecord(
+        key=f"{user_id}:{idempotency_key}",
+        request_hash=_request_hash(body),
+        claim_token=uuid.uuid4().hex,
+    )
+    try:
+        # The unique index makes the first request win, a single round trip
+        await record.insert()
+        return None, record.claim_token
+    except DuplicateKeyError:
+        pass
+
+    existing = await IdempotencyRecord.find_one(IdempotencyRecord.key == record.key)
+    if not existing:
+        # Expired between the insert and the read, treat it as a new request
+        return await begin_idempotent_request(user_id, idempotency_key, body)
+
+    if existing.request_hash != record.request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    if existing.status == "in_progress":
+        # The worker holding the key died before completing or releasing it, the
+        # retry takes the key over once the lease is over
+        now = datetime.now(timezone.utc)
+        lease_over = now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+        taken_over = await IdempotencyRecord.get_motor_collection().find_one_and_update(
+            {
+                "key": record.key,
+                "status": "in_progress",
+                "$or": [
+                    {"claimed_at": {"$lte": lease_over}},
+                    # Records written before claimed_at existed
+                    {"claimed_at": {"$exists": False}, "created_at": {"$lte": lease_over}},
+                ],
+            },
+            # A new token, so that the previous claimant can no longer complete or
+            # release the key if it was still alive after all
+            {"$set": {"claimed_at": now, "claim_token": record.claim_token}},
+        )
+        if taken_over:
+            return None, record.claim_token
+
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+        )
+    return existing.response, None
+
+
+async def complete_idempotent_request(
+    user_id: str, idempotency_key: str, claim_token: str, response: dict
+):
+    """
+    Store the response of a processed request so that retries can replay it
+    :param user_id: The user making the request
+    :param idempotency_key: The value of the Idempotency-Key header
+    :param claim_token: The token returned by begin_idempotent_request
+    :param response: The response returned to the client
+    """
+    try:
+        result = await IdempotencyRecord.get_motor_collection().update_one(
+            {
+                "key": f"{user_id}:{idempotency_key}",
+                "status": "in_progress",
+                "claim_token": claim_token,
+            },
+            {"$set": {"status": "completed", "response": response}},
+        )
+        if result.matched_count == 0:
+            print(
+                f"Idempotency-Key {idempotency_key} of user {user_id} was taken over "
+                "before its request completed, the response was not stored"
+            )
+    except Exception as e:
+        # The request itself succeeded, failing it now would make the client retry it
+        print(f"An error occurred while storing the idempotent response: {e}")
+
+
+async def release_idempotent_request(
+    user_id: str, idempotency_key: str, claim_token: str
+):
+    """
+    Forget a key whose request failed, so that the client can retry it
+    :param user_id: The user making the request
+    :param idempotency_key: The value of the Idempotency-Key header
+    :param claim_token: The token returned by begin_idempotent_request, a key taken
+    over by another request is left alone
+    """
+    await IdempotencyRecord.find_one(
+        IdempotencyRecord.key == f"{user_id}:{idempotency_key}",
+        IdempotencyRecord.status == "in_progress",
+        IdempotencyRecord.claim_token == claim_token,
+    ).delete()
@@ -6,13 +6,25 @@ from app.models.user import User
 from datetime import datetime, timezone
 from beanie import PydanticObjectId
 from app.models.event import Event, EventInventory
+from app.services.foodbank.appointment_service import get_appointment_page_in_db
+from app.services.waitlist_service import add_to_waitlist_in_db
+from app.services.stock_service import merge_quantities, take_stock_in_db
+from app.services.allowance_service import (
+    check_allowance_in_db,
+    apply_allowance_changes_in_db,
+    appointment_allowance_change,
+)
+from app.utils.checkin_token import create_checkin_token, build_checkin_payload
+from typing import Optional
 
 
 async def create_appointment_in_db(individual_id: str, appointment_data: dict):
     """
     Add an appointment in db and reserve inventory items.
+    When the stock is not sufficient, the request is queued in the waitlist instead.
     :param individual_id: ID of the individual making the appointment
     :param appointment_data: A detailed appointment information
+    :return: The created appointment, or the waitlist entry (status "waiting")
     """
 
     try:
@@ -27,38 +39,58 @@ async def create_appointment_in_db(individual_id: str, appointment_data: dict):
                 status_code=404, detail="No inventory found for this food bank."
             )
 
-        # Check if requested items are available and update inventory
+        # Make sure the individual stays within the foodbank's pickup allowance
+        await check_allowance_in_db(
+            individual_id=individual_id,
+            foodbank_id=foodbank_id,
+            products=appointment_data["product"],
+            start_time=appointment_data["start_time"],
+        )
+
+        # Check if requested items are available before reserving anything
+        stock = {stock_item.food_name: stock_item for stock_item in existing_inventory.stock}
+        waiting_for = []
         for item in appointment_data["product"]:
             food_name = item["food_name"]
             quantity_requested = item["quantity"]
 
-            food_found = False
-            for stock_item in existing_inventory.stock:
-                if stock_item.food_name == food_name:
-                    if stock_item.quantity >= quantity_requested:
-                        stock_item.quantity -= (
-                            quantity_requested  # Deduct quantity (Reserve)
-                        )
-                        food_found = True
-                    else:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Not enough stock for {food_name}. Available: {stock_item.quantity}, Requested: {quantity_requested}",
-                        )
-                    break
-
-            if not food_found:
+            if food_name not in stock:
                 raise HTTPException(
                     status_code=404,
                     detail=f"{food_name} is not available in this food bank's inventory.",
                 )
 
-        # Save updated inventory
-        existing_inventory.last_updated = datetime.now(timezone.utc)
-        await existing_inventory.save()
+            if stock[food_name].quantity < quantity_requested:
+                # Queue the request instead of rejecting it, unless the client opted out
+                if appointment_data.get("join_waitlist", True) is False:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Not enough stock for {food_name}. Available: {stock[food_name].quantity}, Requested: {quantity_requested}",
+                    )
+                waiting_for.append(food_name)
+
+        if waiting_for:
+            return await add_to_waitlist_in_db(
+                individual_id=individual_id,
+                appointment_data=appointment_data,
+                waiting_for=waiting_for,
+            )
+
+        # Deduct quantity (Reserve), only if the stock is still available
+        reserved = await take_stock_in_db(
+            foodbank_id, merge_quantities(appointment_data["product"])
+        )
+        if not reserved:
+            raise HTTPException(
+                status_code=409,
+                detail="The stock changed while booking the appointment, please retry.",
+            )
 
         # Create the appointment after reserving inventory
+        appointment_id = PydanticObjectId()
         new_appointment = Appointment(
+            id=appointment_id,
+            checkin_token=create_checkin_token(str(appointment_id)),
             individual_id=individual_id,
             foodbank_id=foodbank_id,
             start_time=appointment_data["start_time"],
@@ -68,6 +100,10 @@ async def create_appointment_in_db(individual_id: str, appointment_data: dict):
         )
 
         await new_appointment.insert()
+        await apply_allowance_changes_in_db(
+            [appointment_allowance_change(new_appointment, {"reserved": 1})]
+        )
+
         new_appointment = new_appointment.model_dump()
         new_appointment["id"] = str(new_appointment["id"])
 
@@ -80,25 +116,37 @@ async def create_appointment_in_db(individual_id: str, appointment_data: dict):
         )
 
 
-async def get_appointments_by_individual(individual_id: str):
+async def get_appointments_by_individual(
+    individual_id: str,
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
     """
-    Fetch all appointments for a specific food bank.
-
-    :param foodbank_id: The ID of the food bank.
-    :return: A list of appointment objects.
+    Fetch a page of appointments for a specific individual.
+
+    :param individual_id: The ID of the individual.
+    :param status: Optional status used to filter the appointments.
+    :param start_date: Optional lower bound of the appointment start time.
+    :param end_date: Optional upper bound of the appointment start time.
+    :param cursor: The cursor returned with the previous page.
+    :param limit: The maximum number of appointments in the page.
+    :return: A tuple of (appointments, next_cursor).
     """
     try:
-        appointments = await Appointment.find(
-            Appointment.individual_id == individual_id
-        ).to_list()
-
-        # Convert ObjectId to string for JSON response
-        for appointment in appointments:
-            appointment = appointment.model_dump()
-            appointment["id"] = str(appointment["id"])
-
-        return appointments
+        return await get_appointment_page_in_db(
+            {"individual_id": individual_id},
+            status=status,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            limit=limit,
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -215,3 +263,37 @@ async def retrieve_list_of_events_in_db():
             status_code=500,
             detail=f"An error occurred while fetching the list of events: {e}",
         )
+
+
+async def get_appointment_checkin_payload_in_db(individual_id: str, appointment_id: str):
+    """
+    Retrieve the QR payload used to check in for an appointment
+    :param individual_id: ID of the individual who owns the appointment
+    :param appointment_id: ID of the appointment
+    :return: The QR payload and token, or None if the appointment was not found
+    """
+    try:
+        appointment = await Appointment.find_one(
+            Appointment.id == PydanticObjectId(appointment_id),
+            Appointment.individual_id == individual_id,
+        )
+
+        if not appointment:
+            return None
+
+        # Appointments created before check-in tokens existed get one on demand
+        if not appointment.checkin_token:
+            appointment.checkin_token = create_checkin_token(str(appointment.id))
+            await appointment.save()
+
+        return {
+            "appointment_id": str(appointment.id),
+            "status": appointment.status,
+            "checkin_token": appointment.checkin_token,
+            "qr_payload": build_checkin_payload(appointment.checkin_token),
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the check-in code: {e}",
+        )
@@ -0,0 +1,50 @@
+from app.models.lease import SchedulerLease
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta, timezone
+import os
+import socket
+import uuid
+
+# Identifies this process as the owner of the leases it takes
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease_in_db(name: str, ttl_seconds: int) -> bool:
+    """
+    Take or renew a lease, only one worker holds a given lease at a time
+    :param name: The name of the lease, one per scheduler
+    :param ttl_seconds: How long the lease is held without being renewed
+    :return: Whether this worker holds the lease
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        lease = await SchedulerLease.get_motor_collection().find_one_and_update(
+            {
+                "name": name,
+                "$or": [{"owner": WORKER_ID}, {"expires_at": {"$lt": now}}],
+            },
+            {
+                "$set": {
+                    "owner": WORKER_ID,
+                    "expires_at": now + timedelta(seconds=ttl_seconds),
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another worker holds a valid lease
+        return False
+    return lease is not None and lease["owner"] == WORKER_ID
+
+
+async def release_lease_in_db(name: str):
+    """
+    Give a lease back so that another worker can take it right away
+    :param name: The name of the lease
+    """
+    await SchedulerLease.get_motor_collection().update_one(
+        {"name": name, "owner": WORKER_ID},
+        {"$set": {"expires_at": datetime.now(timezone.utc)}},
+    )
@@ -0,0 +1,301 @@
+from app.models.pledge import DonationPledge
+from app.models.donation import Donation
+from app.services.donation_stats_service import record_donations_in_db
+from app.services.user_service import get_user_names_by_ids
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from beanie.operators import In, Set
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import calendar
+
+# Number of due pledges turned into donations per insert_many
+PLEDGE_BATCH_SIZE = 200
+
+# Retry delays after a failure: 1 minute, doubling up to a day
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 86400
+
+# A pledge failing this many times in a row is paused
+MAX_PLEDGE_FAILURES = 8
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Datetimes read back from MongoDB are naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def next_period(period_start: datetime, frequency: str, anchor_day: int) -> datetime:
+    """
+    The start of the period following the given one
+    :param period_start: The start of the current period
+    :param frequency: weekly or monthly
+    :param anchor_day: The day of month of monthly pledges, kept across short months
+    """
+    if frequency == "weekly":
+        return period_start + timedelta(days=7)
+
+    year, month = period_start.year, period_start.month + 1
+    if month > 12:
+        year, month = year + 1, 1
+    day = min(anchor_day, calendar.monthrange(year, month)[1])
+    return period_start.replace(year=year, month=month, day=day)
+
+
+def _retry_delay(failures: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS))
+
+
+def _format_pledge(pledge: DonationPledge) -> dict:
+    pledge = pledge.model_dump()
+    pledge["id"] = str(pledge["id"])
+    return pledge
+
+
+async def create_pledge_in_db(
+    donor_id: str,
+    foodbank_id: str,
+    amount: float,
+    frequency: str,
+    start_date: Optional[datetime] = None,
+):
+    """
+    Create a recurring donation pledge
+    :param donor_id: The ID of the donor
+    :param foodbank_id: The foodbank receiving the donations
+    :param amount: The amount of every donation
+    :param frequency: weekly or monthly
+    :param start_date: The first donation date, now by default
+    """
+    now = datetime.now(timezone.utc)
+    start = _as_utc(start_date) if start_date else now
+
+    # The scheduler pays every period up to now, a past start would pay the missed ones
+    if start.date() < now.date():
+        raise HTTPException(status_code=400, detail="start_date cannot be in the past")
+
+    try:
+        pledge = DonationPledge(
+            donor_id=donor_id,
+            foodbank_id=foodbank_id,
+            amount=amount,
+            frequency=frequency,
+            period_start=start,
+            anchor_day=start.day,
+            next_run=start,
+        )
+        await pledge.insert()
+        return _format_pledge(pledge)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Error creating the pledge in db: {e}"
+        )
+
+
+async def get_pledges_by_donor(donor_id: str):
+    """
+    Retrieve the pledges of a donor, newest first
+    :param donor_id: The ID of the donor
+    """
+    try:
+        pledges = (
+            await DonationPledge.find(DonationPledge.donor_id == donor_id)
+            .sort("-created_at")
+            .to_list()
+        )
+        foodbank_names = await get_user_names_by_ids(
+            pledge.foodbank_id for pledge in pledges
+        )
+
+        pledge_list = []
+        for pledge in pledges:
+            pledge = _format_pledge(pledge)
+            pledge["foodbank_name"] = foodbank_names.get(pledge["foodbank_id"], "Unknown")
+            pledge_list.append(pledge)
+        return pledge_list
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error retrieving the pledges of donor {donor_id}: {e}",
+        )
+
+
+async def update_pledge_in_db(
+    donor_id: str,
+    pledge_id: str,
+    status: Optional[str] = None,
+    amount: Optional[float] = None,
+):
+    """
+    Pause, resume or cancel a pledge, or change its amount
+    :param donor_id: The ID of the donor, the pledge must belong to them
+    :param pledge_id: The ID of the pledge
+    :param status: active, paused or cancelled
+    :param amount: The new amount of the next donations
+    """
+    try:
+        pledge = await DonationPledge.find_one(
+            DonationPledge.id == PydanticObjectId(pledge_id),
+            DonationPledge.donor_id == donor_id,
+        )
+    except Exception:
+        pledge = None
+    if not pledge:
+        raise HTTPException(status_code=404, detail="Pledge not found")
+    if pledge.status == "cancelled":
+        raise HTTPException(status_code=400, detail="The pledge is cancelled")
+
+    now = datetime.now(timezone.utc)
+    if amount is not None:
+        pledge.amount = amount
+    if status == "active" and pledge.status != "active":
+        # A resumed pledge does not pay the periods it missed while paused
+        period_start = _as_utc(pledge.period_start)
+        while period_start < now:
+            period_start = next_period(period_start, pledge.frequency, pledge.anchor_day)
+        pledge.period_start = period_start
+        pledge.next_run = period_start
+        pledge.failures = 0
+        pledge.last_error = None
+    if status:
+        pledge.status = status
+    pledge.updated_at = now
+
+    try:
+        await pledge.save()
+        return _format_pledge(pledge)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Error updating the pledge in db: {e}"
+        )
+
+
+async def process_due_pledges_in_db() -> int:
+    """
+    Create the donations of a batch of due pledges.
+    The donations are inserted with one insert_many. The unique (pledge_id, scheduled_for)
+    index turns a retried period into a duplicate, which counts as paid.
+    :return: The number of pledges processed, 0 once nothing is due
+    """
+    now = datetime.now(timezone.utc)
+    pledges = (
+        await DonationPledge.find(
+            DonationPledge.status == "active", DonationPledge.next_run <= now
+        )
+        .sort("+next_run")
+        .limit(PLEDGE_BATCH_SIZE)
+        .to_list()
+    )
+    if not pledges:
+        return 0
+
+    donations = [
+        Donation(
+            id=PydanticObjectId(),
+            donor_id=pledge.donor_id,
+            foodbank_id=pledge.foodbank_id,
+            amount=pledge.amount,
+            status="confirmed",
+            pledge_id=str(pledge.id),
+            scheduled_for=pledge.period_start,
+            recorded=False,
+            created_at=now,
+            updated_at=now,
+        )
+        for pledge in pledges
+    ]
+
+    failed = {}
+    duplicates = []
+    try:
+        await Donation.insert_many(donations, ordered=False)
+        inserted = donations
+    except BulkWriteError as e:
+        # Duplicates were paid by an earlier attempt, anything else is retried
+        not_inserted = set()
+        for error in e.details.get("writeErrors", []):
+            not_inserted.add(error["index"])
+            if error["code"] == DUPLICATE_KEY_ERROR:
+                duplicates.append(donations[error["index"]])
+            else:
+                failed[pledges[error["index"]].id] = error.get("errmsg", "Insert failed")
+        inserted = [
+            donation for index, donation in enumerate(donations) if index not in not_inserted
+        ]
+    except Exception as e:
+        inserted = []
+        failed = {pledge.id: str(e) for pledge in pledges}
+
+    # Count the donations before anything else can fail, along with the duplicates
+    # an earlier attempt inserted but stopped before counting
+    await _record_pledge_donations(inserted + await _unrecorded_duplicates(duplicates))
+
+    operations = []
+    for pledge in pledges:
+        if pledge.id in failed:
+            failures = pledge.failures + 1
+            changes = {
+                "failures": failures,
+                "last_error": failed[pledge.id],
+                "next_run": now + _retry_delay(failures),
+                "updated_at": now,
+            }
+            if failures >= MAX_PLEDGE_FAILURES:
+                changes["status"] = "paused"
+        else:
+            period_start = next_period(
+                _as_utc(pledge.period_start), pledge.frequency, pledge.anchor_day
+            )
+            changes = {
+                "period_start": period_start,
+                "next_run": period_start,
+                "failures": 0,
+                "last_error": None,
+                "last_run_at": now,
+                "updated_at": now,
+            }
+        # Skip the pledges the donor changed in the meantime
+        operations.append(
+            UpdateOne(
+                {"_id": pledge.id, "status": "active", "next_run": pledge.next_run},
+                {"$set": changes},
+            )
+        )
+
+    await DonationPledge.get_motor_collection().bulk_write(operations, ordered=False)
+
+    return len(pledges)
+
+
+async def _unrecorded_duplicates(duplicates: list) -> list:
+    if not duplicates:
+        return []
+    keys = {
+        (donation.pledge_id, _as_utc(donation.scheduled_for)) for donation in duplicates
+    }
+    existing = await Donation.find(
+        In(Donation.pledge_id, list({pledge_id for pledge_id, _ in keys})),
+        Donation.recorded == False,
+    ).to_list()
+    return [
+        donation
+        for donation in existing
+        if (donation.pledge_id, _as_utc(donation.scheduled_for)) in keys
+    ]
+
+
+async def _record_pledge_donations(donations: list):
+    if not donations:
+        return
+    await record_donations_in_db(donations)
+    # A crash before this write counts the donations again on the next attempt,
+    # derived totals are rather counted twice than lost
+    await Donation.find(
+        In(Donation.id, [donation.id for donation in donations])
+    ).update_many(Set({Donation.recorded: True}))
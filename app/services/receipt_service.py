@@ -0,0 +1,297 @@
+from app.models.donation import Donation, DonorSummary
+from app.models.receipt import ReceiptJob
+from app.services.user_service import get_user_names_by_ids
+from app.utils.receipt_renderer import receipt_path, write_receipts
+from app.config import settings
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import asyncio
+import os
+
+# Number of donors rendered by a worker process in one task
+RECEIPT_BATCH_SIZE = 100
+
+# A running job that made no progress for this long is considered dead and can resume
+STALE_JOB_SECONDS = 300
+
+
+def _year_filter(foodbank_id: str, year: int) -> dict:
+    return {
+        "foodbank_id": foodbank_id,
+        "status": "confirmed",
+        "created_at": {
+            "$gte": datetime(year, 1, 1, tzinfo=timezone.utc),
+            "$lt": datetime(year + 1, 1, 1, tzinfo=timezone.utc),
+        },
+    }
+
+
+def _format_job(job: ReceiptJob) -> dict:
+    job = job.model_dump()
+    job["id"] = str(job["id"])
+    job["progress"] = (
+        round(job["processed_donors"] / job["total_donors"] * 100, 1)
+        if job["total_donors"]
+        else (100.0 if job["status"] == "completed" else 0.0)
+    )
+    return job
+
+
+async def start_receipt_job_in_db(foodbank_id: str, year: int):
+    """
+    Claim the receipt generation of a foodbank for a year.
+    A failed or interrupted job resumes where it stopped, a completed one starts over.
+    :param foodbank_id: A unique identifier for foodbank
+    :param year: The tax year
+    :return: The claimed job
+    """
+    now = datetime.now(timezone.utc)
+    existing = await ReceiptJob.find_one(
+        ReceiptJob.foodbank_id == foodbank_id, ReceiptJob.year == year
+    )
+
+    changes = {"status": "running", "updated_at": now, "error": None, "finished_at": None}
+    if existing is None or existing.status == "completed":
+        changes.update(
+            {
+                "started_at": now,
+                "total_donors": 0,
+                "processed_donors": 0,
+                "last_donor_id": None,
+            }
+        )
+
+    try:
+        # Only one generation per foodbank and year can run at a time
+        job = await ReceiptJob.get_motor_collection().find_one_and_update(
+            {
+                "foodbank_id": foodbank_id,
+                "year": year,
+                "$or": [
+                    {"status": {"$ne": "running"}},
+                    {"updated_at": {"$lt": now - timedelta(seconds=STALE_JOB_SECONDS)}},
+                ],
+            },
+            {"$set": changes},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=409,
+            detail=f"The {year} receipts are already being generated",
+        )
+
+    job["id"] = job.pop("_id")
+    return _format_job(ReceiptJob(**job))
+
+
+async def _build_receipts(foodbank_name: str, year: int, rows: list) -> list:
+    donor_names = await get_user_names_by_ids(row["_id"] for row in rows)
+    return [
+        {
+            "foodbank_name": foodbank_name,
+            "donor_id": row["_id"],
+            "donor_name": donor_names.get(row["_id"], "Unknown"),
+            "year": year,
+            "total": row["total"],
+            "donations": [
+                {
+                    "id": str(donation["id"]),
+                    "date": donation["created_at"].strftime("%Y-%m-%d"),
+                    "amount": donation["amount"],
+                }
+                for donation in row["donations"]
+            ],
+        }
+        for row in rows
+    ]
+
+
+async def run_receipt_job(foodbank_id: str, year: int):
+    """
+    Generate the year-end receipts of every donor of a foodbank.
+    Donations are streamed grouped by donor, in donor ID order, and the receipts are
+    rendered and written by a pool of worker processes so that the API stays responsive.
+    Progress is saved after each batch, in order, so an interrupted job can resume.
+    :param foodbank_id: A unique identifier for foodbank
+    :param year: The tax year
+    """
+    jobs = ReceiptJob.get_motor_collection()
+    job_filter = {"foodbank_id": foodbank_id, "year": year}
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=settings.RECEIPT_WORKER_PROCESSES)
+
+    try:
+        job = await jobs.find_one(job_filter)
+        donations = Donation.get_motor_collection()
+        match = _year_filter(foodbank_id, year)
+
+        donor_count = await donations.aggregate(
+            [{"$match": match}, {"$group": {"_id": "$donor_id"}}, {"$count": "donors"}],
+            allowDiskUse=True,
+        ).to_list(length=1)
+        await jobs.update_one(
+            job_filter,
+            {"$set": {"total_donors": donor_count[0]["donors"] if donor_count else 0}},
+        )
+
+        if job.get("last_donor_id"):
+            match["donor_id"] = {"$gt": job["last_donor_id"]}
+
+        # Every donation of a donor in one row, donors in ID order
+        cursor = donations.aggregate(
+            [
+                {"$match": match},
+                {"$sort": {"donor_id": 1, "created_at": 1}},
+                {
+                    "$group": {
+                        "_id": "$donor_id",
+                        "total": {"$sum": "$amount"},
+                        "donations": {
+                            "$push": {
+                                "id": "$_id",
+                                "amount": "$amount",
+                                "created_at": "$created_at",
+                            }
+                        },
+                    }
+                },
+                {"$sort": {"_id": 1}},
+            ],
+            allowDiskUse=True,
+        )
+
+        foodbank_name = (await get_user_names_by_ids([foodbank_id])).get(
+            foodbank_id, "Unknown"
+        )
+
+        in_flight = deque()
+
+        async def submit(rows):
+            receipts = await _build_receipts(foodbank_name, year, rows)
+            future = loop.run_in_executor(
+                pool, write_receipts, settings.RECEIPTS_DIR, foodbank_id, year, receipts
+            )
+            in_flight.append((future, rows[-1]["_id"]))
+
+        async def finish_oldest():
+            # Batches are acknowledged in order, so last_donor_id never skips a donor
+            future, last_donor_id = in_flight.popleft()
+            written = await future
+            await jobs.update_one(
+                job_filter,
+                {
+                    "$set": {
+                        "last_donor_id": last_donor_id,
+                        "updated_at": datetime.now(timezone.utc),
+                    },
+                    "$inc": {"processed_donors": written},
+                },
+            )
+
+        batch = []
+        async for row in cursor:
+            batch.append(row)
+            if len(batch) >= RECEIPT_BATCH_SIZE:
+                await submit(batch)
+                batch = []
+                # Keep every worker busy without queueing the whole year in memory
+                while len(in_flight) >= settings.RECEIPT_WORKER_PROCESSES * 2:
+                    await finish_oldest()
+        if batch:
+            await submit(batch)
+        while in_flight:
+            await finish_oldest()
+
+        now = datetime.now(timezone.utc)
+        await jobs.update_one(
+            job_filter,
+            {"$set": {"status": "completed", "updated_at": now, "finished_at": now}},
+        )
+    except Exception as e:
+        print(f"An error occurred while generating the {year} receipts: {e}")
+        await jobs.update_one(
+            job_filter,
+            {
+                "$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "updated_at": datetime.now(timezone.utc),
+                }
+            },
+        )
+    finally:
+        # Never wait here, it would block the event loop
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def get_receipt_job_in_db(foodbank_id: str, year: int):
+    """
+    Retrieve the progress of the receipt generation of a foodbank for a year
+    :param foodbank_id: A unique identifier for foodbank
+    :param year: The tax year
+    """
+    job = await ReceiptJob.find_one(
+        ReceiptJob.foodbank_id == foodbank_id, ReceiptJob.year == year
+    )
+    if not job:
+        raise HTTPException(
+            status_code=404, detail=f"The {year} receipts were never generated"
+        )
+    return _format_job(job)
+
+
+async def list_donor_receipts_in_db(donor_id: str, year: int):
+    """
+    Retrieve the foodbanks that issued a receipt to a donor for a year
+    :param donor_id: The ID of the donor
+    :param year: The tax year
+    """
+    summary = await DonorSummary.find_one(DonorSummary.donor_id == donor_id)
+    if not summary:
+        return []
+
+    foodbank_ids = [
+        foodbank_id
+        for foodbank_id in summary.by_foodbank
+        if os.path.exists(
+            receipt_path(settings.RECEIPTS_DIR, foodbank_id, year, donor_id)
+        )
+    ]
+    foodbank_names = await get_user_names_by_ids(foodbank_ids)
+
+    return [
+        {
+            "foodbank_id": foodbank_id,
+            "foodbank_name": foodbank_names.get(foodbank_id, "Unknown"),
+            "year": year,
+        }
+        for foodbank_id in foodbank_ids
+    ]
+
+
+def get_donor_receipt_path(donor_id: str, foodbank_id: str, year: int) -> str:
+    """
+    Locate the receipt of a donor
+    :param donor_id: The ID of the donor
+    :param foodbank_id: The foodbank that issued the receipt
+    :param year: The tax year
+    :return: The path of the receipt file
+    """
+    # IDs end up in the path, so only accept real ones
+    try:
+        PydanticObjectId(foodbank_id)
+        PydanticObjectId(donor_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+
+    path = receipt_path(settings.RECEIPTS_DIR, foodbank_id, year, donor_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return path
@@ -0,0 +1,294 @@
+from app.models.job_recommendation import JobRecommendation, RecommendedJob
+from app.models.application import Application
+from app.models.volunteer_activity import VolunteerActivity
+from app.models.job import Job, JobTitle
+from app.models.user import User
+from app.services.user_service import get_user_names_by_ids
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from typing import List
+import math
+
+# Number of jobs kept in each volunteer's feed
+FEED_SIZE = 20
+
+# Number of volunteers processed per batch during a full refresh
+REFRESH_BATCH_SIZE = 200
+
+# Weight of the category affinity and of the job recency in the score
+AFFINITY_WEIGHT = 0.7
+RECENCY_WEIGHT = 0.3
+
+# A job posted this many days ago gets half of the recency score
+RECENCY_HALF_LIFE_DAYS = 14
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Datetimes read back from MongoDB are naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _normalize(values: dict) -> dict:
+    highest = max(values.values(), default=0)
+    if highest <= 0:
+        return {}
+    return {key: value / highest for key, value in values.items()}
+
+
+def _category_weights(activities: list, applied_categories: list) -> dict:
+    """
+    Combine the hours worked and the applications sent per category into an affinity in [0, 1]
+    """
+    hours = {}
+    for activity in activities:
+        worked = (
+            activity.working_hours.end - activity.working_hours.start
+        ).total_seconds() / 3600
+        hours[activity.category] = hours.get(activity.category, 0) + max(worked, 0)
+
+    applications = {}
+    for category in applied_categories:
+        applications[category] = applications.get(category, 0) + 1
+
+    hours = _normalize(hours)
+    applications = _normalize(applications)
+
+    return {
+        category: 0.6 * hours.get(category, 0) + 0.4 * applications.get(category, 0)
+        for category in set(hours) | set(applications)
+    }
+
+
+def _score_job(job: dict, category_weights: dict, now: datetime) -> float:
+    age_days = max((now - _as_utc(job["date_posted"])).total_seconds() / 86400, 0)
+    recency = math.pow(0.5, age_days / RECENCY_HALF_LIFE_DAYS)
+    affinity = category_weights.get(job["category"], 0)
+    return AFFINITY_WEIGHT * affinity + RECENCY_WEIGHT * recency
+
+
+def _recommended_job(job: dict, score: float) -> dict:
+    return RecommendedJob(
+        job_id=str(job["id"]),
+        foodbank_id=job["foodbank_id"],
+        event_id=job.get("event_id"),
+        title=job["title"],
+        category=job["category"],
+        location=job["location"],
+        deadline=job["deadline"],
+        score=round(score, 6),
+    ).model_dump()
+
+
+async def _load_open_jobs() -> list:
+    jobs = await Job.find(
+        Job.status == "available",
+        Job.deadline > datetime.now(timezone.utc),
+        with_children=True,
+    ).to_list()
+    return [job.model_dump() for job in jobs]
+
+
+async def build_recommendations_in_db(volunteer_ids: List[str], open_jobs: list = None):
+    """
+    Recompute the feed of a batch of volunteers, using one query per collection
+    :param volunteer_ids: The IDs of the volunteers
+    :param open_jobs: The open jobs, loaded from db if not given
+    """
+    if not volunteer_ids:
+        return
+
+    if open_jobs is None:
+        open_jobs = await _load_open_jobs()
+
+    applications = await Application.find(
+        In(Application.volunteer_id, volunteer_ids), with_children=True
+    ).to_list()
+
+    activities = await VolunteerActivity.find(
+        In(VolunteerActivity.application_id, [str(app.id) for app in applications])
+    ).to_list()
+
+    applied_job_ids = []
+    for application in applications:
+        try:
+            applied_job_ids.append(PydanticObjectId(application.job_id))
+        except Exception:
+            continue
+    applied_jobs = (
+        await Job.find(In(Job.id, applied_job_ids), with_children=True)
+        .project(JobTitle)
+        .to_list()
+    )
+    job_categories = {str(job.id): job.category for job in applied_jobs}
+
+    # Group the history by volunteer
+    volunteer_by_application = {}
+    history = {
+        volunteer_id: {"activities": [], "categories": [], "job_ids": set()}
+        for volunteer_id in volunteer_ids
+    }
+    for application in applications:
+        volunteer_by_application[str(application.id)] = application.volunteer_id
+        history[application.volunteer_id]["job_ids"].add(application.job_id)
+        if application.job_id in job_categories:
+            history[application.volunteer_id]["categories"].append(
+                job_categories[application.job_id]
+            )
+    for activity in activities:
+        volunteer_id = volunteer_by_application.get(activity.application_id)
+        if volunteer_id:
+            history[volunteer_id]["activities"].append(activity)
+
+    now = datetime.now(timezone.utc)
+    operations = []
+
+    for volunteer_id, volunteer_history in history.items():
+        weights = _category_weights(
+            volunteer_history["activities"], volunteer_history["categories"]
+        )
+        scored = [
+            (_score_job(job, weights, now), job)
+            for job in open_jobs
+            if str(job["id"]) not in volunteer_history["job_ids"]
+        ]
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+
+        operations.append(
+            UpdateOne(
+                {"volunteer_id": volunteer_id},
+                {
+                    "$set": {
+                        "category_weights": weights,
+                        "categories": [
+                            category for category, weight in weights.items() if weight > 0
+                        ],
+                        "applied_job_ids": list(volunteer_history["job_ids"]),
+                        "jobs": [
+                            _recommended_job(job, score)
+                            for score, job in scored[:FEED_SIZE]
+                        ],
+                        "refreshed_at": now,
+                    }
+                },
+                upsert=True,
+            )
+        )
+
+    await JobRecommendation.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def refresh_all_recommendations_in_db():
+    """
+    Recompute the feed of every volunteer in batches, loading the open jobs only once
+    """
+    open_jobs = await _load_open_jobs()
+    batch = []
+
+    async for volunteer in User.find(User.role == "volunteer"):
+        batch.append(str(volunteer.id))
+        if len(batch) >= REFRESH_BATCH_SIZE:
+            await build_recommendations_in_db(batch, open_jobs)
+            batch = []
+
+    await build_recommendations_in_db(batch, open_jobs)
+
+
+async def refresh_volunteer_recommendations_in_db(volunteer_id: str):
+    """
+    Recompute the feed of a single volunteer after a new application or activity
+    :param volunteer_id: The ID of the volunteer
+    """
+    try:
+        await build_recommendations_in_db([volunteer_id])
+    except Exception as e:
+        print(f"An error occurred while refreshing the recommendations: {e}")
+
+
+async def add_job_to_recommendations_in_db(job: dict):
+    """
+    Insert a newly posted job into the feeds it belongs to, without rebuilding them.
+    Only the feeds of the volunteers with an affinity for the category of the job are
+    read, the others get the job from the periodic refresh.
+    :param job: The created job
+    """
+    try:
+        if job["status"] != "available":
+            return
+
+        now = datetime.now(timezone.utc)
+        collection = JobRecommendation.get_motor_collection()
+        operations = []
+
+        async for feed in collection.find(
+            {"categories": job["category"]}, {"category_weights": 1, "jobs.score": 1}
+        ):
+            score = _score_job(job, feed.get("category_weights", {}), now)
+            scores = [entry["score"] for entry in feed.get("jobs", [])]
+
+            if len(scores) >= FEED_SIZE and score <= min(scores):
+                continue
+
+            operations.append(
+                UpdateOne(
+                    {"_id": feed["_id"]},
+                    {
+                        "$push": {
+                            "jobs": {
+                                "$each": [_recommended_job(job, score)],
+                                "$sort": {"score": -1},
+                                "$slice": FEED_SIZE,
+                            }
+                        }
+                    },
+                )
+            )
+
+            if len(operations) >= 1000:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"An error occurred while adding the job to the recommendations: {e}")
+
+
+async def get_recommended_jobs_in_db(volunteer_id: str):
+    """
+    Retrieve the precomputed job feed of a volunteer
+    :param volunteer_id: The ID of the volunteer
+    """
+    try:
+        feed = await JobRecommendation.find_one(
+            JobRecommendation.volunteer_id == volunteer_id
+        )
+
+        # The first visit builds the feed, the next ones are a single read
+        if not feed:
+            await build_recommendations_in_db([volunteer_id])
+            feed = await JobRecommendation.find_one(
+                JobRecommendation.volunteer_id == volunteer_id
+            )
+
+        now = datetime.now(timezone.utc)
+        jobs = [
+            job.model_dump()
+            for job in feed.jobs
+            if _as_utc(job.deadline) > now and job.job_id not in feed.applied_job_ids
+        ]
+
+        foodbank_names = await get_user_names_by_ids(job["foodbank_id"] for job in jobs)
+        for job in jobs:
+            job["foodbank_name"] = foodbank_names.get(job["foodbank_id"], "Unknown")
+
+        return jobs
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while fetching the recommended jobs: {e}",
+        )
@@ -0,0 +1,130 @@
+from app.models.inventory import MainInventory
+from datetime import datetime, timezone
+from typing import Dict, Iterable
+
+
+def merge_quantities(items: Iterable[dict]) -> Dict[str, float]:
+    """
+    Sum the quantities of a list of food items by food name
+    :param items: Dictionaries with food_name and quantity
+    """
+    quantities = {}
+    for item in items:
+        quantities[item["food_name"]] = (
+            quantities.get(item["food_name"], 0) + item["quantity"]
+        )
+    return quantities
+
+
+def _changed_stock(quantities: Dict[str, float]) -> dict:
+    # The stock array with the quantities added to the matching items, computed by the
+    # server within the update. Items missing from the stock are appended and the
+    # items left without quantity are dropped.
+    updated = {
+        "$map": {
+            "input": {"$ifNull": ["$stock", []]},
+            "as": "item",
+            "in": {
+                "$switch": {
+                    "branches": [
+                        {
+                            "case": {"$eq": ["$$item.food_name", {"$literal": name}]},
+                            "then": {
+                                "food_name": "$$item.food_name",
+                                "quantity": {"$add": ["$$item.quantity", quantity]},
+                            },
+                        }
+                        for name, quantity in quantities.items()
+                    ],
+                    "default": "$$item",
+                }
+            },
+        }
+    }
+    appended = {
+        "$filter": {
+            "input": {
+                "$literal": [
+                    {"food_name": name, "quantity": quantity}
+                    for name, quantity in quantities.items()
+                    if quantity > 0
+                ]
+            },
+            "as": "new",
+            "cond": {
+                "$not": [
+                    {"$in": ["$$new.food_name", {"$ifNull": ["$stock.food_name", []]}]}
+                ]
+            },
+        }
+    }
+    return {
+        "$filter": {
+            "input": {"$concatArrays": [updated, appended]},
+            "as": "item",
+            "cond": {"$gt": ["$$item.quantity", 0]},
+        }
+    }
+
+
+async def add_stock_in_db(foodbank_id: str, quantities: Dict[str, float]) -> bool:
+    """
+    Add quantities to the main inventory of a foodbank in a single atomic update,
+    creating the inventory if needed. Concurrent stock changes are never overwritten.
+    :param foodbank_id: The ID of the foodbank
+    :param quantities: Food name -> quantity to add
+    :return: True if the inventory was created by this update
+    """
+    if not quantities:
+        return False
+
+    result = await MainInventory.get_motor_collection().update_one(
+        {"foodbank_id": foodbank_id},
+        [
+            {
+                "$set": {
+                    "stock": _changed_stock(quantities),
+                    "last_updated": datetime.now(timezone.utc),
+                }
+            }
+        ],
+        upsert=True,
+    )
+    return result.upserted_id is not None
+
+
+async def take_stock_in_db(foodbank_id: str, quantities: Dict[str, float]) -> bool:
+    """
+    Take quantities out of the main inventory of a foodbank, all or nothing, in a
+    single atomic update guarded by the available quantities
+    :param foodbank_id: The ID of the foodbank
+    :param quantities: Food name -> quantity to take
+    :return: True if the stock was taken, False if an item is missing or short
+    """
+    if not quantities:
+        return True
+
+    result = await MainInventory.get_motor_collection().update_one(
+        {
+            "foodbank_id": foodbank_id,
+            "$and": [
+                {
+                    "stock": {
+                        "$elemMatch": {"food_name": name, "quantity": {"$gte": quantity}}
+                    }
+                }
+                for name, quantity in quantities.items()
+            ],
+        },
+        [
+            {
+                "$set": {
+                    "stock": _changed_stock(
+                        {name: -quantity for name, quantity in quantities.items()}
+                    ),
+                    "last_updated": datetime.now(timezone.utc),
+                }
+            }
+        ],
+    )
+    return result.modified_count == 1
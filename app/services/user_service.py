@@ -1,6 +1,18 @@
 from app.models.user import User
 from fastapi import HTTPException
 from beanie import PydanticObjectId
+from beanie.operators import In
+from pydantic import BaseModel, Field
+from typing import Iterable
+from app.utils.ttl_cache import TTLCache
+
+# Display names rarely change, keep them for a few minutes
+_display_name_cache = TTLCache(maxsize=4096, ttl_seconds=300)
+
+
+class UserDisplayName(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
 
 
 async def get_user_by_id(id: str):
@@ -56,3 +68,33 @@ async def create_user_in_db(name: str, role: str, email: str, password: str):
             status_code=400,
             detail=f"An error occurred while creating new user in db: {e}",
         )
+
+
+async def get_user_names_by_ids(user_ids: Iterable[str]) -> dict:
+    """
+    Resolve the display names of many users with at most one query
+    :param user_ids: The IDs of the users (foodbanks, volunteers, ...)
+    :return: A dictionary of user ID -> name, unknown IDs are left out
+    """
+    names = {}
+    missing = []
+
+    for user_id in set(user_ids):
+        if not user_id:
+            continue
+        name = _display_name_cache.get(user_id)
+        if name is not None:
+            names[user_id] = name
+            continue
+        try:
+            missing.append(PydanticObjectId(user_id))
+        except Exception:
+            continue
+
+    if missing:
+        users = await User.find(In(User.id, missing)).project(UserDisplayName).to_list()
+        for user in users:
+            names[str(user.id)] = user.name
+            _display_name_cache.set(str(user.id), user.name)
+
+    return names
@@ -3,8 +3,12 @@ from app.models.volunteer_activity import VolunteerActivity
 from app.models.job import Job
 from app.models.user import User
 from beanie import PydanticObjectId
+from app.services.user_service import get_user_names_by_ids
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
+from typing import Optional
+import re
 from app.models.event import Event, EventInventory
 
 
@@ -14,6 +18,7 @@ async def add_event_application_in_db(volunteer_id: str, event_id: str, job_id:
     :param event_id: the event ID
     :param volunteer_id: the volunteer ID
     :param job_id: The unique identifier for available jobs
+    :return: The created application, or False if the volunteer already applied
     """
     try:
         new_application = EventApplication(
@@ -21,7 +26,11 @@ async def add_event_application_in_db(volunteer_id: str, event_id: str, job_id:
             event_id=event_id,
             job_id=job_id,
         )
-        await new_application.insert()
+        # The unique (volunteer_id, job_id) index rejects a second application
+        try:
+            await new_application.insert()
+        except DuplicateKeyError:
+            return False
         new_application = new_application.model_dump()
         new_application["id"] = str(new_application["id"])
         return new_application
@@ -41,23 +50,20 @@ async def add_foodbank_job_application_in_db(
     :param volunteer_id: The unique identifier for volunteer
     :param foodbank_id: The unique identifier for foodbank
     :param job_id: The unique identifier for available jobs
+    :return: The created application, or False if the volunteer already applied
     """
     try:
-        existing_application = await Application.find_one(
-            Application.volunteer_id == volunteer_id,
-            Application.foodbank_id == foodbank_id,
-            Application.job_id == job_id,
-        )
-        if existing_application:
-            return False
-
         new_application = Application(
             volunteer_id=volunteer_id,
             foodbank_id=foodbank_id,
             job_id=job_id,
         )
 
-        await new_application.insert()
+        # The unique (volunteer_id, job_id) index rejects a second application
+        try:
+            await new_application.insert()
+        except DuplicateKeyError:
+            return False
         new_application = new_application.model_dump()
         new_application["id"] = str(new_application["id"])
         return new_application
@@ -69,28 +75,81 @@ async def add_foodbank_job_application_in_db(
         )
 
 
+def _summarize_activity(facets: dict) -> dict:
+    total = facets["total"][0] if facets["total"] else {"hours": 0, "shifts": 0}
+    return {
+        "total_hours": round(total["hours"], 2),
+        "total_shifts": total["shifts"],
+        "hours_by_category": {
+            row["_id"]: round(row["hours"], 2) for row in facets["by_category"]
+        },
+        "hours_by_month": {
+            row["_id"]: round(row["hours"], 2) for row in facets["by_month"]
+        },
+    }
+
+
 async def retrieve_volunteer_activity_in_db(volunteer_id):
     """
-    Retrieve the list of volunteer activity
+    Retrieve the list of volunteer activity along with the hours rollups
+    :return: A tuple of (activities, summary with total hours, hours per category and per month)
     """
     try:
-        volunteer_activity_list = []
-        applications = await Application.find(
-            Application.volunteer_id == volunteer_id
-        ).to_list()
-        application_ids = [str(app.id) for app in applications]
-        if not application_ids:
-            return []
-        for app_id in application_ids:
-            activities = await VolunteerActivity.find(
-                VolunteerActivity.application_id == app_id
-            ).to_list()
+        # Worked hours of each activity, computed inside the aggregation
+        hours = {
+            "$divide": [
+                {"$subtract": ["$working_hours.end", "$working_hours.start"]},
+                3600000,
+            ]
+        }
+
+        # Fetch every activity and the rollups in a single query
+        pipeline = [
+            {"$match": {"volunteer_id": volunteer_id}},
+            {"$addFields": {"hours": hours}},
+            {
+                "$facet": {
+                    "activities": [{"$sort": {"date_worked": -1}}],
+                    "total": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "hours": {"$sum": "$hours"},
+                                "shifts": {"$sum": 1},
+                            }
+                        }
+                    ],
+                    "by_category": [
+                        {"$group": {"_id": "$category", "hours": {"$sum": "$hours"}}},
+                        {"$sort": {"hours": -1}},
+                    ],
+                    "by_month": [
+                        {
+                            "$group": {
+                                "_id": {
+                                    "$dateToString": {
+                                        "format": "%Y-%m",
+                                        "date": "$date_worked",
+                                    }
+                                },
+                                "hours": {"$sum": "$hours"},
+                            }
+                        },
+                        {"$sort": {"_id": 1}},
+                    ],
+                }
+            },
+        ]
+
+        facets = (await VolunteerActivity.aggregate(pipeline).to_list())[0]
 
-            for activity in activities:
-                activity_dict = activity.model_dump() | {"id": str(activity.id)}
-                volunteer_activity_list.append(activity_dict)
+        volunteer_activity_list = []
+        for activity in facets["activities"]:
+            activity["id"] = str(activity.pop("_id"))
+            activity["hours"] = round(activity["hours"], 2)
+            volunteer_activity_list.append(activity)
 
-        return volunteer_activity_list
+        return volunteer_activity_list, _summarize_activity(facets)
 
     except Exception as e:
         raise HTTPException(
@@ -107,22 +166,23 @@ async def retrieve_list_jobs_in_db():
     job_list = []
 
     try:
-        jobs = await Job.find().to_list()
+        # Expired jobs are filtered out by the query itself
+        jobs = await Job.find(
+            Job.status == "available",
+            Job.deadline > datetime.now(timezone.utc),
+            with_children=True,
+        ).to_list()
 
-        for job in jobs:
-            # Automate the process of updating the status of job
-            await job.check_and_update_status()
+        # Retrieve the foodbank names of every job at once
+        foodbank_names = await get_user_names_by_ids(job.foodbank_id for job in jobs)
 
-            if job.status == "available":
-                job = job.model_dump()
-                job["id"] = str(job["id"])
-                # Retrieve foodbank information by using the ID
-                foodbank = await User.get(PydanticObjectId(job["foodbank_id"]))
-                foodbank = foodbank.model_dump()
+        for job in jobs:
+            job = job.model_dump()
+            job["id"] = str(job["id"])
 
-                # Add the foodbank name to the list
-                job["foodbank_name"] = foodbank["name"]
-                job_list.append(job)
+            # Add the foodbank name to the list
+            job["foodbank_name"] = foodbank_names.get(job["foodbank_id"], "Unknown")
+            job_list.append(job)
 
         return job_list
     except Exception as e:
@@ -132,22 +192,89 @@ async def retrieve_list_jobs_in_db():
         )
 
 
+async def search_jobs_in_db(
+    search: str,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    page: int = 1,
+    limit: int = 20,
+):
+    """
+    Search the open foodbank and event jobs, most relevant first
+    :param search: The words to look for in the title, description, location and category
+    :param category: Optional exact category used to filter the jobs
+    :param location: Optional part of the location used to filter the jobs
+    :param page: The page number, starting at 1
+    :param limit: The number of jobs per page
+    :return: A tuple of (jobs, total number of matches)
+    """
+    match = {
+        "$text": {"$search": search},
+        "status": "available",
+        "deadline": {"$gt": datetime.now(timezone.utc)},
+    }
+    if category:
+        match["category"] = category
+    if location:
+        match["location"] = {"$regex": re.escape(location), "$options": "i"}
+
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "deadline": 1, "_id": 1}},
+        {
+            "$facet": {
+                "jobs": [{"$skip": (page - 1) * limit}, {"$limit": limit}],
+                "total": [{"$count": "count"}],
+            }
+        },
+    ]
+
+    try:
+        # Run on the collection itself: Job.aggregate would put its _class_id $match
+        # in front of the $text one, which must be the first stage. The collection
+        # holds both foodbank and event jobs.
+        result = (
+            await Job.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        )
+        jobs = result[0]["jobs"] if result else []
+        total = result[0]["total"][0]["count"] if result and result[0]["total"] else 0
+
+        # Retrieve the foodbank names of every job at once
+        foodbank_names = await get_user_names_by_ids(job["foodbank_id"] for job in jobs)
+
+        job_list = []
+        for job in jobs:
+            job["id"] = str(job.pop("_id"))
+            job.pop("_class_id", None)
+            job["foodbank_name"] = foodbank_names.get(job["foodbank_id"], "Unknown")
+            job_list.append(job)
+
+        return job_list, total
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while searching the jobs in db: {e}",
+        )
+
+
 async def retrieve_specific_job_in_db(job_id: str):
     """
     Retrieve the specific job based on the job id
     """
     try:
-        job = await Job.find_one(Job.id == PydanticObjectId(job_id))
+        job = await Job.find_one(
+            Job.id == PydanticObjectId(job_id),
+            Job.status == "available",
+            Job.deadline > datetime.now(timezone.utc),
+            with_children=True,
+        )
 
         if not job:
             return None
-        await job.check_and_update_status()
-
-        if job.status != "available":
-            return None
 
-        foodbank = await User.find_one(User.id == PydanticObjectId(job.foodbank_id))
-        foodbank_name = foodbank.name if foodbank else "Unknown"
+        foodbank_names = await get_user_names_by_ids([job.foodbank_id])
+        foodbank_name = foodbank_names.get(job.foodbank_id, "Unknown")
 
         job_dict = job.model_dump()
         job_dict["id"] = str(job.id)
@@ -170,19 +297,22 @@ async def retrieve_applied_job_in_db(volunteer_id: str):
 
     try:
         applications = await Application.find(
-            Application.volunteer_id == volunteer_id,
+            Application.volunteer_id == volunteer_id, with_children=True
         ).to_list()
 
+        # Retrieve the foodbank names of every application at once
+        foodbank_names = await get_user_names_by_ids(
+            application.foodbank_id for application in applications
+        )
+
         for application in applications:
             application = application.model_dump()
             application["id"] = str(application["id"])
 
-            # Retrieve foodbank information by using the ID
-            foodbank = await User.get(PydanticObjectId(application["foodbank_id"]))
-            foodbank = foodbank.model_dump()
-
             # Add the foodbank name to the list
-            application["foodbank_name"] = foodbank["name"]
+            application["foodbank_name"] = foodbank_names.get(
+                application["foodbank_id"], "Unknown"
+            )
             application_list.append(application)
 
         return application_list
@@ -201,6 +331,7 @@ async def delete_application(volunteer_id: str, application_id: str):
         application = await Application.find_one(
             Application.id == PydanticObjectId(application_id),
             Application.volunteer_id == volunteer_id,
+            with_children=True,
         )
         if not application:
             return False
@@ -0,0 +1,346 @@
+from app.models.waitlist import WaitlistEntry
+from app.models.appointment import Appointment
+from app.models.inventory import MainInventory
+from app.services.allowance_service import (
+    apply_allowance_changes_in_db,
+    appointment_allowance_change,
+    check_allowance_in_db,
+)
+from app.services.stock_service import merge_quantities, take_stock_in_db
+from app.utils.checkin_token import create_checkin_token
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import UpdateMany, UpdateOne
+from datetime import datetime, timezone
+from typing import List
+import uuid
+
+# Maximum number of queued requests examined in a single promotion pass
+PROMOTION_BATCH_SIZE = 200
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Datetimes read back from MongoDB are naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def add_to_waitlist_in_db(
+    individual_id: str, appointment_data: dict, waiting_for: List[str]
+):
+    """
+    Queue an appointment request until the foodbank has enough stock
+    :param individual_id: ID of the individual making the appointment
+    :param appointment_data: A detailed appointment information
+    :param waiting_for: Food names that do not have enough stock yet
+    :return: The created waitlist entry along with its position in the queue
+    """
+    try:
+        entry = WaitlistEntry(
+            individual_id=individual_id,
+            foodbank_id=appointment_data["foodbank_id"],
+            start_time=appointment_data["start_time"],
+            end_time=appointment_data["end_time"],
+            description=appointment_data.get("description", None),
+            product=appointment_data["product"],
+            waiting_for=waiting_for,
+        )
+        await entry.insert()
+
+        # Position of the request in the queue of the first missing item
+        position = await WaitlistEntry.find(
+            WaitlistEntry.foodbank_id == entry.foodbank_id,
+            WaitlistEntry.waiting_for == waiting_for[0],
+            WaitlistEntry.status == "waiting",
+            WaitlistEntry.created_at <= entry.created_at,
+        ).count()
+
+        entry = entry.model_dump()
+        entry["id"] = str(entry["id"])
+        entry["position"] = position
+        return entry
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while adding the request to the waitlist: {e}",
+        )
+
+
+async def promote_waitlist_in_db(foodbank_id: str, food_names: List[str]):
+    """
+    Turn queued requests into appointments after the inventory has been replenished.
+    Requests are served first come, first served for each food item: once a request
+    cannot be fulfilled, the items it is waiting for are held for it. Requests going
+    over the pickup allowance of the individual are rejected.
+    Entries are claimed before any stock is reserved, so concurrent promotions and
+    cancellations never serve the same entry twice.
+    :param foodbank_id: The ID of the foodbank whose inventory changed
+    :param food_names: Food names whose quantity increased
+    :return: A list of created appointment IDs
+    """
+    if not food_names:
+        return []
+
+    try:
+        entries = (
+            await WaitlistEntry.find(
+                WaitlistEntry.foodbank_id == foodbank_id,
+                WaitlistEntry.status == "waiting",
+                In(WaitlistEntry.waiting_for, list(food_names)),
+            )
+            .sort("+created_at", "+_id")
+            .limit(PROMOTION_BATCH_SIZE)
+            .to_list()
+        )
+
+        if not entries:
+            return []
+
+        inventory = await MainInventory.find_one(
+            MainInventory.foodbank_id == foodbank_id
+        )
+        if not inventory:
+            return []
+
+        # Plan the promotions on a snapshot of the stock, the reservations below are
+        # checked again against the live quantities
+        stock = {item.food_name: item.quantity for item in inventory.stock}
+        held = set()
+        promoted_individuals = set()
+        now = datetime.now(timezone.utc)
+        candidates = []
+        operations = []
+
+        for entry in entries:
+            # The requested time slot has passed, the request can not be served anymore
+            if _as_utc(entry.start_time) <= now:
+                operations.append(
+                    UpdateOne(
+                        {"_id": entry.id, "status": "waiting"},
+                        {"$set": {"status": "expired", "last_updated": now}},
+                    )
+                )
+                continue
+
+            short = [
+                item.food_name
+                for item in entry.product
+                if item.food_name in held
+                or stock.get(item.food_name, 0) < item.quantity
+            ]
+
+            if short:
+                held.update(short)
+                if set(short) != set(entry.waiting_for):
+                    operations.append(
+                        UpdateOne(
+                            {"_id": entry.id, "status": "waiting"},
+                            {"$set": {"waiting_for": short, "last_updated": now}},
+                        )
+                    )
+                continue
+
+            # The allowance counters only see the promotions of this pass once they are
+            # written, the other requests of the individual wait for the next pass
+            if entry.individual_id in promoted_individuals:
+                continue
+
+            # The allowance may have been used up since the request was queued
+            try:
+                await check_allowance_in_db(
+                    individual_id=entry.individual_id,
+                    foodbank_id=entry.foodbank_id,
+                    products=[item.model_dump() for item in entry.product],
+                    start_time=entry.start_time,
+                )
+            except HTTPException as e:
+                operations.append(
+                    UpdateOne(
+                        {"_id": entry.id, "status": "waiting"},
+                        {
+                            "$set": {
+                                "status": "rejected",
+                                "rejection_reason": e.detail,
+                                "last_updated": now,
+                            }
+                        },
+                    )
+                )
+                continue
+
+            promoted_individuals.add(entry.individual_id)
+            for item in entry.product:
+                stock[item.food_name] -= item.quantity
+            candidates.append(entry)
+
+        if operations:
+            await WaitlistEntry.get_motor_collection().bulk_write(
+                operations, ordered=False
+            )
+
+        if not candidates:
+            return []
+    except Exception as e:
+        # No stock was reserved yet, the next replenishment will retry the queue
+        print(f"An error occurred while promoting the waitlist: {e}")
+        return []
+
+    collection = WaitlistEntry.get_motor_collection()
+    token = uuid.uuid4().hex
+    new_appointments = []
+    released = []
+
+    try:
+        # Claim the entries still waiting, a concurrent promotion or cancellation gets
+        # the others
+        candidate_ids = [entry.id for entry in candidates]
+        await collection.update_many(
+            {"_id": {"$in": candidate_ids}, "status": "waiting"},
+            {
+                "$set": {
+                    "status": "promoting",
+                    "promotion_token": token,
+                    "last_updated": now,
+                }
+            },
+        )
+        claimed_ids = {
+            document["_id"]
+            async for document in collection.find(
+                {"_id": {"$in": candidate_ids}, "promotion_token": token}, {"_id": 1}
+            )
+        }
+
+        for entry in candidates:
+            if entry.id not in claimed_ids:
+                continue
+
+            # Reserve the stock of the request, only if it is still available
+            reserved = await take_stock_in_db(
+                foodbank_id, merge_quantities(item.model_dump() for item in entry.product)
+            )
+            if not reserved:
+                released.append(entry.id)
+                continue
+
+            appointment_id = PydanticObjectId()
+            new_appointments.append(
+                (
+                    entry,
+                    Appointment(
+                        id=appointment_id,
+                        checkin_token=create_checkin_token(str(appointment_id)),
+                        individual_id=entry.individual_id,
+                        foodbank_id=entry.foodbank_id,
+                        start_time=entry.start_time,
+                        end_time=entry.end_time,
+                        description=entry.description,
+                        product=entry.product,
+                    ),
+                )
+            )
+
+        operations = []
+        if new_appointments:
+            await Appointment.insert_many(
+                [appointment for _, appointment in new_appointments]
+            )
+            await apply_allowance_changes_in_db(
+                [
+                    appointment_allowance_change(appointment, {"reserved": 1})
+                    for _, appointment in new_appointments
+                ]
+            )
+            operations += [
+                UpdateOne(
+                    {"_id": entry.id, "promotion_token": token},
+                    {
+                        "$set": {
+                            "status": "promoted",
+                            "appointment_id": str(appointment.id),
+                            "last_updated": now,
+                        }
+                    },
+                )
+                for entry, appointment in new_appointments
+            ]
+
+        # The stock went to another request in the meantime, back to the queue
+        if released:
+            operations.append(
+                UpdateMany(
+                    {"_id": {"$in": released}, "promotion_token": token},
+                    {
+                        "$set": {"status": "waiting", "last_updated": now},
+                        "$unset": {"promotion_token": ""},
+                    },
+                )
+            )
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+        return [str(appointment.id) for _, appointment in new_appointments]
+    except Exception as e:
+        # Entries may be claimed and stock reserved, this must not go unnoticed
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while promoting the waitlist: {e}",
+        )
+
+
+async def get_waitlist_by_individual(individual_id: str):
+    """
+    Retrieve the waitlist entries of a specific individual, newest first
+    :param individual_id: The ID of the individual
+    """
+    entry_list = []
+
+    try:
+        entries = (
+            await WaitlistEntry.find(WaitlistEntry.individual_id == individual_id)
+            .sort("-created_at")
+            .to_list()
+        )
+
+        for entry in entries:
+            entry = entry.model_dump()
+            entry["id"] = str(entry["id"])
+            entry_list.append(entry)
+
+        return entry_list
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while fetching the waitlist: {e}",
+        )
+
+
+async def cancel_waitlist_entry_in_db(individual_id: str, entry_id: str):
+    """
+    Leave the waitlist
+    :param individual_id: The ID of the individual who owns the entry
+    :param entry_id: The ID of the waitlist entry
+    :return: True if the entry was cancelled, False if no waiting entry was found
+    """
+    try:
+        result = await WaitlistEntry.find_one(
+            WaitlistEntry.id == PydanticObjectId(entry_id),
+            WaitlistEntry.individual_id == individual_id,
+            WaitlistEntry.status == "waiting",
+        ).update(
+            {
+                "$set": {
+                    "status": "cancelled",
+                    "last_updated": datetime.now(timezone.utc),
+                }
+            }
+        )
+        return result is not None and result.modified_count == 1
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"An error occurred while cancelling the waitlist entry: {e}",
+        )
@@ -0,0 +1,43 @@
+import asyncio
+from app.config import settings
+from app.services.lease_service import acquire_lease_in_db, release_lease_in_db
+from app.services.pledge_service import process_due_pledges_in_db
+
+LEASE_NAME = "donation_pledges"
+
+
+async def _process_due_pledges(lease_seconds: int) -> int:
+    processed = 0
+    while True:
+        batch = await process_due_pledges_in_db()
+        if not batch:
+            return processed
+        processed += batch
+        # Keep the lease while catching up on a long backlog
+        if not await acquire_lease_in_db(LEASE_NAME, lease_seconds):
+            return processed
+
+
+async def run_pledge_scheduler():
+    """
+    Periodically turn the due pledges into donations.
+    Every API worker runs this loop, the lease lets only one of them do the work.
+    """
+    lease_seconds = settings.PLEDGE_SCHEDULER_INTERVAL_SECONDS * 2
+    try:
+        while True:
+            try:
+                if await acquire_lease_in_db(LEASE_NAME, lease_seconds):
+                    processed = await _process_due_pledges(lease_seconds)
+                    if processed:
+                        print(f"Processed {processed} due donation pledges.")
+            except Exception as e:
+                print(f"An error occurred while processing the donation pledges: {e}")
+
+            await asyncio.sleep(settings.PLEDGE_SCHEDULER_INTERVAL_SECONDS)
+    finally:
+        # Let another worker take over right away on shutdown
+        try:
+            await release_lease_in_db(LEASE_NAME)
+        except Exception:
+            pass
@@ -0,0 +1,18 @@
+import asyncio
+from app.config import settings
+from app.services.foodbank.job_service import expire_jobs_in_db
+
+
+async def run_job_expiry_sweeper():
+    """
+    Periodically mark the jobs whose deadline has passed as unavailable
+    """
+    while True:
+        try:
+            expired = await expire_jobs_in_db()
+            if expired:
+                print(f"Marked {expired} expired jobs as unavailable.")
+        except Exception as e:
+            print(f"An error occurred while sweeping expired jobs: {e}")
+
+        await asyncio.sleep(settings.JOB_EXPIRY_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,16 @@
+import asyncio
+from app.config import settings
+from app.services.recommendation_service import refresh_all_recommendations_in_db
+
+
+async def run_job_recommendation_refresher():
+    """
+    Periodically rebuild every volunteer's job feed so the scores follow the job recency
+    """
+    while True:
+        try:
+            await refresh_all_recommendations_in_db()
+        except Exception as e:
+            print(f"An error occurred while refreshing the job recommendations: {e}")
+
+        await asyncio.sleep(settings.JOB_RECOMMENDATION_REFRESH_INTERVAL_SECONDS)
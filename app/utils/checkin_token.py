@@ -0,0 +1,58 @@
+import base64
+import hashlib
+import hmac
+from app.config import settings
+
+# Prefix of the QR payload so scanners can tell FoodLink codes apart
+CHECKIN_PAYLOAD_PREFIX = "foodlink:checkin:"
+
+# Number of signature bytes kept in the token
+SIGNATURE_SIZE = 8
+
+
+def _sign(raw_id: bytes) -> bytes:
+    return hmac.new(settings.SECRET_KEY.encode(), raw_id, hashlib.sha256).digest()[
+        :SIGNATURE_SIZE
+    ]
+
+
+def create_checkin_token(appointment_id: str) -> str:
+    """
+    Create a short signed check-in token for an appointment
+    :param appointment_id: The MongoDB ID of the appointment
+    :return: A 27 characters url-safe token
+    """
+    raw_id = bytes.fromhex(appointment_id)
+    return base64.urlsafe_b64encode(raw_id + _sign(raw_id)).decode().rstrip("=")
+
+
+def verify_checkin_token(token: str) -> bool:
+    """
+    Check the signature of a check-in token without touching the db
+    :param token: The token read from the QR code
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except Exception:
+        return False
+
+    raw_id, signature = raw[:-SIGNATURE_SIZE], raw[-SIGNATURE_SIZE:]
+    return len(raw_id) == 12 and hmac.compare_digest(signature, _sign(raw_id))
+
+
+def build_checkin_payload(token: str) -> str:
+    """
+    Build the content of the QR code shown by the individual
+    :param token: The check-in token of the appointment
+    """
+    return f"{CHECKIN_PAYLOAD_PREFIX}{token}"
+
+
+def parse_checkin_payload(payload: str) -> str:
+    """
+    Extract the token from a scanned QR code, a bare token is accepted as well
+    :param payload: The content of the QR code
+    """
+    if payload.startswith(CHECKIN_PAYLOAD_PREFIX):
+        return payload[len(CHECKIN_PAYLOAD_PREFIX) :]
+    return payload
@@ -0,0 +1,143 @@
+import heapq
+from collections import Counter
+from typing import Dict, List, Set
+
+# Minimum trigram similarity for a fuzzy match
+MIN_SIMILARITY = 0.3
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    # Padding lets the first and last letters count as much as the others
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # Every name having a word starting with the prefix of this node
+        self.names: Set[str] = set()
+
+
+class FoodNameIndex:
+    """
+    Autocomplete over food names: a prefix trie on the start of every word of the
+    names, with a trigram index as the fuzzy fallback for typos.
+    Names are added and removed one at a time, so catalog changes never rebuild it.
+    """
+
+    def __init__(self, names=()):
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._name_trigrams: Dict[str, Set[str]] = {}
+        self._normalized: Dict[str, str] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._normalized)
+
+    def _word_starts(self, normalized: str) -> List[str]:
+        # "green apple" is found from "gr..." and from "ap..."
+        words = normalized.split(" ")
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def add(self, name: str):
+        if name in self._normalized:
+            return
+        normalized = _normalize(name)
+        self._normalized[name] = normalized
+
+        for suffix in self._word_starts(normalized):
+            node = self._root
+            for char in suffix:
+                node = node.children.setdefault(char, _TrieNode())
+                node.names.add(name)
+
+        trigrams = _trigrams(normalized)
+        self._name_trigrams[name] = trigrams
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(name)
+
+    def remove(self, name: str):
+        normalized = self._normalized.pop(name, None)
+        if normalized is None:
+            return
+
+        for suffix in self._word_starts(normalized):
+            path = [self._root]
+            for char in suffix:
+                path.append(path[-1].children[char])
+            for depth in range(len(suffix), 0, -1):
+                node = path[depth]
+                node.names.discard(name)
+                if not node.names:
+                    del path[depth - 1].children[suffix[depth - 1]]
+
+        for trigram in self._name_trigrams.pop(name):
+            names = self._trigrams[trigram]
+            names.discard(name)
+            if not names:
+                del self._trigrams[trigram]
+
+    def _prefix_matches(self, query: str) -> Set[str]:
+        node = self._root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.names
+
+    def _fuzzy_matches(self, query: str, exclude: Set[str], limit: int) -> List[str]:
+        query_trigrams = _trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+
+        scored = []
+        for name, count in shared.items():
+            if name in exclude:
+                continue
+            similarity = count / (
+                len(query_trigrams) + len(self._name_trigrams[name]) - count
+            )
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, name))
+        return [name for _, name in heapq.nsmallest(limit, scored)]
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """
+        Find the names matching what was typed so far
+        :param query: The text typed by the user
+        :param limit: The maximum number of names returned
+        :return: Prefix matches first (names starting with the query, then names with
+        a word starting with it, shortest first), then the closest fuzzy matches
+        """
+        query = _normalize(query)
+        if not query:
+            return []
+
+        prefix = self._prefix_matches(query)
+        ranked = heapq.nsmallest(
+            limit,
+            prefix,
+            key=lambda name: (
+                not self._normalized[name].startswith(query),
+                len(name),
+                self._normalized[name],
+            ),
+        )
+        results = [{"food_name": name, "match": "prefix"} for name in ranked]
+
+        if len(results) < limit:
+            results += [
+                {"food_name": name, "match": "fuzzy"}
+                for name in self._fuzzy_matches(query, prefix, limit - len(results))
+            ]
+        return results
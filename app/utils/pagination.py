@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+# Default and maximum number of rows returned in a single page
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, document_id) -> str:
+    """
+    Encode the position of the last row of a page into an opaque cursor
+    :param sort_value: The value of the sort field for the last row (datetime or number)
+    :param document_id: The MongoDB identifier of the last row, used to break ties
+    :return: A url-safe cursor string
+    """
+    if isinstance(sort_value, datetime):
+        position = {"type": "datetime", "value": sort_value.isoformat()}
+    else:
+        position = {"type": "number", "value": sort_value}
+    position["id"] = str(document_id)
+
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor created by encode_cursor
+    :param cursor: The cursor string received from the client
+    :return: A tuple of (sort_value, document_id)
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        sort_value = position["value"]
+        if position["type"] == "datetime":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, PydanticObjectId(position["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def build_keyset_filter(
+    field: str, cursor: str | None, descending: bool = False
+) -> dict:
+    """
+    Build the query that continues a (field, _id) ordered listing after the cursor
+    :param field: The field used to sort the listing
+    :param cursor: The cursor of the previous page, or None for the first page
+    :param descending: Whether the listing is sorted in descending order
+    :return: A MongoDB filter that matches only the rows after the cursor
+    """
+    if not cursor:
+        return {}
+
+    sort_value, document_id = decode_cursor(cursor)
+    operator = "$lt" if descending else "$gt"
+
+    return {
+        "$or": [
+            {field: {operator: sort_value}},
+            {field: sort_value, "_id": {operator: document_id}},
+        ]
+    }
+
+
+def clamp_page_size(limit: int | None) -> int:
+    """
+    Keep the requested page size within the allowed bounds
+    :param limit: The page size requested by the client
+    """
+    if not limit or limit <= 0:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
@@ -0,0 +1,66 @@
+import html
+import os
+from typing import List
+
+# Runs inside the worker processes of the receipt generation, so it must not
+# touch the database or the event loop
+
+
+def receipt_path(directory: str, foodbank_id: str, year: int, donor_id: str) -> str:
+    return os.path.join(directory, foodbank_id, str(year), f"{donor_id}.html")
+
+
+def render_receipt_html(receipt: dict) -> str:
+    """
+    Render the year-end receipt of a donor
+    :param receipt: foodbank_name, donor_name, donor_id, year, total and donations
+    (each with id, date and amount)
+    """
+    rows = "\n".join(
+        f"<tr><td>{html.escape(donation['date'])}</td>"
+        f"<td>{html.escape(donation['id'])}</td>"
+        f"<td>${donation['amount']:,.2f}</td></tr>"
+        for donation in receipt["donations"]
+    )
+    foodbank_name = html.escape(receipt["foodbank_name"])
+    donor_name = html.escape(receipt["donor_name"])
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{receipt['year']} donation receipt - {foodbank_name}</title>
+</head>
+<body>
+<h1>Official donation receipt for {receipt['year']}</h1>
+<p>Issued by {foodbank_name} to {donor_name}</p>
+<p>Receipt number: {receipt['year']}-{html.escape(receipt['donor_id'])}</p>
+<table>
+<thead><tr><th>Date</th><th>Donation</th><th>Amount</th></tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+<p><strong>Total eligible amount: ${receipt['total']:,.2f}</strong></p>
+</body>
+</html>
+"""
+
+
+def write_receipts(directory: str, foodbank_id: str, year: int, receipts: List[dict]) -> int:
+    """
+    Render and write a batch of receipts, replacing any previous version
+    :return: The number of receipts written
+    """
+    folder = os.path.join(directory, foodbank_id, str(year))
+    os.makedirs(folder, exist_ok=True)
+
+    for receipt in receipts:
+        path = receipt_path(directory, foodbank_id, year, receipt["donor_id"])
+        # Write to a temporary file first so that a download never sees half a receipt
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(render_receipt_html(receipt))
+        os.replace(temporary_path, path)
+
+    return len(receipts)
@@ -22,3 +22,14 @@ def convert_string_time_to_iso(date_time, time_str):
     iso_time = utc_datetime.isoformat()
 
     return iso_time
+
+
+def convert_utc_to_local(utc_datetime):
+    # Datetimes read back from MongoDB are naive UTC
+    if utc_datetime.tzinfo is None:
+        utc_datetime = pytz.utc.localize(utc_datetime)
+
+    # Convert UTC to the local time of the foodbanks
+    local_tz = pytz.timezone(tzlocal.get_localzone_name())
+
+    return utc_datetime.astimezone(local_tz)
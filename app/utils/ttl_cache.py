@@ -0,0 +1,35 @@
+import time
+
+
+class TTLCache:
+    """
+    A small in-process cache whose entries expire after a fixed time to live
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value):
+        # Dicts keep insertion order, so the first key is the oldest entry
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()